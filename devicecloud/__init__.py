@@ -7,7 +7,8 @@ import logging
 import time
 import json
 
-from devicecloud.util import validate_type
+from devicecloud.jsonstream import JSONItemStream
+from devicecloud.util import validate_type, concurrent_map
 from requests.auth import HTTPBasicAuth
 import requests
 from devicecloud.version import __version__
@@ -51,6 +52,9 @@ DEFAULT_THROTTLE_DELAY_INIT = 1.0
 DEFAULT_THROTTLE_DELAY_MAX = 10.0
 DEFAULT_THROTTLE_DELAY_BACKOFF_COEFFICIENT = 1.5
 
+# The number of bytes read from the response at a time when parsing JSON incrementally
+JSON_STREAM_CHUNK_SIZE = 64 * 1024
+
 logger = logging.getLogger("devicecloud")
 
 
@@ -177,7 +181,7 @@ class DeviceCloudConnection(object):
         err = "DC %s to %s failed - HTTP(%s)" % (method, url, response.status_code)
         raise DeviceCloudHttpException(response, err)
 
-    def iter_json_pages(self, path, page_size=1000, **params):
+    def iter_json_pages(self, path, page_size=1000, prefetch_workers=None, streaming=False, **params):
         """Return an iterator over JSON items from a paginated resource
 
         Legacy resources (prior to V1) implemented a common paging interfaces for
@@ -189,23 +193,55 @@ class DeviceCloudConnection(object):
         :param int page_size: The number of items that should be requested for each page.  A larger
             page_size may mean fewer HTTP requests but could also increase the time to get a first
             result back from the device cloud.
+        :param int prefetch_workers: If specified, the total size of the result set is determined
+            from the first page and all remaining pages are requested concurrently using this many
+            worker threads.  Items are still yielded in order.  By default, pages are requested
+            one at a time as the previous page is consumed.
+        :param bool streaming: If True, each page is parsed incrementally and items are
+            yielded as they are received rather than once the whole page has been received
+            (see :meth:`get_json`).  This may not be combined with ``prefetch_workers``.
         :param params: These are additional query parameters that should be sent with each
             request to the device cloud.
 
         """
         path = validate_type(path, *six.string_types)
         page_size = validate_type(page_size, *six.integer_types)
+        prefetch_workers = validate_type(prefetch_workers, type(None), *six.integer_types)
+        if prefetch_workers and validate_type(streaming, bool):
+            raise ValueError("streaming may not be combined with prefetch_workers")
 
-        offset = 0
-        remaining_size = 1  # just needs to be non-zero
-        while remaining_size > 0:
+        def get_page(offset):
             reqparams = {"start": offset, "size": page_size}
             reqparams.update(params)
-            response = self.get_json(path, params=reqparams)
-            offset += page_size
+            if streaming:
+                return self.get_json(path, params=reqparams, stream=True)
+            return self.get_json(path, params=reqparams)
+
+        offset = 0
+        if prefetch_workers:
+            # The first page tells us how many more items there are; request the pages
+            # containing those concurrently.  If the result set has grown in the meantime,
+            # we fall through to fetch anything beyond that serially.
+            response = get_page(offset)
             remaining_size = int(response.get("remainingSize", "0"))
+            offsets = range(page_size, page_size + remaining_size, page_size)
+            pages = concurrent_map(get_page, offsets, prefetch_workers)
             for item_json in response.get("items", []):
                 yield item_json
+            for response in pages:
+                for item_json in response.get("items", []):
+                    yield item_json
+            offset = page_size + len(offsets) * page_size
+            remaining_size = int(response.get("remainingSize", "0"))
+        else:
+            remaining_size = 1  # just needs to be non-zero
+
+        while remaining_size > 0:
+            response = get_page(offset)
+            offset += page_size
+            for item_json in response if streaming else response.get("items", []):
+                yield item_json
+            remaining_size = int(response.get("remainingSize", "0"))
 
     def ping(self):
         """Ping the Device Cloud using the authorization provided
@@ -248,13 +284,20 @@ class DeviceCloudConnection(object):
         This method will automatically add the ``Accept: application/json`` and parse the
         JSON response from the device cloud.
 
+        If ``stream=True`` is passed, the body is not read up front.  Instead, a
+        :class:`~devicecloud.jsonstream.JSONItemStream` is returned which parses each
+        member of the ``items`` array as it is iterated over and as the body is received.
+        This bounds the memory needed for large pages and allows the first items to be
+        processed before the whole page has been received.
+
         :param str path: The device cloud path to GET
         :param int retries: The number of times the request should be retried if an
             unsuccessful response is received.  Most likely, you should leave this at 0.
         :raises DeviceCloudHttpException: if a non-success response to the request is received
             from the device cloud
         :returns: A python data structure containing the results of calling ``json.loads`` on the
-            body of the response from the device cloud.
+            body of the response from the device cloud (or a
+            :class:`~devicecloud.jsonstream.JSONItemStream` if ``stream=True``).
 
         """
 
@@ -262,6 +305,9 @@ class DeviceCloudConnection(object):
         headers = kwargs.setdefault('headers', {})
         headers.update({'Accept': 'application/json'})
         response = self._make_request("GET", url, **kwargs)
+        if kwargs.get('stream'):
+            return JSONItemStream(response.iter_content(chunk_size=JSON_STREAM_CHUNK_SIZE),
+                                  on_close=response.close)
         return json.loads(response.text)
 
     def post(self, path, data, **kwargs):
@@ -444,6 +490,31 @@ class DeviceCloud(object):
         """
         return self._conn
 
+    def get_async_connection(self, session=None):
+        """Get a new :class:`.AsyncDeviceCloudConnection` for this device cloud instance
+
+        The returned connection uses the same credentials, base url, and throttling
+        configuration as :meth:`get_connection` but exposes coroutines for each
+        request method.  This requires Python 3.6+ (see :mod:`devicecloud.aio`).
+
+        :param session: An optional ``aiohttp.ClientSession`` (or compatible object)
+            to be used for making requests.
+        :rtype: :class:`.AsyncDeviceCloudConnection`
+
+        """
+        from devicecloud.aio import AsyncDeviceCloudConnection
+
+        conn = self._conn
+        return AsyncDeviceCloudConnection(
+            auth=conn._auth,
+            base_url=conn._base_url,
+            throttle_retries=conn._throttle_retries,
+            throttle_delay_init=conn._throttle_delay_init,
+            throttle_delay_max=conn._throttle_delay_max,
+            throttle_delay_backoff_coefficient=conn._throttle_delay_backoff_coefficient,
+            session=session
+        )
+
     def get_streams_api(self):
         """Returns a :class:`.StreamsAPI` bound to this device cloud instance
 
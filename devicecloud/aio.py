@@ -0,0 +1,293 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+r"""Module providing an asyncio based transport for the device cloud web services
+
+The :class:`AsyncDeviceCloudConnection` mirrors the interface of
+:class:`devicecloud.DeviceCloudConnection` but every request method is a
+coroutine.  This allows a single process to keep a large number of requests
+in flight without dedicating a thread to each one::
+
+    import asyncio
+    from devicecloud import DeviceCloud
+
+    dc = DeviceCloud('user', 'pass')
+
+    async def main():
+        async with dc.get_async_connection() as conn:
+            async for device_json in conn.iter_json_pages("/ws/DeviceCore"):
+                print(device_json["devConnectwareId"])
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+This module requires Python 3.6+ and, unless a session object is provided
+explicitly, the `aiohttp <http://aiohttp.readthedocs.org/>`_ library.
+
+"""
+import asyncio
+import json
+import logging
+
+import requests
+import six
+from devicecloud import DeviceCloudHttpException, SUCCESSFUL_STATUS_CODES, HTTP_THROTTLED_CODES, \
+    DEFAULT_THROTTLE_RETRIES, DEFAULT_THROTTLE_DELAY_INIT, DEFAULT_THROTTLE_DELAY_MAX, \
+    DEFAULT_THROTTLE_DELAY_BACKOFF_COEFFICIENT
+from devicecloud.util import validate_type
+from devicecloud.version import __version__
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+logger = logging.getLogger("devicecloud.aio")
+
+
+def _to_requests_response(method, url, status, headers, body):
+    # Responses are exposed as requests.Response objects so that callers (and
+    # DeviceCloudHttpException) see the same thing from both transports
+    response = requests.Response()
+    response.status_code = status
+    response.headers = requests.structures.CaseInsensitiveDict(headers)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = url
+    response._content = body
+    response.request = requests.Request(method, url).prepare()
+    return response
+
+
+class AsyncDeviceCloudConnection(object):
+    """Provide low-level asyncio access to the Device Cloud web services
+
+    This object provides the same methods as :class:`devicecloud.DeviceCloudConnection`
+    with each request method being a coroutine.  Throttled requests (HTTP 429)
+    are retried with the same backoff semantics, but the delay between attempts
+    uses :func:`asyncio.sleep` so that other requests may proceed in the meantime.
+
+    This object is accessible via :meth:`devicecloud.DeviceCloud.get_async_connection`.
+    The connection should be closed by calling :meth:`close` (or by using the
+    connection as an asynchronous context manager) when it is no longer needed.
+
+    :param auth: A :class:`requests.auth.HTTPBasicAuth` with the account credentials
+    :param str base_url: The base url of the device cloud (e.g. https://devicecloud.digi.com)
+    :param session: An optional ``aiohttp.ClientSession`` (or compatible object) to use for
+        requests.  If not provided, a session will be created on first use and closed
+        along with this connection.
+
+    """
+
+    def __init__(self, auth, base_url,
+                 throttle_retries=DEFAULT_THROTTLE_RETRIES,
+                 throttle_delay_init=DEFAULT_THROTTLE_DELAY_INIT,
+                 throttle_delay_max=DEFAULT_THROTTLE_DELAY_MAX,
+                 throttle_delay_backoff_coefficient=DEFAULT_THROTTLE_DELAY_BACKOFF_COEFFICIENT,
+                 session=None):
+        self._auth = auth
+        self._base_url = base_url
+        self._throttle_retries = throttle_retries
+        self._throttle_delay_init = throttle_delay_init
+        self._throttle_delay_max = throttle_delay_max
+        self._throttle_delay_backoff_coefficient = throttle_delay_backoff_coefficient
+        self._session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def hostname(self):
+        """Get the hostname that this connection is associated with"""
+        from six.moves.urllib.parse import urlparse
+        return urlparse(self._base_url).netloc.split(':', 1)[0]
+
+    @property
+    def username(self):
+        return self._auth.username
+
+    @property
+    def password(self):
+        return self._auth.password
+
+    def _get_session(self):
+        if self._session is None:
+            if aiohttp is None:
+                raise ImportError("aiohttp is required for AsyncDeviceCloudConnection "
+                                  "unless a session is provided")
+            self._session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(self._auth.username, self._auth.password),
+                headers={"User-Agent": "python-devicecloud/%s" % __version__},
+            )
+        return self._session
+
+    def _make_url(self, path):
+        if not path.startswith("/"):
+            path = "/" + path
+        return "%s%s" % (self._base_url, path)
+
+    async def _make_request(self, method, url, **kwargs):
+        #
+        # Make a request, retrying up to 'retries' times backing off according to defined constants
+        #
+        throttle_retries = kwargs.pop('throttle_retries', kwargs.pop('retries', self._throttle_retries))
+        throttle_delay_init = kwargs.pop('throttle_delay_init', self._throttle_delay_init)
+        throttle_delay_max = kwargs.pop('throttle_delay_max', self._throttle_delay_max)
+        throttle_delay_backoff_coefficient = \
+            kwargs.pop('throttle_delay_backoff_coefficient', self._throttle_delay_backoff_coefficient)
+
+        session = self._get_session()
+        remaining_attempts = throttle_retries + 1
+        retry_delay = throttle_delay_init
+        while remaining_attempts > 0:
+            raw_response = await session.request(method, url, **kwargs)
+            try:
+                body = await raw_response.read()
+            finally:
+                raw_response.release()
+            response = _to_requests_response(method, url, raw_response.status, raw_response.headers, body)
+            if response.status_code in SUCCESSFUL_STATUS_CODES:
+                return response
+            elif response.status_code in HTTP_THROTTLED_CODES:
+                remaining_attempts -= 1
+                if remaining_attempts > 0:
+                    logger.info("Request throttled on attempt {attempt}/{max_attempts}, retrying in {delay} seconds".format(
+                        attempt=(throttle_retries + 1 - remaining_attempts),
+                        max_attempts=throttle_retries,
+                        delay=retry_delay
+                    ))
+                    await asyncio.sleep(retry_delay)
+                    retry_delay = min(retry_delay * throttle_delay_backoff_coefficient, throttle_delay_max)
+            else:
+                break
+
+        err = "DC %s to %s failed - HTTP(%s)" % (method, url, response.status_code)
+        raise DeviceCloudHttpException(response, err)
+
+    async def close(self):
+        """Close the underlying session if it was created by this connection"""
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+            self._session = None
+
+    async def iter_json_pages(self, path, page_size=1000, **params):
+        """Return an asynchronous iterator over JSON items from a paginated resource
+
+        This works like :meth:`devicecloud.DeviceCloudConnection.iter_json_pages` but
+        must be consumed with ``async for``::
+
+            async for item_json in conn.iter_json_pages("/ws/Group"):
+                print(item_json)
+
+        :param str path: The base path to the resource being requested (e.g. /ws/Group)
+        :param int page_size: The number of items that should be requested for each page.
+        :param params: These are additional query parameters that should be sent with each
+            request to the device cloud.
+
+        """
+        path = validate_type(path, *six.string_types)
+        page_size = validate_type(page_size, *six.integer_types)
+
+        offset = 0
+        remaining_size = 1  # just needs to be non-zero
+        while remaining_size > 0:
+            reqparams = {"start": offset, "size": page_size}
+            reqparams.update(params)
+            response = await self.get_json(path, params=reqparams)
+            offset += page_size
+            remaining_size = int(response.get("remainingSize", "0"))
+            for item_json in response.get("items", []):
+                yield item_json
+
+    async def ping(self):
+        """Ping the Device Cloud using the authorization provided
+
+        :return: The response of getting a single device from DeviceCore on success
+        :raises: :class:`.DeviceCloudHttpException` if there is a problem
+
+        """
+        return await self.get("/ws/DeviceCore?size=1")
+
+    async def get(self, path, **kwargs):
+        """Perform an HTTP GET request of the specified path in the device cloud
+
+        See :meth:`devicecloud.DeviceCloudConnection.get`.  Keyword arguments are
+        passed on to the ``request`` method of the session.
+
+        :param str path: The device cloud path to GET
+        :raises DeviceCloudHttpException: if a non-success response to the request is received
+            from the device cloud
+        :returns: A requests ``Response`` object
+
+        """
+        url = self._make_url(path)
+        return await self._make_request("GET", url, **kwargs)
+
+    async def get_json(self, path, **kwargs):
+        """Perform an HTTP GET request with JSON headers of the specified path against the device cloud
+
+        See :meth:`devicecloud.DeviceCloudConnection.get_json`.
+
+        :param str path: The device cloud path to GET
+        :raises DeviceCloudHttpException: if a non-success response to the request is received
+            from the device cloud
+        :returns: A python data structure containing the results of calling ``json.loads`` on the
+            body of the response from the device cloud.
+
+        """
+        url = self._make_url(path)
+        headers = kwargs.setdefault('headers', {})
+        headers.update({'Accept': 'application/json'})
+        response = await self._make_request("GET", url, **kwargs)
+        return json.loads(response.text)
+
+    async def post(self, path, data, **kwargs):
+        """Perform an HTTP POST request of the specified path in the device cloud
+
+        See :meth:`devicecloud.DeviceCloudConnection.post`.
+
+        :param str path: The device cloud path to POST
+        :param data: The data to be posted in the body of the POST request
+        :raises DeviceCloudHttpException: if a non-success response to the request is received
+            from the device cloud
+        :returns: A requests ``Response`` object
+
+        """
+        url = self._make_url(path)
+        return await self._make_request("POST", url, data=data, **kwargs)
+
+    async def put(self, path, data, **kwargs):
+        """Perform an HTTP PUT request of the specified path in the device cloud
+
+        See :meth:`devicecloud.DeviceCloudConnection.put`.
+
+        :param str path: The device cloud path to PUT
+        :param data: The data to be sent in the body of the PUT request
+        :raises DeviceCloudHttpException: if a non-success response to the request is received
+            from the device cloud
+        :returns: A requests ``Response`` object
+
+        """
+        url = self._make_url(path)
+        return await self._make_request("PUT", url, data=data, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        """Perform an HTTP DELETE request of the specified path in the device cloud
+
+        See :meth:`devicecloud.DeviceCloudConnection.delete`.
+
+        :param str path: The device cloud path to DELETE
+        :raises DeviceCloudHttpException: if a non-success response to the request is received
+            from the device cloud
+        :returns: A requests ``Response`` object
+
+        """
+        url = self._make_url(path)
+        return await self._make_request("DELETE", url, **kwargs)
+
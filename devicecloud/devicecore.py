@@ -8,7 +8,7 @@ import xml.etree.ElementTree as ET
 
 from devicecloud.apibase import APIBase
 from devicecloud.conditions import Attribute, Expression
-from devicecloud.util import iso8601_to_dt, validate_type
+from devicecloud.util import iso8601_to_dt, validate_type, TTLCache
 import six
 
 
@@ -19,6 +19,10 @@ dev_connectware_id = Attribute('devConnectwareId')
 # TODO: Can we support location based device lookups? (e.g. lat/long?)
 
 
+#: The maximum number of devices for which pushed updates are kept
+DEFAULT_DEVICE_UPDATES_SIZE = 10000
+
+
 ADD_GROUP_TEMPLATE = \
 """
 <DeviceCore>
@@ -29,13 +33,31 @@ ADD_GROUP_TEMPLATE = \
 
 
 class DeviceCoreAPI(APIBase):
-    """Encapsulate DeviceCore interface"""
+    """Encapsulate DeviceCore interface
+
+    :param int device_updates_size: The maximum number of devices for which information
+        pushed by a :class:`~devicecloud.monitor_cache.CacheMonitor` is kept (the least
+        recently updated being discarded first)
+
+    """
 
-    def __init__(self, conn, sci):
+    def __init__(self, conn, sci, device_updates_size=DEFAULT_DEVICE_UPDATES_SIZE):
         APIBase.__init__(self, conn)
         self._sci = sci
+        # device information pushed to us (see devicecloud.monitor_cache) by devConnectwareId
+        self._device_updates = TTLCache(max_size=device_updates_size)
+
+    def _update_device_json(self, connectware_id, device_json):
+        """Merge updated information about a device into that seen by its :class:`Device` objects"""
+        updates = self._device_updates.get(connectware_id)
+        merged_updates = dict(updates) if updates is not None else {}
+        merged_updates.update(device_json)
+        self._device_updates.set(connectware_id, merged_updates)
 
-    def get_devices(self, condition=None, page_size=1000):
+    def _invalidate_device(self, connectware_id):
+        self._device_updates.invalidate(connectware_id)
+
+    def get_devices(self, condition=None, page_size=1000, prefetch_workers=None):
         """Iterates over each :class:`Device` for this device cloud account
 
         Examples::
@@ -58,6 +80,9 @@ class DeviceCoreAPI(APIBase):
             an iterator over all devices will be returned.
         :param int page_size: The number of results to fetch in a
             single page.  In general, the default will suffice.
+        :param int prefetch_workers: If specified, pages after the first will be
+            requested concurrently using this many threads.  See
+            :meth:`devicecloud.DeviceCloudConnection.iter_json_pages`.
         :returns: Iterator over each :class:`~Device` in this device cloud
             account in the form of a generator object.
         """
@@ -69,8 +94,9 @@ class DeviceCoreAPI(APIBase):
         if condition is not None:
             params["condition"] = condition.compile()
 
-        for device_json in self._conn.iter_json_pages("/ws/DeviceCore", page_size=page_size, **params):
-            yield Device(self._conn, self._sci, device_json)
+        for device_json in self._conn.iter_json_pages("/ws/DeviceCore", page_size=page_size,
+                                                      prefetch_workers=prefetch_workers, **params):
+            yield Device(self._conn, self._sci, device_json, devicecore_api=self)
 
     def get_group_tree_root(self, page_size=1000):
         r"""Return the root group for this accounts' group tree
@@ -385,10 +411,12 @@ class Device(object):
     # TODO: provide ability to set/update available data items
     # TODO: add/remove tags
 
-    def __init__(self, conn, sci, device_json):
+    def __init__(self, conn, sci, device_json, devicecore_api=None):
         self._conn = conn
         self._sci = sci
         self._device_json = device_json
+        self._devicecore_api = devicecore_api  # Invariant: DeviceCoreAPI receiving device updates or None
+        self._applied_updates = None  # the most recent updates merged into _device_json
 
     def __repr__(self):
         return "Device(%r, %r)" % (self.get_connectware_id(), self.get_mac())
@@ -400,11 +428,27 @@ class Device(object):
         synchronously in order to get the latest device metatdata.  This will
         update the cached data for this device.
 
+        If a :class:`~devicecloud.monitor_cache.CacheMonitor` is running for the
+        :class:`DeviceCoreAPI` from which this device was obtained, changes pushed
+        by the device cloud are reflected in the cached data without making
+        any requests.
+
         """
         if not use_cached:
             devicecore_data = self._conn.get_json(
                 "/ws/DeviceCore/{}".format(self.get_device_id()))
             self._device_json = devicecore_data["items"][0]  # should only be 1
+            if self._devicecore_api is not None:
+                # anything pushed before now is older than what we just received
+                self._applied_updates = self._devicecore_api._device_updates.get(
+                    self._device_json.get("devConnectwareId"))
+        elif self._devicecore_api is not None:
+            updates = self._devicecore_api._device_updates.get(self._device_json.get("devConnectwareId"))
+            if updates is not None and updates is not self._applied_updates:
+                device_json = dict(self._device_json)
+                device_json.update(updates)
+                self._device_json = device_json
+                self._applied_updates = updates
         return self._device_json
 
     def get_tags(self, use_cached=True):
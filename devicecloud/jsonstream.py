@@ -0,0 +1,157 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+r"""Module for incrementally parsing paged JSON results from the device cloud
+
+Paged resources return a JSON object containing an ``items`` array along with
+some information about the page (``resultSize``, ``pageCursor``, and so on).
+Parsing the whole response with ``json.loads`` requires the entire body to be
+received and every item to be built before the first one can be used.  A
+:class:`JSONItemStream` instead parses each element of the ``items`` array as
+soon as it has been received, holding only a small amount of the body in
+memory at any time.
+
+A :class:`JSONItemStream` is returned by
+:meth:`devicecloud.DeviceCloudConnection.get_json` when called with
+``stream=True``::
+
+    page = conn.get_json("/ws/DataPoint/mystream", stream=True)
+    for item in page:
+        print(item["data"])
+    print(page.get("pageCursor"))
+
+"""
+import codecs
+import json
+import re
+
+import six
+
+
+_WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
+
+class JSONItemStream(object):
+    """Incrementally parse a JSON object containing an array of items
+
+    Iterating over this object yields each element of the array named by
+    ``items_key`` as it is parsed; this may only be done once.  The other
+    members of the object are available through :meth:`get` (which first
+    parses, and discards, any items which have not been iterated over).
+
+    :param chunks: An iterable of the body of the response as bytes or text
+    :param str items_key: The name of the member containing the items
+    :param on_close: A callable called once parsing has finished (e.g. to close the response)
+
+    """
+
+    def __init__(self, chunks, items_key="items", on_close=None):
+        self._chunks = iter(chunks)
+        self._items_key = items_key
+        self._on_close = on_close
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = six.u("")
+        self._position = 0  # start of the unparsed portion of the buffer
+        self._end_of_input = False
+        self._fields = {}
+        self._items = self._parse()
+
+    def __iter__(self):
+        return self._items
+
+    def get(self, key, default=None):
+        """Get a member of the object other than the items"""
+        for _ in self._items:
+            pass
+        return self._fields.get(key, default)
+
+    def __getitem__(self, key):
+        for _ in self._items:
+            pass
+        return self._fields[key]
+
+    def _read_more(self, size=1):
+        """Add at least ``size`` more characters to the buffer (unless the input ends first),
+        returning False if there is no more input"""
+        pending = [self._buffer[self._position:]]  # only keep what is still to be parsed
+        self._position = 0
+        received = 0
+        if not self._end_of_input:
+            for chunk in self._chunks:
+                if isinstance(chunk, bytes):
+                    chunk = self._text_decoder.decode(chunk)
+                pending.append(chunk)
+                received += len(chunk)
+                if received >= max(size, 1):
+                    break
+            else:
+                self._end_of_input = True
+                remaining = self._text_decoder.decode(b"", True)
+                pending.append(remaining)
+                received += len(remaining)
+        self._buffer = six.u("").join(pending)
+        return received > 0
+
+    def _peek(self):
+        """Skip whitespace and return the next character (or None at the end of the input)"""
+        while True:
+            self._position = _WHITESPACE_RE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._read_more():
+                return None
+
+    def _expect(self, characters):
+        char = self._peek()
+        if char is None or char not in characters:
+            raise ValueError("Expected one of %r but found %r" % (characters, char))
+        self._position += 1
+        return char
+
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except ValueError:
+                # most likely the value has not been completely received; the decode is only
+                # retried once the buffered part of it has doubled, so that the work done for a
+                # value spanning many chunks stays linear in its size
+                if not self._read_more(len(self._buffer) - self._position):
+                    raise
+                continue
+            # a value ending at the end of the buffer (e.g. a number) may continue in the next chunk
+            if end == len(self._buffer) and self._read_more(len(self._buffer) - self._position):
+                continue
+            self._position = end
+            return value
+
+    def _parse(self):
+        try:
+            self._expect("{")
+            if self._peek() == "}":
+                return
+            while True:
+                key = self._decode_value()
+                self._expect(":")
+                if key == self._items_key and self._peek() == "[":
+                    self._position += 1
+                    if self._peek() == "]":
+                        self._position += 1
+                    else:
+                        while True:
+                            yield self._decode_value()
+                            if self._expect(",]") == "]":
+                                break
+                else:
+                    self._fields[key] = self._decode_value()
+                if self._expect(",}") == "}":
+                    break
+        finally:
+            self._buffer = six.u("")
+            if self._on_close is not None:
+                self._on_close()
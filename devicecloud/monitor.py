@@ -374,6 +374,12 @@ class TCPDeviceCloudMonitor(DeviceCloudMonitor):
         DeviceCloudMonitor.__init__(self, conn, monitor_id)
         self._tcp_client_manager = tcp_client_manager
 
-    def add_callback(self, callback):
-        """Create a secure SSL/TCP listen session to the device cloud"""
-        self._tcp_client_manager.create_session(callback, self._id)
+    def add_callback(self, callback, max_batch_size=None):
+        """Create a secure SSL/TCP listen session to the device cloud
+
+        :param int max_batch_size: If specified, the callback is called with a list of
+            up to this many payloads at once (see
+            :meth:`~devicecloud.monitor_tcp.TCPClientManager.create_session`)
+        :return: The :class:`~devicecloud.monitor_tcp.PushSession` which invokes the callback
+        """
+        return self._tcp_client_manager.create_session(callback, self._id, max_batch_size=max_batch_size)
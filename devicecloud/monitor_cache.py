@@ -0,0 +1,138 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+r"""Module for keeping cached stream and device information current with a push monitor
+
+Stream metadata (see :meth:`devicecloud.streams.DataStream.get_data_type` and
+friends) and device information (see :meth:`devicecloud.devicecore.Device.get_device_json`)
+are cached after they are first retrieved.  Keeping this information current
+would otherwise require polling with ``use_cached=False``, which can quickly
+lead to requests being throttled when done for a large number of streams or
+devices.
+
+A :class:`CacheMonitor` instead subscribes to changes to ``DataStream`` and
+``DeviceCore`` resources using a TCP push monitor and applies each change to
+the caches as it is received::
+
+    cache_monitor = CacheMonitor(dc.monitor, streams_api=dc.streams, devicecore_api=dc.devicecore)
+    cache_monitor.start()
+
+    devices = list(dc.devicecore.get_devices())
+    while True:
+        # no requests are made here; the connection status is pushed to us
+        print([d.get_connectware_id() for d in devices if d.is_connected()])
+        time.sleep(10)
+
+    cache_monitor.stop()
+
+"""
+import logging
+
+from devicecloud.monitor import MON_FORMAT_TYPE_ATTR, MON_TOPIC_ATTR, MON_TRANSPORT_TYPE_ATTR
+
+logger = logging.getLogger(__name__)
+
+#: The topic used to receive changes to stream metadata
+STREAM_TOPIC = "DataStream"
+
+#: The topic used to receive changes to devices
+DEVICE_TOPIC = "DeviceCore"
+
+OPERATION_DELETION = "DELETION"
+
+# The format in which changes must be pushed
+MONITOR_FORMAT = "json"
+
+
+class CacheMonitor(object):
+    """Apply changes pushed by the device cloud to cached stream and device information
+
+    :param monitor_api: The :class:`~devicecloud.monitor.MonitorAPI` used to create the monitor
+    :param streams_api: The :class:`~devicecloud.streams.StreamsAPI` whose stream
+        metadata cache should be kept current (or None)
+    :param devicecore_api: The :class:`~devicecloud.devicecore.DeviceCoreAPI` whose
+        devices should be kept current (or None)
+
+    """
+
+    def __init__(self, monitor_api, streams_api=None, devicecore_api=None):
+        if streams_api is None and devicecore_api is None:
+            raise ValueError("At least one of streams_api or devicecore_api must be provided")
+        self._monitor_api = monitor_api
+        self._streams_api = streams_api
+        self._devicecore_api = devicecore_api
+        self._monitor = None
+        self._session = None
+
+    def get_topics(self):
+        """Get the list of monitor topics this cache monitor subscribes to"""
+        topics = []
+        if self._streams_api is not None:
+            topics.append(STREAM_TOPIC)
+        if self._devicecore_api is not None:
+            topics.append(DEVICE_TOPIC)
+        return topics
+
+    def start(self):
+        """Start receiving changes, creating a TCP monitor for the topics if required"""
+        if self._session is not None:
+            raise RuntimeError("CacheMonitor is already started")
+        topics = self.get_topics()
+        # changes can only be applied if they are pushed to us over TCP as JSON
+        condition = ((MON_TOPIC_ATTR == ",".join(topics)) &
+                     (MON_TRANSPORT_TYPE_ATTR == "tcp") &
+                     (MON_FORMAT_TYPE_ATTR == MONITOR_FORMAT))
+        for monitor in self._monitor_api.get_monitors(condition):
+            break  # use the first one, even if there are multiple
+        else:
+            monitor = self._monitor_api.create_tcp_monitor(topics, format_type=MONITOR_FORMAT)
+        self._monitor = monitor
+        self._session = monitor.add_callback(self._handle_push)
+
+    def stop(self, delete_monitor=False):
+        """Stop receiving changes
+
+        Once stopped, cached information is no longer kept current.  Streams and
+        devices should be retrieved with ``use_cached=False`` (or the caches
+        otherwise allowed to expire) if current information is required.
+
+        :param bool delete_monitor: If True, the monitor is also deleted from the device cloud
+
+        """
+        if self._session is not None:
+            self._session.stop()
+            self._session = None
+        if delete_monitor and self._monitor is not None:
+            self._monitor.delete()
+            self._monitor = None
+
+    def _handle_push(self, json_data):
+        messages = json_data.get("Document", {}).get("Msg", [])
+        if isinstance(messages, dict):  # a batch of one
+            messages = [messages]
+        for message in messages:
+            try:
+                self._handle_message(message)
+            except Exception:
+                logger.exception("Unable to apply pushed message %r", message)
+        return True
+
+    def _handle_message(self, message):
+        operation = message.get("operation")
+        if STREAM_TOPIC in message and self._streams_api is not None:
+            stream_data = message[STREAM_TOPIC]
+            stream_id = stream_data["streamId"].lstrip('/')
+            if operation == OPERATION_DELETION:
+                self._streams_api._invalidate_stream(stream_id, deleted=True)
+            else:
+                self._streams_api._update_stream_metadata(stream_id, stream_data)
+        elif DEVICE_TOPIC in message and self._devicecore_api is not None:
+            device_json = message[DEVICE_TOPIC]
+            connectware_id = device_json["devConnectwareId"]
+            if operation == OPERATION_DELETION:
+                self._devicecore_api._invalidate_device(connectware_id)
+            else:
+                self._devicecore_api._update_device_json(connectware_id, device_json)
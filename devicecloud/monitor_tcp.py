@@ -11,16 +11,22 @@ import json
 import logging
 import socket
 import struct
-from threading import Thread
+from threading import Thread, Lock, Condition
 import errno
+import multiprocessing
 import select
 import zlib
 import ssl
 
 import pkg_resources
-from six.moves.queue import Queue, Empty
+from six.moves.queue import Queue
 import six
 
+try:
+    import selectors
+except ImportError:  # pragma: no cover (Python 2)
+    selectors = None
+
 DEFAULT_CRT_NAME = "devicecloud.crt"
 
 # Push Opcodes.
@@ -43,6 +49,181 @@ STATUS_BAD_REQUEST = 400
 PUSH_OPEN_PORT = 3200
 PUSH_SECURE_PORT = 3201
 
+# Initial size of the buffer each session receives messages into.  The buffer
+# grows to fit the largest message received by the session.
+RECEIVE_BUFFER_SIZE = 64 * 1024
+
+# Placed on the write queue to stop the writer thread.
+_STOP_WRITER = object()
+
+# Seconds the writer thread waits for a session's socket to become writable.
+SEND_TIMEOUT = 30
+
+
+class _SelectSelector(object):
+    """Minimal stand-in for :class:`selectors.DefaultSelector` using select.select
+
+    Only used where the selectors module is not available (Python 2).
+    """
+
+    EVENT_READ = 1
+
+    def __init__(self):
+        self._keys = {}  # fd -> (fileobj, data)
+
+    def register(self, fileobj, events, data=None):
+        self._keys[fileobj.fileno()] = (fileobj, data)
+
+    def unregister(self, fileobj):
+        for fd, (registered, _) in list(self._keys.items()):
+            if registered is fileobj:
+                del self._keys[fd]
+                return
+        raise KeyError(fileobj)
+
+    def select(self, timeout=None):
+        keys = dict(self._keys)
+        readable = select.select(list(keys.keys()), [], [], timeout)[0]
+        return [(_SelectorKey(keys[fd][0], keys[fd][1]), self.EVENT_READ) for fd in readable]
+
+    def close(self):
+        self._keys.clear()
+
+
+class _SelectorKey(object):
+
+    def __init__(self, fileobj, data):
+        self.fileobj = fileobj
+        self.data = data
+
+
+_EVENT_READ = selectors.EVENT_READ if selectors is not None else _SelectSelector.EVENT_READ
+
+
+def _new_selector():
+    if selectors is not None:
+        return selectors.DefaultSelector()
+    return _SelectSelector()  # pragma: no cover
+
+
+def _send_all(sock, data, timeout=SEND_TIMEOUT):
+    """Send all of ``data`` on a non-blocking socket, waiting for it to become writable as needed"""
+    while data:
+        try:
+            sent = sock.send(data)
+        except ssl.SSLError as err:
+            if err.args[0] != ssl.SSL_ERROR_WANT_WRITE:
+                raise
+            sent = 0
+        except socket.error as err:
+            if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+            sent = 0
+        data = data[sent:]
+        if data and not select.select([], [sock], [], timeout)[1]:
+            raise socket.timeout("Timed out sending to %r" % sock)
+
+
+def _socketpair():
+    """Return a pair of connected sockets (used to wake up the I/O thread)"""
+    if hasattr(socket, "socketpair"):
+        return socket.socketpair()
+    # Windows on Python 2 does not have socketpair; connect over loopback instead
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # pragma: no cover
+    try:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        writer = socket.create_connection(listener.getsockname())
+        reader, _ = listener.accept()
+    finally:
+        listener.close()
+    return reader, writer
+
+
+def _connection_request_message(username, password, monitor_id):
+    """Build the ConnectionRequest message sent to start receiving a monitor's messages"""
+    # Protocol Version = 1.
+    payload = struct.pack('!H', 0x01)
+    # Username Length.
+    payload += struct.pack('!H', len(username))
+    # Username.
+    payload += six.b(username)
+    # Password Length.
+    payload += struct.pack('!H', len(password))
+    # Password.
+    payload += six.b(password)
+    # Monitor ID.
+    payload += struct.pack('!L', int(monitor_id))
+
+    # Header 6 Bytes : Type [2 bytes] & Length [4 Bytes]
+    # ConnectionRequest is Type 0x01.
+    return struct.pack("!HL", CONNECTION_REQUEST, len(payload)) + payload
+
+
+def _check_connection_response(response):
+    """Raise PushException unless the 10 byte ConnectionResponse indicates success
+
+    :return: the status code of the response
+    """
+    if len(response) != 10:
+        raise PushException("Length of Connection Request Response "
+                            "(%d) is not 10." % len(response))
+
+    # Type
+    response_type = int(struct.unpack("!H", response[0:2])[0])
+    if response_type != CONNECTION_RESPONSE:
+        raise PushException(
+            "Connection Response Type (%d) is not "
+            "ConnectionResponse Type (%d)." % (response_type, CONNECTION_RESPONSE))
+
+    status_code = struct.unpack("!H", response[6:8])[0]
+    if status_code != STATUS_OK:
+        raise PushException("Connection Response Status Code (%d) is "
+                            "not STATUS_OK (%d)." % (status_code, STATUS_OK))
+    return status_code
+
+
+def _split_publish_message(data):
+    """Return the block id, compression flag and payload of a PublishMessage
+
+    ``data`` may be bytes or a memoryview of a session's receive buffer.  The
+    payload is a memoryview of ``data`` (or, on Python 2, where neither struct
+    nor zlib accept memoryviews, a copy as bytes); ``bytes(payload)`` copies it.
+    """
+    if six.PY2:
+        data = data.tobytes() if isinstance(data, memoryview) else data
+        block_id, _, compression = struct.unpack_from('!HHB', data)
+        return block_id, compression, data[10:]
+    block_id, _, compression = struct.unpack_from('!HHB', data)
+    return block_id, compression, memoryview(data)[10:]
+
+
+def _parse_publish_message(data):
+    """Return the block id and (decompressed) payload of a PublishMessage
+
+    The payload returned is a copy which does not refer to ``data``.
+    """
+    block_id, compression, payload = _split_publish_message(data)
+    if compression == 0x01:
+        # Data is compressed, uncompress it.
+        return block_id, zlib.decompress(payload)
+    return block_id, bytes(payload)
+
+
+def _decode_payload(payload, compression):
+    """Decompress (if needed) and decode the JSON payload of a PublishMessage
+
+    This is run by the decoder processes of a :class:`TCPClientManager`.
+    """
+    if compression == 0x01:
+        payload = zlib.decompress(payload)
+    return json.loads(payload.decode('utf-8'))
+
+
+def _publish_message_received(block_id):
+    """Build the PublishMessageReceived message acknowledging a block"""
+    return struct.pack('!HHH', PUBLISH_MESSAGE_RECEIVED, block_id, 200)
+
 
 def _read_msg_header(session):
     """
@@ -55,12 +236,12 @@ def _read_msg_header(session):
     read, otherwise None if header was not completely read.
     """
     try:
-        data = session.socket.recv(6 - len(session.data))
-        if len(data) == 0:  # No Data on Socket. Likely closed.
+        received = session.socket.recv_into(memoryview(session.header)[session.bytes_read:])
+        if received == 0:  # No Data on Socket. Likely closed.
             return NO_DATA
-        session.data += data
+        session.bytes_read += received
         # Data still not completely read.
-        if len(session.data) < 6:
+        if session.bytes_read < 6:
             return INCOMPLETE
 
     except ssl.SSLError:
@@ -69,11 +250,10 @@ def _read_msg_header(session):
         # read.
         return INCOMPLETE
 
-    session.message_length = struct.unpack('!i', session.data[2:6])[0]
-    response_type = struct.unpack('!H', session.data[0:2])[0]
+    response_type, session.message_length = struct.unpack('!Hi', session.header)
 
-    # Clear out session data as header is consumed.
-    session.data = six.b("")
+    # Header is consumed, the message is read from the start of the buffer.
+    session.bytes_read = 0
     return response_type
 
 
@@ -84,15 +264,16 @@ def _read_msg(session):
 
     :param session: Push Session to read data for.
     """
-    if len(session.data) == session.message_length:
+    if session.bytes_read == session.message_length:
         # Data Already completely read.  Return
         return True
 
     try:
-        data = session.socket.recv(session.message_length - len(session.data))
-        if len(data) == 0:
+        message = session.get_message_buffer()
+        received = session.socket.recv_into(message[session.bytes_read:])
+        if received == 0:
             raise PushException("No Data on Socket!")
-        session.data += data
+        session.bytes_read += received
     except ssl.SSLError:
         # This can happen when select gets triggered
         # for an SSL socket and data has not yet been
@@ -100,7 +281,7 @@ def _read_msg(session):
         return False
 
     # Whether or not all data was read.
-    return len(session.data) == session.message_length
+    return session.bytes_read == session.message_length
 
 
 class PushException(Exception):
@@ -114,24 +295,41 @@ class PushSession(object):
     iDigi.
     """
 
-    def __init__(self, callback, monitor_id, client):
+    def __init__(self, callback, monitor_id, client, max_batch_size=None):
         """Creates a PushSession for use with the device cloud
 
         :param callback: The callback function to invoke when data received.
             Must have 1 required parameter that will contain the payload.
         :param monitor_id: The id of the Monitor to observe.
         :param client: The client object this session is derived from.
+        :param max_batch_size: If not None, the callback is invoked with a list of
+            up to this many payloads which have been received (see
+            :meth:`TCPClientManager.create_session`).
         """
         self.callback = callback
         self.monitor_id = monitor_id
         self.client = client
+        self.max_batch_size = max_batch_size
+        # Messages waiting for the batch callback as (block_id, payload) tuples
+        # and whether a worker has been asked to deliver them.
+        self.pending = []
+        self.batch_scheduled = False
         self.socket = None
         self.log = logging.getLogger("%s.push_session.%s" % (__name__, monitor_id))
 
-        # Received protocol data holders.
-        self.data = six.b("")
+        # Received protocol data holders.  Messages are received directly
+        # into a buffer which is reused for each message.
+        self.header = bytearray(6)
+        self.buffer = bytearray(RECEIVE_BUFFER_SIZE)
+        self.bytes_read = 0
         self.message_length = 0
 
+    def get_message_buffer(self):
+        """Return a memoryview of the part of the receive buffer holding the current message"""
+        if len(self.buffer) < self.message_length:
+            self.buffer = bytearray(max(self.message_length, 2 * len(self.buffer)))
+        return memoryview(self.buffer)[:self.message_length]
+
     def send_connection_request(self):
         """
         Sends a ConnectionRequest to the iDigi server using the credentials
@@ -143,25 +341,8 @@ class PushSession(object):
                           % self.monitor_id)
             # Send connection request and perform a receive to ensure
             # request is authenticated.
-            # Protocol Version = 1.
-            payload = struct.pack('!H', 0x01)
-            # Username Length.
-            payload += struct.pack('!H', len(self.client.username))
-            # Username.
-            payload += six.b(self.client.username)
-            # Password Length.
-            payload += struct.pack('!H', len(self.client.password))
-            # Password.
-            payload += six.b(self.client.password)
-            # Monitor ID.
-            payload += struct.pack('!L', int(self.monitor_id))
-
-            # Header 6 Bytes : Type [2 bytes] & Length [4 Bytes]
-            # ConnectionRequest is Type 0x01.
-            data = struct.pack("!HL", CONNECTION_REQUEST, len(payload))
-
-            # The full payload.
-            data += payload
+            data = _connection_request_message(self.client.username, self.client.password,
+                                               self.monitor_id)
 
             # Send Connection Request.
             self.socket.send(data)
@@ -176,23 +357,9 @@ class PushSession(object):
             # Make socket blocking.
             self.socket.settimeout(0)
 
-            if len(response) != 10:
-                raise PushException("Length of Connection Request Response "
-                                    "(%d) is not 10." % len(response))
-
-            # Type
-            response_type = int(struct.unpack("!H", response[0:2])[0])
-            if response_type != CONNECTION_RESPONSE:
-                raise PushException(
-                    "Connection Response Type (%d) is not "
-                    "ConnectionResponse Type (%d)." % (response_type, CONNECTION_RESPONSE))
-
-            status_code = struct.unpack("!H", response[6:8])[0]
+            status_code = _check_connection_response(response)
             self.log.info("Got ConnectionResponse for Monitor %s. Status %s."
                           % (self.monitor_id, status_code))
-            if status_code != STATUS_OK:
-                raise PushException("Connection Response Status Code (%d) is "
-                                    "not STATUS_OK (%d)." % (status_code, STATUS_OK))
         except Exception as exception:
             # TODO(posborne): This is bad!  It isn't necessarily a socket exception!
             # Likely a socket exception, close it and raise an exception.
@@ -224,9 +391,11 @@ class PushSession(object):
         into a state such that it can be re-established later.
         """
         if self.socket is not None:
+            self.client._remove_session(self)
             self.socket.close()
             self.socket = None
-            self.data = None
+            self.bytes_read = 0
+            self.message_length = 0
 
 
 class SecurePushSession(PushSession):
@@ -236,7 +405,7 @@ class SecurePushSession(PushSession):
     in ca_certs member file.
     """
 
-    def __init__(self, callback, monitor_id, client, ca_certs=None):
+    def __init__(self, callback, monitor_id, client, ca_certs=None, max_batch_size=None):
         """
         Creates a PushSession wrapped in SSL for use with interacting with
         the device cloud push functionality.
@@ -249,8 +418,10 @@ class SecurePushSession(PushSession):
         :param ca_certs: Path to a file containing Certificates.
             If not provided, the devicecloud.crt file provided with the module will
             be used.  In most cases, the devicecloud.crt file should be acceptable.
+        :param max_batch_size: If not None, the callback is invoked with a list of
+            up to this many payloads.
         """
-        PushSession.__init__(self, callback, monitor_id, client)
+        PushSession.__init__(self, callback, monitor_id, client, max_batch_size)
         # Fall back on devicecloud.crt in the same path as this module if not
         # specified.
         if ca_certs is None:
@@ -288,13 +459,20 @@ class SecurePushSession(PushSession):
         self.send_connection_request()
 
 
+def _get_payload(raw_data):
+    """Decode a payload queued for a callback (waiting for it if it is being decoded elsewhere)"""
+    if isinstance(raw_data, six.binary_type):
+        return json.loads(raw_data.decode('utf-8'))
+    return raw_data.get()
+
+
 class CallbackWorkerPool(object):
     """
     A Worker Pool implementation that creates a number of predefined threads
     used for invoking Session callbacks.
     """
 
-    def __init__(self, write_queue=None, size=1):
+    def __init__(self, write_queue=None, size=1, queue_size=None):
         """
         Creates a Callback Worker Pool for use in invoking Session Callbacks
         when data is received by a push client.
@@ -302,12 +480,18 @@ class CallbackWorkerPool(object):
         :param write_queue: Queue used for queueing up socket write events
             for when a payload message is received and processed.
         :param size: The number of worker threads to invoke callbacks.
+        :param queue_size: The number of messages which may be queued before
+            :meth:`queue_callback` blocks (defaults to ``size``).
         """
         # Used to queue up PublishMessageReceived events to be sent back to
         # the iDigi server.
         self._write_queue = write_queue
-        # Used to queue up sessions and data to callback with.
-        self._queue = Queue(size)
+        # Used to queue up sessions and data to callback with.  For sessions
+        # with a batch callback, the data is held by the session and the
+        # queue is used to schedule its delivery.
+        self._queue = Queue(size if queue_size is None else queue_size)
+        # Guards the messages pending for batch sessions.
+        self._batch_condition = Condition()
         # Number of workers to create.
         self.size = size
         self.log = logging.getLogger('{}.callback_worker_pool'.format(__name__))
@@ -325,41 +509,77 @@ class CallbackWorkerPool(object):
         """
         while True:
             session, block_id, raw_data = self._queue.get()
-            data = json.loads(raw_data.decode('utf-8'))  # decode as JSON
-            try:
-                result = session.callback(data)
-                if result is None:
-                    self.log.warn("Callback %r returned None, expected boolean.  Messages "
-                                  "are not marked as received unless True is returned", session.callback)
-                elif result:
-                    # Send a Successful PublishMessageReceived with the
-                    # block id sent in request
-                    if self._write_queue is not None:
-                        response_message = struct.pack('!HHH',
-                                                       PUBLISH_MESSAGE_RECEIVED,
-                                                       block_id, 200)
-                        self._write_queue.put((session.socket, response_message))
-            except Exception as exception:
-                self.log.exception(exception)
-
+            if session.max_batch_size is None:
+                self._invoke_callback(session, [(block_id, raw_data)])
+            else:
+                self._consume_batches(session)
             self._queue.task_done()
 
+    def _consume_batches(self, session):
+        """Invoke a session's batch callback until no messages are pending for it
+
+        Only one worker delivers the batches for a session at a time so that
+        they are delivered in the order the messages were received.
+        """
+        while True:
+            with self._batch_condition:
+                if not session.pending:
+                    session.batch_scheduled = False
+                    return
+                batch, session.pending = session.pending, []
+                self._batch_condition.notify_all()
+            self._invoke_callback(session, batch)
+
+    def _invoke_callback(self, session, messages):
+        """Invoke the callback with a list of (block_id, raw_data) messages
+
+        The messages are acknowledged if the callback returned True.
+        """
+        try:
+            data = [_get_payload(raw_data) for _, raw_data in messages]
+            result = session.callback(data if session.max_batch_size is not None else data[0])
+            if result is None:
+                self.log.warn("Callback %r returned None, expected boolean.  Messages "
+                              "are not marked as received unless True is returned", session.callback)
+            elif result:
+                # Send a Successful PublishMessageReceived with the block id
+                # of each message, with a single write for the whole batch.
+                if self._write_queue is not None:
+                    self._write_queue.put((session.socket, six.b("").join(
+                        _publish_message_received(block_id) for block_id, _ in messages)))
+        except Exception as exception:
+            self.log.exception(exception)
+
     def queue_callback(self, session, block_id, data):
         """
         Queues up a callback event to occur for a session with the given
-        payload data.  Will block if the queue is full.
+        payload data.  Will block if the queue is full (or, for a session
+        with a batch callback, if a full batch is already pending).
 
         :param session: the session with a defined callback function to call.
         :param block_id: the block_id of the message received.
-        :param data: the data payload of the message received.
+        :param data: the data payload of the message received, or the
+            ``AsyncResult`` of decoding it in a decoder process.
         """
-        self._queue.put((session, block_id, data))
+        if session.max_batch_size is None:
+            self._queue.put((session, block_id, data))
+            return
+
+        with self._batch_condition:
+            while len(session.pending) >= session.max_batch_size:
+                self._batch_condition.wait()
+            session.pending.append((block_id, data))
+            if session.batch_scheduled:
+                # The worker delivering this session's batches will pick it up
+                return
+            session.batch_scheduled = True
+        self._queue.put((session, None, None))
 
 
 class TCPClientManager(object):
     """A Client for the 'Push' feature in the device cloud"""
 
-    def __init__(self, conn, secure=True, ca_certs=None, workers=1):
+    def __init__(self, conn, secure=True, ca_certs=None, workers=1, decoders=None):
         """
         Arbitrator for multiple TCP Client Sessions
 
@@ -369,21 +589,41 @@ class TCPClientManager(object):
             If not provided, the devicecloud.crt file provided with the module will
             be used.  In most cases, the devicecloud.crt file should be acceptable.
         :param workers: Number of workers threads to process callback calls.
+        :param decoders: If specified, the number of processes used to decompress
+            and decode messages.  By default this is done by the I/O thread and
+            the callback workers, which (being threads) share a single core.
+            This does not change the order in which callbacks receive messages.
+            As decoded messages are copied back from the decoder processes, this
+            only helps where there are cores to spare for the decoders.
         """
         self._conn = conn
         self._secure = secure
         self._ca_certs = ca_certs
 
-        # A dict mapping Sockets to their PushSessions
+        # A dict mapping socket file descriptors to their PushSessions
         self.sessions = {}
+        # Guards changes to the sessions and the sockets registered with the selector
+        self._sessions_lock = Lock()
+        # All session sockets (and the wakeup socket) are watched with a single
+        # selector.  Writing to _wakeup_send interrupts the I/O thread's wait (e.g.
+        # to stop).  These are only opened once the first session is added.
+        self._selector = None
+        self._wakeup_recv = self._wakeup_send = None
         # IO thread is used monitor sockets and consume data.
         self._io_thread = None
         # Writer thread is used to send data on sockets.
         self._writer_thread = None
         # Write queue is used to queue up data to write to sockets.
         self._write_queue = Queue()
+        # Processes used to decode messages (created before any threads are started).
+        self._decoder_pool = None
+        queue_size = workers
+        if decoders is not None:
+            self._decoder_pool = multiprocessing.Pool(decoders)
+            # Allow enough messages to be queued to keep the decoders busy
+            queue_size += 2 * decoders
         # A pool that monitors callback events and invokes them.
-        self._callback_pool = CallbackWorkerPool(self._write_queue, size=workers)
+        self._callback_pool = CallbackWorkerPool(self._write_queue, size=workers, queue_size=queue_size)
 
         self.closed = False
         self.log = logging.getLogger(__name__)
@@ -400,36 +640,85 @@ class TCPClientManager(object):
     def password(self):
         return self._conn.password
 
+    def _open_selector(self):
+        """Create the selector and wakeup sockets if they do not exist (with _sessions_lock held)"""
+        if self._selector is None:
+            self._selector = _new_selector()
+            self._wakeup_recv, self._wakeup_send = _socketpair()
+            self._wakeup_recv.setblocking(0)
+            self._wakeup_send.setblocking(0)
+            self._selector.register(self._wakeup_recv, _EVENT_READ, None)
+
+    def _wakeup(self):
+        """Interrupt the I/O thread if it is waiting for data"""
+        if self._wakeup_send is None:
+            return
+        try:
+            self._wakeup_send.send(six.b("\0"))
+        except socket.error:
+            pass  # the buffer is full, so a wakeup is already pending
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_recv.recv(4096):
+                pass
+        except socket.error:
+            pass
+
+    def _add_session(self, session):
+        """Start watching the socket of a (started) session for data"""
+        with self._sessions_lock:
+            self._open_selector()
+            self.sessions[session.socket.fileno()] = session
+            self._selector.register(session.socket, _EVENT_READ, session)
+        self._wakeup()  # so that the select() shim sees the new socket
+
+    def _remove_session(self, session):
+        """Stop watching the socket of a session (before it is closed)"""
+        with self._sessions_lock:
+            for fd, registered in list(self.sessions.items()):
+                if registered is session:
+                    del self.sessions[fd]
+            if self._selector is None:
+                return
+            try:
+                self._selector.unregister(session.socket)
+            except (KeyError, ValueError):
+                pass  # not registered
+
     def _restart_session(self, session):
         """Restarts and re-establishes session
 
         :param session: The session to restart
         """
-        # remove old session key, if socket is None, that means the
-        # session was closed by user and there is no need to restart.
+        # if socket is None, that means the session was closed by user
+        # and there is no need to restart.
         if session.socket is not None:
             self.log.info("Attempting restart session for Monitor Id %s."
                           % session.monitor_id)
-            del self.sessions[session.socket.fileno()]
             session.stop()
             session.start()
-            self.sessions[session.socket.fileno()] = session
+            self._add_session(session)
 
     def _writer(self):
         """
         Indefinitely checks the writer queue for data to write
         to socket.
         """
-        while not self.closed:
+        while True:
+            item = self._write_queue.get()
+            self._write_queue.task_done()
+            if item is _STOP_WRITER:
+                break
+            sock, data = item
             try:
-                sock, data = self._write_queue.get(timeout=0.1)
-                self._write_queue.task_done()
-                sock.send(data)
-            except Empty:
-                pass  # nothing to write after timeout
+                # a partial send would truncate the acknowledgements
+                _send_all(sock, data)
             except socket.error as err:
                 if err.errno == errno.EBADF:
                     self._clean_dead_sessions()
+                else:
+                    self.log.exception(err)
 
     def _clean_dead_sessions(self):
         """
@@ -437,98 +726,111 @@ class TCPClientManager(object):
         were removed (indicates a stopped session).
         In these cases, remove the session.
         """
-        for sck in list(self.sessions.keys()):
-            session = self.sessions[sck]
+        for session in list(self.sessions.values()):
             if session.socket is None:
-                del self.sessions[sck]
+                self._remove_session(session)
+
+    def _read_session(self, session):
+        """Consume data available on a session's socket, queueing any complete message"""
+        # If no defined message length, nothing has been
+        # consumed yet, parse the header.
+        if session.message_length == 0:
+            # Read header information before receiving rest of
+            # message.
+            response_type = _read_msg_header(session)
+            if response_type == NO_DATA:
+                # No data could be read, assume socket closed.
+                if session.socket is not None:
+                    self.log.error("Socket closed for Monitor %s." % session.monitor_id)
+                    self._restart_session(session)
+                return
+            elif response_type == INCOMPLETE:
+                # More Data to be read.  Continue.
+                return
+            elif response_type != PUBLISH_MESSAGE:
+                self.log.warn("Response Type (%x) does not match PublishMessage (%x)"
+                              % (response_type, PUBLISH_MESSAGE))
+                return
+
+        try:
+            if not _read_msg(session):
+                # Data not completely read, continue.
+                return
+        except PushException as err:
+            # If Socket is None, it was closed,
+            # otherwise it was closed when it shouldn't
+            # have been restart it.
+            session.bytes_read = 0
+            session.message_length = 0
+
+            if session.socket is None:
+                self._remove_session(session)
+            else:
+                self.log.exception(err)
+                self._restart_session(session)
+            return
+
+        # We received full payload, parse it (copying the payload out
+        # of the receive buffer) and clear session data.
+        if self._decoder_pool is None:
+            block_id, payload = _parse_publish_message(session.get_message_buffer())
+        else:
+            block_id, compression, payload = _split_publish_message(session.get_message_buffer())
+            payload = self._decoder_pool.apply_async(_decode_payload, (bytes(payload), compression))
+        session.bytes_read = 0
+        session.message_length = 0
+
+        # Enqueue payload into a callback queue to be
+        # invoked
+        self._callback_pool.queue_callback(session, block_id, payload)
 
     def _select(self):
         """
-        While the client is not marked as closed, performs a socket select
-        on all PushSession sockets.  If any data is received, parses and
+        While the client is not marked as closed, waits for data on all
+        PushSession sockets.  If any data is received, parses and
         forwards it on to the callback function.  If the callback is
         successful, a PublishMessageReceived message is sent.
+
+        The wait is interrupted (rather than timing out periodically) when
+        the client is stopped.
         """
         try:
             while not self.closed:
                 try:
-                    inputready =  select.select(self.sessions.keys(), [], [], 0.1)[0]
-                    for sock in inputready:
-                        session = self.sessions[sock]
-                        sck = session.socket
-
-                        if sck is None:
-                            # Socket has since been deleted, continue
-                            continue
-
-                        # If no defined message length, nothing has been
-                        # consumed yet, parse the header.
-                        if session.message_length == 0:
-                            # Read header information before receiving rest of
-                            # message.
-                            response_type = _read_msg_header(session)
-                            if response_type == NO_DATA:
-                                # No data could be read, assume socket closed.
-                                if session.socket is not None:
-                                    self.log.error("Socket closed for Monitor %s." % session.monitor_id)
-                                    self._restart_session(session)
-                                continue
-                            elif response_type == INCOMPLETE:
-                                # More Data to be read.  Continue.
-                                continue
-                            elif response_type != PUBLISH_MESSAGE:
-                                self.log.warn("Response Type (%x) does not match PublishMessage (%x)"
-                                              % (response_type, PUBLISH_MESSAGE))
-                                continue
-
-                        try:
-                            if not _read_msg(session):
-                                # Data not completely read, continue.
-                                continue
-                        except PushException as err:
-                            # If Socket is None, it was closed,
-                            # otherwise it was closed when it shouldn't
-                            # have been restart it.
-                            session.data = six.b("")
-                            session.message_length = 0
-
-                            if session.socket is None:
-                                del self.sessions[sck]
-                            else:
-                                self.log.exception(err)
-                                self._restart_session(session)
-                            continue
-
-                        # We received full payload,
-                        # clear session data and parse it.
-                        data =  session.data
-                        session.data = six.b("")
-                        session.message_length = 0
-                        block_id = struct.unpack('!H', data[0:2])[0]
-                        compression = struct.unpack('!B', data[4:5])[0]
-                        payload = data[10:]
-
-                        if compression == 0x01:
-                            # Data is compressed, uncompress it.
-                            payload = zlib.decompress(payload)
-
-                        # Enqueue payload into a callback queue to be
-                        # invoked
-                        self._callback_pool.queue_callback(session, block_id, payload)
-                except select.error as err:
+                    events = self._selector.select()
+                except (select.error, socket.error, OSError) as err:
                     # Evaluate sessions if we get a bad file descriptor, if
                     # socket is gone, delete the session.
                     if err.args[0] == errno.EBADF:
                         self._clean_dead_sessions()
-                except Exception as err:
-                    self.log.exception(err)
+                    elif err.args[0] != errno.EINTR:
+                        self.log.exception(err)
+                    continue
+
+                for key, _ in events:
+                    session = key.data
+                    if session is None:
+                        self._drain_wakeup()
+                        continue
+                    try:
+                        # SSL sockets may hold data which has already been received
+                        # (and so will not be reported by the selector) after a read
+                        while session.socket is not None:
+                            self._read_session(session)
+                            pending = getattr(session.socket, "pending", None)
+                            if pending is None or pending() == 0:
+                                break
+                    except Exception as err:
+                        self.log.exception(err)
         finally:
-            for session in self.sessions.values():
+            for session in list(self.sessions.values()):
                 if session is not None:
                     session.stop()
 
     def _init_threads(self):
         """Initializes the IO and Writer threads"""
+        with self._sessions_lock:
+            self._open_selector()
         if self._io_thread is None:
             self._io_thread = Thread(target=self._select)
             self._io_thread.start()
@@ -537,12 +839,19 @@ class TCPClientManager(object):
             self._writer_thread = Thread(target=self._writer)
             self._writer_thread.start()
 
-    def create_session(self, callback, monitor_id):
+    def create_session(self, callback, monitor_id, max_batch_size=None):
         """
         Creates and Returns a PushSession instance based on the input monitor
         and callback.  When data is received, callback will be invoked.
         If neither monitor or monitor_id are specified, throws an Exception.
 
+        If ``max_batch_size`` is specified, the callback is instead called with
+        a list of the payloads of all of the messages received since it was last
+        called (up to ``max_batch_size`` of them, in the order received) and all
+        of them are acknowledged with a single write if it returns True.  This
+        is useful when processing messages together is cheaper than processing
+        each one (e.g. inserting them into a database).
+
         :param callback: Callback function to call when PublishMessage
             messages are received. Expects 1 argument which will contain the
             payload of the pushed message.  Additionally, expects
@@ -550,13 +859,17 @@ class TCPClientManager(object):
             the message, False or None otherwise.
         :param monitor_id: The id of the Monitor, will be queried
             to understand parameters of the monitor.
+        :param int max_batch_size: The maximum number of payloads to pass to the callback
+            at once, or None to call the callback with each payload.
         """
+        if max_batch_size is not None and max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
         self.log.info("Creating Session for Monitor %s." % monitor_id)
-        session = SecurePushSession(callback, monitor_id, self, self._ca_certs) \
-            if self._secure else PushSession(callback, monitor_id, self)
+        session = SecurePushSession(callback, monitor_id, self, self._ca_certs, max_batch_size) \
+            if self._secure else PushSession(callback, monitor_id, self, max_batch_size)
 
         session.start()
-        self.sessions[session.socket.fileno()] = session
+        self._add_session(session)
 
         self._init_threads()
         return session
@@ -566,14 +879,26 @@ class TCPClientManager(object):
 
         Blocks until io and writer thread dies
         """
+        self.closed = True
         if self._io_thread is not None:
             self.log.info("Waiting for I/O thread to stop...")
-            self.closed = True
+            self._wakeup()
             self._io_thread.join()
 
         if self._writer_thread is not None:
             self.log.info("Waiting for Writer Thread to stop...")
-            self.closed = True
+            self._write_queue.put(_STOP_WRITER)
             self._writer_thread.join()
 
+        if self._decoder_pool is not None:
+            self._decoder_pool.close()
+            self._decoder_pool.join()
+
+        with self._sessions_lock:
+            if self._selector is not None:
+                self._selector.close()
+                self._wakeup_recv.close()
+                self._wakeup_send.close()
+                self._selector = None
+                self._wakeup_recv = self._wakeup_send = None
         self.log.info("All worker threads stopped.")
@@ -0,0 +1,241 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+r"""Module providing an asyncio implementation of the device cloud push protocol
+
+:class:`~devicecloud.monitor_tcp.TCPClientManager` receives the messages for
+TCP monitors using an I/O thread, a writer thread and a pool of callback
+threads.  For applications built on asyncio, an :class:`AsyncTCPClientManager`
+instead runs each :class:`AsyncPushSession` as a task on the event loop.
+Callbacks may be coroutine functions, are awaited as each message is received,
+and the message is acknowledged as soon as the callback returns True::
+
+    import asyncio
+    from devicecloud import DeviceCloud
+    from devicecloud.monitor_tcp_aio import AsyncTCPClientManager
+
+    dc = DeviceCloud('user', 'pass')
+    monitor = dc.monitor.create_tcp_monitor(['DataPoint'])
+
+    async def on_push(data):
+        await store(data)
+        return True  # acknowledge the message
+
+    async def main():
+        manager = AsyncTCPClientManager(dc.get_connection())
+        await manager.create_session(on_push, monitor.get_id())
+        await asyncio.sleep(3600)
+        await manager.stop()
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+Messages for a session are delivered to its callback one at a time, in the
+order that they were received.  If the connection is lost, the session is
+re-established after ``reconnect_delay`` seconds.
+
+This module requires Python 3.6+.
+
+"""
+import asyncio
+import inspect
+import json
+import logging
+import ssl
+import struct
+import zlib
+
+import pkg_resources
+from devicecloud.monitor_tcp import DEFAULT_CRT_NAME, PUBLISH_MESSAGE, PUSH_OPEN_PORT, PUSH_SECURE_PORT, \
+    PushException, _connection_request_message, _check_connection_response, _parse_publish_message, \
+    _publish_message_received
+
+logger = logging.getLogger(__name__)
+
+#: Seconds to wait before re-establishing a session whose connection was lost
+DEFAULT_RECONNECT_DELAY = 1.0
+
+# Seconds to wait for the ConnectionResponse after sending a ConnectionRequest
+CONNECTION_RESPONSE_TIMEOUT = 60
+
+# Errors after which a session is re-established (e.g. the connection was closed part way
+# through a message or the ConnectionResponse, or a malformed message length was received)
+_CONNECTION_ERRORS = (asyncio.IncompleteReadError, asyncio.TimeoutError, OSError, ValueError, PushException)
+
+
+class AsyncPushSession(object):
+    """A push session for a single monitor running as a task on the event loop
+
+    Sessions are created with :meth:`AsyncTCPClientManager.create_session`.
+
+    :param callback: The function (or coroutine function) to call with each message received.
+        The message is acknowledged if the callback returns (or its result is) True.
+    :param monitor_id: The id of the Monitor to observe.
+    :param client: The :class:`AsyncTCPClientManager` this session is derived from.
+    """
+
+    def __init__(self, callback, monitor_id, client):
+        self.callback = callback
+        self.monitor_id = monitor_id
+        self.client = client
+        self._reader = None
+        self._writer = None
+        self._task = None
+        self.log = logging.getLogger("%s.push_session.%s" % (__name__, monitor_id))
+
+    async def start(self):
+        """Connect to the device cloud and start receiving messages"""
+        if self._task is not None:
+            raise PushException("Session already started for %s." % self)
+        await self._connect()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stop receiving messages and close the connection"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._close_connection()
+
+    async def _connect(self):
+        self.log.info("Starting Session for Monitor %s." % self.monitor_id)
+        ssl_context = self.client._get_ssl_context()
+        port = PUSH_SECURE_PORT if ssl_context is not None else PUSH_OPEN_PORT
+        reader, writer = await asyncio.open_connection(self.client.hostname, port, ssl=ssl_context)
+        try:
+            writer.write(_connection_request_message(self.client.username, self.client.password,
+                                                     self.monitor_id))
+            response = await asyncio.wait_for(reader.readexactly(10), CONNECTION_RESPONSE_TIMEOUT)
+            status_code = _check_connection_response(response)
+        except Exception:
+            writer.close()
+            raise
+        self.log.info("Got ConnectionResponse for Monitor %s. Status %s." % (self.monitor_id, status_code))
+        self._reader, self._writer = reader, writer
+
+    def _close_connection(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self._receive_messages()
+            except _CONNECTION_ERRORS as err:
+                self.log.error("Connection lost for Monitor %s: %r" % (self.monitor_id, err))
+            self._close_connection()
+
+            # Re-establish the session, retrying until successful (or stopped)
+            while True:
+                await asyncio.sleep(self.client.reconnect_delay)
+                try:
+                    await self._connect()
+                    break
+                except _CONNECTION_ERRORS as err:
+                    self.log.error("Unable to restart session for Monitor %s: %r" % (self.monitor_id, err))
+
+    async def _receive_messages(self):
+        while True:
+            response_type, message_length = struct.unpack('!Hi', await self._reader.readexactly(6))
+            data = await self._reader.readexactly(message_length)
+            if response_type != PUBLISH_MESSAGE:
+                self.log.warning("Response Type (%x) does not match PublishMessage (%x)"
+                                 % (response_type, PUBLISH_MESSAGE))
+                continue
+            try:
+                block_id, payload = _parse_publish_message(data)
+                message = json.loads(payload.decode('utf-8'))
+            except (struct.error, zlib.error, ValueError) as err:
+                # the message is not acknowledged, but the session carries on
+                self.log.error("Unable to decode message for Monitor %s: %r" % (self.monitor_id, err))
+                continue
+            if await self._invoke_callback(message):
+                self._writer.write(_publish_message_received(block_id))
+                await self._writer.drain()
+
+    async def _invoke_callback(self, data):
+        try:
+            result = self.callback(data)
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception as exception:
+            self.log.exception(exception)
+            return False
+        if result is None:
+            self.log.warning("Callback %r returned None, expected boolean.  Messages "
+                             "are not marked as received unless True is returned", self.callback)
+        return bool(result)
+
+
+class AsyncTCPClientManager(object):
+    """Manage push sessions for TCP monitors on an asyncio event loop
+
+    :param conn: The :class:`devicecloud.DeviceCloudConnection` whose credentials are used
+    :param secure: Whether or not to create secure SSL wrapped sessions.
+    :param ca_certs: Path to a file containing Certificates.
+        If not provided, the devicecloud.crt file provided with the module will
+        be used.  In most cases, the devicecloud.crt file should be acceptable.
+    :param float reconnect_delay: Seconds to wait before re-establishing a lost session
+    """
+
+    def __init__(self, conn, secure=True, ca_certs=None, reconnect_delay=DEFAULT_RECONNECT_DELAY):
+        self._conn = conn
+        self._secure = secure
+        self._ca_certs = ca_certs
+        self._ssl_context = None
+        self.reconnect_delay = reconnect_delay
+        self.sessions = []
+
+    @property
+    def hostname(self):
+        return self._conn.hostname
+
+    @property
+    def username(self):
+        return self._conn.username
+
+    @property
+    def password(self):
+        return self._conn.password
+
+    def _get_ssl_context(self):
+        if not self._secure:
+            return None
+        if self._ssl_context is None:
+            ca_certs = self._ca_certs
+            if ca_certs is None:
+                ca_certs = pkg_resources.resource_filename("devicecloud.data", DEFAULT_CRT_NAME)
+            context = ssl.create_default_context(cafile=ca_certs)
+            # As with the threaded sessions, the server's certificate is validated
+            # against ca_certs but its name is not checked
+            context.check_hostname = False
+            self._ssl_context = context
+        return self._ssl_context
+
+    async def create_session(self, callback, monitor_id):
+        """Create and start an :class:`AsyncPushSession` for a monitor
+
+        :param callback: The function (or coroutine function) to call with each message
+            received.  It should return True if the message was processed, False or None
+            otherwise.
+        :param monitor_id: The id of the Monitor to observe.
+        :return: The started :class:`AsyncPushSession`
+        """
+        logger.info("Creating Session for Monitor %s." % monitor_id)
+        session = AsyncPushSession(callback, monitor_id, self)
+        await session.start()
+        self.sessions.append(session)
+        return session
+
+    async def stop(self):
+        """Stop all sessions"""
+        sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            await session.stop()
@@ -0,0 +1,306 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+r"""Module for computing rollups of raw data points locally
+
+The device cloud can roll up data points itself (see the ``rollup_interval``
+and ``rollup_method`` parameters of :meth:`devicecloud.streams.DataStream.read`)
+but only over a fixed set of intervals and for a single method per request.
+A :class:`RollupAggregator` instead computes rollups over any interval from
+raw data points as they are read.  The count, sum, average, minimum, maximum,
+and standard deviation of each interval are all computed in a single pass
+along with any requested percentiles.  Only a fixed amount of state is kept
+for each interval, so memory use depends on the number of intervals rather
+than the number of points.
+
+Most of the time, :meth:`devicecloud.streams.DataStream.rollup` will be used::
+
+    # 5 minute rollups with the median and 95th percentile of each interval
+    for record in stream.rollup(datetime.timedelta(minutes=5), percentiles=(50, 95),
+                                start_time=yesterday):
+        print(record.timestamp, record.average, record.max, record.percentiles[95])
+
+An aggregator may also be fed directly, which allows several rollups to be
+derived from points which were read only once::
+
+    columns = stream.read_columns(start_time=yesterday)
+    hourly = RollupAggregator(datetime.timedelta(hours=1))
+    hourly.add_columns(columns.timestamps, columns.values)
+
+Percentiles are estimated using the P-Square algorithm, which does not require
+the values in each interval to be kept.  Percentiles are exact for intervals
+with fewer than 50 points (and the 0th and 100th percentiles always are).
+
+"""
+import datetime
+import math
+from collections import namedtuple
+
+import six
+from devicecloud.util import dc_utc_timestamp_to_dt, dt_to_dc_utc_timestamp, validate_type
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+#: The rollup of the values in a single interval.  ``timestamp`` is the start of
+#: the interval and ``percentiles`` maps each requested percentile to its
+#: (estimated) value.  ``standarddev`` is the population standard deviation.
+RollupRecord = namedtuple('RollupRecord', ['timestamp', 'count', 'sum', 'average', 'min', 'max',
+                                           'standarddev', 'percentiles'])
+
+
+# Percentiles are computed exactly from the values of intervals with fewer values than this
+_EXACT_VALUES = 50
+
+
+class _PSquareEstimator(object):
+    """Estimate a quantile in constant space (Jain & Chlamtac's P-Square algorithm)
+
+    The first ``_EXACT_VALUES`` values are kept so that the quantile is exact
+    for small intervals.  The five markers are then initialised at the
+    minimum, p/2, p, (1+p)/2 and maximum quantiles of those values.
+    """
+
+    __slots__ = ('_p', '_heights', '_positions', '_desired', '_increments')
+
+    def __init__(self, p):
+        self._p = p
+        self._heights = []  # the first _EXACT_VALUES values, then the marker heights
+        self._positions = None
+
+    def _init_markers(self):
+        values = sorted(self._heights)
+        count = len(values)
+        p = self._p
+        quantiles = [0, p / 2, p, (1 + p) / 2, 1]
+        self._desired = [1 + (count - 1) * q for q in quantiles]
+        self._increments = quantiles
+        # the markers' positions must be distinct (and in order)
+        positions = [1] * 5
+        for i in range(1, 4):
+            positions[i] = min(max(int(round(self._desired[i])), positions[i - 1] + 1), count - 4 + i)
+        positions[4] = count
+        self._positions = positions
+        self._heights = [values[position - 1] for position in positions]
+
+    def add(self, value):
+        heights = self._heights
+        if self._positions is None:
+            heights.append(value)
+            if len(heights) == _EXACT_VALUES:
+                self._init_markers()
+            return
+
+        positions = self._positions
+        if value < heights[0]:
+            heights[0] = value
+            k = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= heights[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # adjust the heights of the middle markers if they are out of position
+        for i in (1, 2, 3):
+            d = self._desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + d * (heights[i + d] - heights[i]) / float(positions[i + d] - positions[i])
+                heights[i] = height
+                positions[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self._heights, self._positions
+        return q[i] + float(d) / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / float(n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / float(n[i] - n[i - 1]))
+
+    def get(self):
+        if self._positions is not None:
+            # the outer markers are the exact minimum and maximum
+            if self._p == 0:
+                return self._heights[0]
+            if self._p == 1:
+                return self._heights[4]
+            return self._heights[2]
+        # exact (linearly interpolated) for the few values seen so far
+        values = sorted(self._heights)
+        rank = self._p * (len(values) - 1)
+        lower = int(math.floor(rank))
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+class _Bucket(object):
+    """Running statistics for the values in one interval"""
+
+    __slots__ = ('count', 'sum', 'mean', 'm2', 'min', 'max', 'estimators')
+
+    def __init__(self, percentiles):
+        self.count = 0
+        self.sum = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+        self.min = None
+        self.max = None
+        self.estimators = [_PSquareEstimator(percentile / 100.0) for percentile in percentiles]
+
+    def add(self, value):
+        # Welford's method
+        self.count += 1
+        self.sum += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        for estimator in self.estimators:
+            estimator.add(value)
+
+    def merge(self, count, total, mean, m2, minimum, maximum):
+        """Combine the statistics of another group of values (excluding percentiles)"""
+        combined_count = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / combined_count
+        self.mean += delta * count / combined_count
+        self.count = combined_count
+        self.sum += total
+        self.min = minimum if self.min is None else min(self.min, minimum)
+        self.max = maximum if self.max is None else max(self.max, maximum)
+
+
+class RollupAggregator(object):
+    """Compute rollups of values over fixed time intervals
+
+    Values may be added in any order.  Intervals are aligned to ``origin`` (by
+    default the epoch, so 5 minute intervals start on the 5 minute marks of
+    the clock).
+
+    :param interval: The length of each interval
+    :type interval: :class:`datetime.timedelta`
+    :param percentiles: The percentiles (from 0 to 100) to estimate for each interval
+    :param origin: The time from which intervals are aligned (None for the epoch)
+    :type origin: :class:`datetime.datetime` or None
+
+    """
+
+    def __init__(self, interval, percentiles=(), origin=None):
+        interval = validate_type(interval, datetime.timedelta)
+        self._interval_ms = int(interval.total_seconds() * 1000)
+        if self._interval_ms < 1:
+            raise ValueError("interval must be at least one millisecond")
+        self._percentiles = tuple(percentiles)
+        for percentile in self._percentiles:
+            if not 0 <= percentile <= 100:
+                raise ValueError("Invalid percentile %r provided" % (percentile, ))
+        origin = validate_type(origin, datetime.datetime, type(None))
+        self._origin_ms = 0 if origin is None else dt_to_dc_utc_timestamp(origin)
+        self._buckets = {}  # interval index -> _Bucket
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _get_bucket(self, index):
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            bucket = self._buckets[index] = _Bucket(self._percentiles)
+        return bucket
+
+    def add(self, timestamp, value):
+        """Add a single value
+
+        :param timestamp: The time of the value as a datetime or milliseconds since the epoch
+        :param value: The (numeric) value
+
+        """
+        if isinstance(timestamp, datetime.datetime):
+            timestamp = dt_to_dc_utc_timestamp(timestamp)
+        self._get_bucket((int(timestamp) - self._origin_ms) // self._interval_ms).add(float(value))
+
+    def add_datapoints(self, datapoints, use_client_timeline=True):
+        """Add the data of each of an iterable of DataPoints (or CompactDataPoints)"""
+        for datapoint in datapoints:
+            if use_client_timeline:
+                timestamp = datapoint.get_timestamp()
+            else:
+                timestamp = datapoint.get_server_timestamp()
+            self.add(timestamp, datapoint.get_data())
+
+    def add_columns(self, timestamps, values):
+        """Add values from columns of timestamps (in milliseconds since the epoch) and values
+
+        The columns may be sequences or arrays such as those in a
+        :data:`~devicecloud.streams.DataPointColumns`.  If NumPy is installed, the
+        statistics for all of the values are computed in a vectorized fashion.
+
+        """
+        if numpy is None:
+            for timestamp, value in six.moves.zip(timestamps, values):
+                self.add(timestamp, value)
+            return
+
+        values = numpy.asarray(values, dtype='float64')
+        if len(values) == 0:
+            return
+        indices = (numpy.asarray(timestamps, dtype='int64') - self._origin_ms) // self._interval_ms
+        unique_indices, groups = numpy.unique(indices, return_inverse=True)
+        counts = numpy.bincount(groups)
+        sums = numpy.bincount(groups, weights=values)
+        means = sums / counts
+        m2s = numpy.bincount(groups, weights=(values - means[groups]) ** 2)
+        minimums = numpy.full(len(unique_indices), numpy.inf)
+        numpy.minimum.at(minimums, groups, values)
+        maximums = numpy.full(len(unique_indices), -numpy.inf)
+        numpy.maximum.at(maximums, groups, values)
+
+        buckets = [self._get_bucket(index) for index in unique_indices.tolist()]
+        for bucket, count, total, mean, m2, minimum, maximum in six.moves.zip(
+                buckets, counts.tolist(), sums.tolist(), means.tolist(), m2s.tolist(),
+                minimums.tolist(), maximums.tolist()):
+            bucket.merge(count, total, mean, m2, minimum, maximum)
+
+        if self._percentiles:
+            # the estimators must see each value in turn
+            for group, value in six.moves.zip(groups.tolist(), values.tolist()):
+                for estimator in buckets[group].estimators:
+                    estimator.add(value)
+
+    def get_records(self, newest_first=False):
+        """Get the rollup of each interval which has at least one value
+
+        :param bool newest_first: If True, the newest interval is first
+        :return: list of :data:`RollupRecord` ordered by interval
+
+        """
+        records = []
+        for index in sorted(self._buckets, reverse=newest_first):
+            bucket = self._buckets[index]
+            records.append(RollupRecord(
+                timestamp=dc_utc_timestamp_to_dt(self._origin_ms + index * self._interval_ms),
+                count=bucket.count,
+                sum=bucket.sum,
+                average=bucket.mean,
+                min=bucket.min,
+                max=bucket.max,
+                standarddev=math.sqrt(bucket.m2 / bucket.count),
+                percentiles=dict((percentile, estimator.get())
+                                 for percentile, estimator in zip(self._percentiles, bucket.estimators)),
+            ))
+        return records
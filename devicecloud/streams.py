@@ -5,16 +5,28 @@
 # Copyright (c) 2015 Digi International, Inc.
 
 r"""Module providing classes for interacting with device cloud data streams"""
+import array
+import bisect
 import json
 import logging
 import datetime
+import threading
+import time
+from collections import defaultdict, namedtuple, deque
 
 import six
 from devicecloud.apibase import APIBase
+from devicecloud.rollup import RollupAggregator
 from devicecloud import DeviceCloudException, DeviceCloudHttpException
 from devicecloud.util import conditional_write, to_none_or_dt, validate_type, isoformat, \
-    dc_utc_timestamp_to_dt
+    dc_utc_timestamp_to_dt, concurrent_map, iso8601_to_dt, monotonic, TTLCache
 from six import StringIO
+from six.moves.queue import Full
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 urllib = six.moves.urllib
@@ -43,6 +55,13 @@ ROLLUP_METHOD_STDDEV = "standarddev"
 
 MAXIMUM_DATAPOINTS_PER_POST = 250
 
+# Defaults for the stream metadata cache shared by the streams of a StreamsAPI
+DEFAULT_METADATA_CACHE_TTL = 300  # in seconds
+DEFAULT_METADATA_CACHE_SIZE = 10000
+
+# Beyond this many top level paths, get_current_values lists every stream at once
+MAX_STREAM_PATH_GROUPS = 20
+
 
 # Mapping in the following form:
 # <dc-type> -> (<dc-to-python-fn>, <python-to-dc-fn>)
@@ -91,6 +110,137 @@ def _get_decoder_method(stream_type):
         return lambda x: x
 
 
+# Templates used by datapoints_to_xml; these must produce the same output as DataPoint.to_xml
+_XML_STREAM_ID_FMT = "<DataPoint><streamId>{}</streamId>".format
+_XML_DATA_FMT = "<data>{}</data>".format
+_XML_DESCRIPTION_FMT = "<description>{}</description>".format
+_XML_TIMESTAMP_FMT = "<timestamp>{}</timestamp>".format
+_XML_QUALITY_FMT = "<quality>{}</quality>".format
+_XML_LOCATION_FMT = "<location>{}</location>".format
+_XML_STREAM_TYPE_FMT = "<streamType>{}</streamType>".format
+_XML_STREAM_UNITS_FMT = "<streamUnits>{}</streamUnits>".format
+
+
+def datapoints_to_xml(datapoints):
+    """Serialize a list of datapoints into a single ``<list>`` XML document
+
+    The result is the same as concatenating :meth:`DataPoint.to_xml` for each
+    point within ``<list>...</list>``, but the document is built in a single
+    pass.  Elements which are the same for every point in a stream (the stream
+    id, type, and units) are rendered once and reused, as are the type
+    converters for each data type.
+
+    :param list datapoints: The :class:`DataPoint` objects to serialize
+    :return: XML suitable for posting to ``/ws/DataPoint``
+    :rtype: str
+
+    """
+    parts = ["<list>"]
+    append = parts.append
+    prefixes = {}  # stream_id -> opening elements
+    suffixes = {}  # (data_type, units) -> closing elements
+    encoders = {}  # data_type -> encoder function
+    for dp in datapoints:
+        stream_id = dp._stream_id
+        prefix = prefixes.get(stream_id)
+        if prefix is None:
+            prefix = prefixes[stream_id] = _XML_STREAM_ID_FMT(stream_id)
+        append(prefix)
+
+        data_type = dp._data_type
+        encoder = encoders.get(data_type)
+        if encoder is None:
+            encoder = encoders[data_type] = _get_encoder_method(data_type)
+        append(_XML_DATA_FMT(encoder(dp._data)))
+
+        if dp._description is not None:
+            append(_XML_DESCRIPTION_FMT(dp._description))
+        if dp._timestamp is not None:
+            append(_XML_TIMESTAMP_FMT(isoformat(dp._timestamp)))
+        if dp._quality is not None:
+            append(_XML_QUALITY_FMT(dp._quality))
+        if dp._location is not None:
+            append(_XML_LOCATION_FMT(",".join(map(str, dp._location))))
+
+        units = dp._units
+        suffix = suffixes.get((data_type, units))
+        if suffix is None:
+            suffix = ""
+            if data_type is not None:
+                suffix += _XML_STREAM_TYPE_FMT(data_type)
+            if units is not None:
+                suffix += _XML_STREAM_UNITS_FMT(units)
+            suffix = suffixes[(data_type, units)] = suffix + "</DataPoint>"
+        append(suffix)
+    append("</list>")
+    return "".join(parts)
+
+
+#: The outcome of writing a single chunk of datapoints as part of a concurrent
+#: :meth:`StreamsAPI.bulk_write_datapoints`.  ``datapoints`` is the list of points
+#: in the chunk, ``response`` is the HTTP response on success (otherwise None), and
+#: ``exception`` is the exception raised while writing the chunk (otherwise None).
+BulkWriteResult = namedtuple('BulkWriteResult', ['datapoints', 'response', 'exception'])
+
+
+#: Column data read from a stream by :meth:`DataStream.read_columns`.  ``timestamps``
+#: and ``server_timestamps`` hold milliseconds since the epoch (UTC), ``qualities`` holds
+#: the quality of each point, and ``values`` holds the data.  Each column is a NumPy
+#: array if NumPy is installed or an :class:`array.array` otherwise.  Values for streams
+#: that are not numeric (e.g. STRING or JSON) are always a list.
+DataPointColumns = namedtuple('DataPointColumns', ['timestamps', 'server_timestamps', 'values', 'qualities'])
+
+#: The result of several rollup methods for one interval as read by
+#: :meth:`DataStream.read_rollups`.  ``timestamp`` is the start of the interval and
+#: the value for each rollup method requested is in the field of the same name
+#: (fields for methods that were not requested are None).
+MergedRollupRecord = namedtuple('MergedRollupRecord', ['timestamp', ROLLUP_METHOD_SUM, ROLLUP_METHOD_AVERAGE,
+                                                       ROLLUP_METHOD_MIN, ROLLUP_METHOD_MAX, ROLLUP_METHOD_COUNT,
+                                                       ROLLUP_METHOD_STDDEV])
+
+# array.array type codes for columns (Python 2 does not support 'q')
+try:
+    array.array('q')
+    _ARRAY_INT64_TYPECODE = 'q'
+except ValueError:  # pragma: no cover
+    _ARRAY_INT64_TYPECODE = 'd'
+
+# <dc-type> -> (<numpy dtype>, <array.array typecode>, <python type>)
+_NUMERIC_COLUMN_TYPES = {
+    STREAM_TYPE_INTEGER: ('int64', _ARRAY_INT64_TYPECODE, int),
+    STREAM_TYPE_LONG: ('int64', _ARRAY_INT64_TYPECODE, int),
+    STREAM_TYPE_FLOAT: ('float64', 'd', float),
+    STREAM_TYPE_DOUBLE: ('float64', 'd', float),
+}
+_TIMESTAMP_COLUMN_TYPE = ('int64', _ARRAY_INT64_TYPECODE, int)
+_QUALITY_COLUMN_TYPE = ('int32', 'i', int)
+
+
+class _ColumnBuilder(object):
+    """Accumulate column values a page at a time without creating per-point objects"""
+
+    def __init__(self, column_type):
+        self._dtype, self._typecode, self._pytype = column_type
+        if numpy is not None:
+            self._chunks = []
+        else:
+            self._array = array.array(self._typecode)
+
+    def extend(self, raw_values):
+        if numpy is not None:
+            # numpy performs the conversion from strings for the whole page at once
+            self._chunks.append(numpy.array(raw_values, dtype=self._dtype))
+        else:
+            self._array.extend(map(self._pytype, raw_values))
+
+    def build(self):
+        if numpy is not None:
+            if not self._chunks:
+                return numpy.array([], dtype=self._dtype)
+            return numpy.concatenate(self._chunks)
+        return self._array
+
+
 class StreamException(DeviceCloudException):
     """Base class for stream related exceptions"""
 
@@ -103,30 +253,143 @@ class InvalidRollupDatatype(StreamException):
     """Roll-up's are only valid on numerical data types"""
 
 
+def _common_stream_path(stream_ids):
+    """Return the longest stream path which includes all of the stream ids (or None)"""
+    common_segments = []
+    for segments in zip(*[stream_id.split('/') for stream_id in stream_ids]):
+        if any(segment != segments[0] for segment in segments):
+            break
+        common_segments.append(segments[0])
+    return '/'.join(common_segments) or None
+
+
+def _group_stream_paths(stream_ids, max_groups=MAX_STREAM_PATH_GROUPS):
+    """Group stream ids by their top level path, returning a dict of common path -> stream ids
+
+    Listing the common path of each group never lists streams unrelated to all
+    of the stream ids (as listing every stream would).  Stream ids are commonly
+    ``<deviceId>/<stream>`` though, so there is a group per device; beyond
+    ``max_groups`` groups, a single listing of every stream (path None) is used instead.
+    """
+    groups = defaultdict(set)
+    for stream_id in stream_ids:
+        groups[stream_id.split('/', 1)[0]].add(stream_id)
+    if len(groups) > max_groups:
+        return {None: set(stream_ids)}
+    return dict((_common_stream_path(group), group) for group in groups.values())
+
+
 class StreamsAPI(APIBase):
     """Provide interface for interacting with device cloud streams API
 
     For further information, see :mod:`devicecloud.streams`.
 
-    """
+    Metadata about streams (such as the data type) is kept in a cache shared by
+    all of the :class:`DataStream` objects created through this API so that new
+    stream objects for the same stream do not need to request it again.  Entries
+    expire after ``metadata_cache_ttl`` seconds and at most ``metadata_cache_size``
+    streams are kept (the least recently used being evicted first).
 
-    def __init__(self, *args, **kwargs):
-        APIBase.__init__(self, *args, **kwargs)
+    :param conn: The :class:`~devicecloud.DeviceCloudConnection` to use
+    :param float metadata_cache_ttl: Seconds for which stream metadata is cached
+    :param int metadata_cache_size: The maximum number of streams whose metadata is cached
+
+    """
 
-    def _get_streams(self, uri_suffix=None):
-        """Clear and update internal cache of stream objects"""
-        # TODO: handle paging, perhaps change this to be a generator
+    def __init__(self, conn, metadata_cache_ttl=DEFAULT_METADATA_CACHE_TTL,
+                 metadata_cache_size=DEFAULT_METADATA_CACHE_SIZE):
+        APIBase.__init__(self, conn)
+        self._metadata_cache = TTLCache(ttl=metadata_cache_ttl, max_size=metadata_cache_size)
+        # (sorted list of stream ids, {stream_id: stream_data}) from the last complete listing
+        self._stream_index = None
+
+    def _new_stream(self, stream_id, stream_data=None):
+        """Create a DataStream sharing this API's metadata cache, caching any data provided"""
+        if stream_data is not None:
+            self._metadata_cache.set(stream_id, stream_data)
+        return DataStream(self._conn, stream_id, stream_data, streams_api=self)
+
+    def _update_stream_metadata(self, stream_id, stream_data):
+        """Merge updated information about a stream (e.g. from a push monitor) into the cache"""
+        self._add_to_stream_index(stream_id)
+        cached_data = self._metadata_cache.get(stream_id)
+        if cached_data is None:
+            if "dataType" not in stream_data:
+                return  # only part of the metadata; the rest is requested by the stream if needed
+            cached_data = {"streamId": stream_id}
+        merged_data = dict(cached_data)
+        merged_data.update(stream_data)
+        self._metadata_cache.set(stream_id, merged_data)
+
+    def _invalidate_stream(self, stream_id, deleted=False):
+        """Discard cached information about a stream which has been created or deleted"""
+        self._metadata_cache.invalidate(stream_id)
+        if deleted:
+            stream_index = self._stream_index
+            if stream_index is not None and stream_id in stream_index[1]:
+                # copied rather than modified so iterators over the old index are unaffected
+                stream_ids = list(stream_index[0])
+                del stream_ids[bisect.bisect_left(stream_ids, stream_id)]
+                stream_data_by_id = dict(stream_index[1])
+                del stream_data_by_id[stream_id]
+                self._stream_index = (stream_ids, stream_data_by_id)
+
+    def _get_streams(self, uri_suffix=None, page_size=1000):
+        """Yield the JSON data for each stream, requesting one page at a time"""
         if uri_suffix is not None and not uri_suffix.startswith('/'):
             uri_suffix = '/' + uri_suffix
         elif uri_suffix is None:
             uri_suffix = ""
-        streams = {}
-        response = self._conn.get_json("/ws/DataStream{}".format(uri_suffix))
-        for stream_data in response["items"]:
-            stream_id = stream_data["streamId"]
-            stream = DataStream(self._conn, stream_id, stream_data)
-            streams[stream_id] = stream
-        return streams
+        query_parameters = {"size": page_size}
+        result_size = page_size
+        while result_size == page_size:
+            response = self._conn.get_json("/ws/DataStream{}?{}".format(
+                uri_suffix, urllib.parse.urlencode(query_parameters)))
+            items = response.get("items", [])
+            result_size = int(response.get("resultSize", len(items)))
+            if not response.get("pageCursor"):
+                result_size = 0  # there is no way to request another page
+            query_parameters["pageCursor"] = response.get("pageCursor")
+            for stream_data in items:
+                yield stream_data
+
+    def _sync_stream_index(self, page_size):
+        """Request all streams, updating the local index, and yield each stream's JSON data"""
+        stream_data_by_id = {}
+        for stream_data in self._get_streams(page_size=page_size):
+            stream_data_by_id[stream_data["streamId"]] = stream_data
+            yield stream_data
+        self._stream_index = (sorted(stream_data_by_id), stream_data_by_id)
+
+    def _iter_indexed_streams(self, stream_prefix, page_size):
+        """Yield a :class:`DataStream` for each stream in the local index starting with the prefix"""
+        if self._stream_index is None:
+            for _ in self._sync_stream_index(page_size):
+                pass
+        stream_ids, stream_data_by_id = self._stream_index
+        for i in range(bisect.bisect_left(stream_ids, stream_prefix), len(stream_ids)):
+            stream_id = stream_ids[i]
+            if not stream_id.startswith(stream_prefix):
+                break
+            # the index may be older than the shared cache, so it only fills in missing entries (and
+            # the data for streams created since the listing is requested by the stream if needed)
+            stream_data = self._metadata_cache.get(stream_id)
+            if stream_data is None:
+                stream_data = stream_data_by_id.get(stream_id)
+                if stream_data is not None:
+                    self._metadata_cache.set(stream_id, stream_data)
+            yield DataStream(self._conn, stream_id, stream_data, streams_api=self)
+
+    def _add_to_stream_index(self, stream_id):
+        """Add a newly created stream to the local index (if there is one)"""
+        stream_index = self._stream_index
+        if stream_index is not None and stream_id not in stream_index[1]:
+            # copied rather than modified so iterators over the old index are unaffected
+            stream_ids = list(stream_index[0])
+            bisect.insort(stream_ids, stream_id)
+            stream_data_by_id = dict(stream_index[1])
+            stream_data_by_id[stream_id] = None
+            self._stream_index = (stream_ids, stream_data_by_id)
 
     def create_stream(self, stream_id, data_type, description=None, data_ttl=None,
                       rollup_ttl=None, units=None):
@@ -169,19 +432,46 @@ class StreamsAPI(APIBase):
 
         self._conn.post("/ws/DataStream", sio.getvalue())
         logger.info("Data stream (%s) created successfully", stream_id)
-        stream = DataStream(self._conn, stream_id)
+        self._invalidate_stream(stream_id.lstrip('/'))
+        self._add_to_stream_index(stream_id.lstrip('/'))
+        stream = self._new_stream(stream_id.lstrip('/'))
         return stream
 
-    def get_streams(self, stream_prefix=None):
+    def get_streams(self, stream_prefix=None, use_cached=False, page_size=1000):
         """Return the iterator over streams preset on device cloud.
 
+        Streams are requested from the device cloud a page at a time as the iterator
+        is consumed.  When an iterator over all streams (without a prefix) is consumed
+        completely, the ids of the streams are kept in a local index.  If ``use_cached``
+        is True, streams are returned from that index (performing a listing of all
+        streams first if no such listing has been made) rather than being requested
+        again.  This makes repeated lookups by prefix inexpensive for accounts with a
+        large number of streams::
+
+            for stream in dc.streams.get_streams("sensors/building1/", use_cached=True):
+                print(stream.get_stream_id())
+
+        Streams created with :meth:`create_stream` are added to the index, but streams
+        created or deleted by other means after the last complete listing will not be
+        reflected in the results if ``use_cached`` is True.
+
         :param stream_prefix: An optional prefix to limit the iterator to; all streams are returned if it is not specified.
+        :param bool use_cached: If True, use the index from the last complete listing of streams
+        :param int page_size: The number of streams that should be requested in each page
 
         :return:  iterator over all :class:`.DataStream` instances on the device cloud
 
         """
-        # TODO: deal with paging.  We now return a generator, so the interface should look the same
-        return iter(self._get_streams(stream_prefix).values())
+        stream_prefix = validate_type(stream_prefix, type(None), *six.string_types)
+        use_cached = validate_type(use_cached, bool)
+        page_size = validate_type(page_size, *six.integer_types)
+        if use_cached:
+            return self._iter_indexed_streams((stream_prefix or "").lstrip('/'), page_size)
+        elif stream_prefix is None:
+            stream_datas = self._sync_stream_index(page_size)
+        else:
+            stream_datas = self._get_streams(stream_prefix, page_size)
+        return (self._new_stream(stream_data["streamId"], stream_data) for stream_data in stream_datas)
 
     def get_stream(self, stream_id):
         """Return a reference to a stream with the given ``stream_id``
@@ -198,7 +488,7 @@ class StreamsAPI(APIBase):
         :rtype: DataStream
 
         """
-        return DataStream(self._conn, stream_id)
+        return self._new_stream(validate_type(stream_id, *six.string_types).lstrip('/'))
 
     def get_stream_if_exists(self, stream_id):
         """Return a reference to a stream with the given ``stream_id`` if it exists
@@ -221,7 +511,121 @@ class StreamsAPI(APIBase):
         else:
             return stream
 
-    def bulk_write_datapoints(self, datapoints):
+    def get_current_values(self, stream_ids=None, stream_prefix=None, page_size=1000):
+        """Get the current value of many streams using as few requests as possible
+
+        Rather than requesting each stream individually (as
+        :meth:`DataStream.get_current_value` does), the current values are taken
+        from a paged listing of streams.  Either a list of ``stream_ids`` or a
+        ``stream_prefix`` may be provided.  For a list of stream ids, the ids are
+        grouped by their top level path and the streams under the longest path
+        shared by each group are listed, so the number of requests made is
+        smallest when related streams are requested together.  When the ids span
+        many top level paths (e.g. streams from many devices), every stream is
+        listed once instead::
+
+            values = dc.streams.get_current_values(["plant1/line%d/speed" % i for i in range(3000)])
+            for stream_id, datapoint in values.items():
+                print(stream_id, datapoint.get_data() if datapoint else None)
+
+        Metadata for every stream listed is also stored in the metadata cache.
+
+        :param stream_ids: An iterable of the ids of the streams whose current values are desired
+        :param str stream_prefix: A prefix of the streams whose current values are desired
+        :param int page_size: The number of streams that should be requested in each page
+        :raises ValueError: if both ``stream_ids`` and ``stream_prefix`` are specified
+        :return: dict mapping each stream id to its current value as a :class:`DataPoint` (or
+            None if nothing has been written to the stream).  Requested streams that do not
+            exist are not included.
+        :rtype: dict
+
+        """
+        stream_prefix = validate_type(stream_prefix, type(None), *six.string_types)
+        page_size = validate_type(page_size, *six.integer_types)
+        wanted_stream_ids = None
+        if stream_ids is not None:
+            if stream_prefix is not None:
+                raise ValueError("Only one of stream_ids or stream_prefix may be specified")
+            wanted_stream_ids = set(validate_type(stream_id, *six.string_types).lstrip('/')
+                                    for stream_id in stream_ids)
+            stream_paths = _group_stream_paths(wanted_stream_ids)
+        else:
+            stream_paths = {stream_prefix: None}
+
+        current_values = {}
+        for stream_path, wanted_stream_ids in stream_paths.items():
+            try:
+                for stream_data in self._get_streams(stream_path, page_size):
+                    stream_id = stream_data["streamId"]
+                    self._metadata_cache.set(stream_id, stream_data)
+                    if wanted_stream_ids is not None and stream_id not in wanted_stream_ids:
+                        continue
+                    stream = self._new_stream(stream_id)
+                    current_value = stream_data.get("currentValue")
+                    current_values[stream_id] = DataPoint.from_json(stream, current_value) if current_value else None
+            except DeviceCloudHttpException as http_exception:
+                if http_exception.response.status_code != 404:  # nothing exists under the path
+                    raise
+        return current_values
+
+    def read_many(self, streams, start_time=None, end_time=None, workers=8, batch=False, **read_kwargs):
+        """Read DataPoints from many streams concurrently
+
+        Rather than reading each stream one after another, the streams are read
+        by a pool of ``workers`` threads and results are yielded as soon as each
+        stream has been read completely (so not necessarily in the order provided)::
+
+            for stream_id, points in dc.streams.read_many(stream_ids, start_time=an_hour_ago, batch=True):
+                dashboard.update(stream_id, points)
+
+        The metadata of each stream (which is needed to decode its points) is
+        requested at most once per stream.  If :class:`DataStream` objects with
+        cached metadata (such as those returned by :meth:`get_streams`) are provided,
+        no metadata is requested at all.
+
+        :param streams: An iterable of stream ids or :class:`DataStream` objects to read
+        :param start_time: The start time for the window of data points to read (see :meth:`DataStream.read`)
+        :param end_time: The end time for the window of data points to read (see :meth:`DataStream.read`)
+        :param int workers: The maximum number of streams that will be read at once
+        :param bool batch: If True, yield ``(stream_id, [datapoint, ...])`` with all of the points
+            read from each stream rather than ``(stream_id, datapoint)`` for each point
+        :param read_kwargs: Additional keyword arguments for :meth:`DataStream.read`
+            (e.g. ``newest_first`` or ``compact``)
+        :raises NoSuchStreamException: if one of the streams does not exist
+        :returns: A generator over ``(stream_id, datapoint)`` or ``(stream_id, list)`` tuples
+
+        """
+        batch = validate_type(batch, bool)
+        streams = [stream if isinstance(stream, DataStream) else self.get_stream(stream)
+                   for stream in streams]
+
+        def read_stream(stream):
+            # cache the metadata once up front; read() relies upon the cached values
+            stream.get_data_type(use_cached=True)
+            return stream.get_stream_id(), list(stream.read(start_time=start_time, end_time=end_time,
+                                                            **read_kwargs))
+
+        for stream_id, points in concurrent_map(read_stream, streams, workers, ordered=False):
+            if batch:
+                yield stream_id, points
+            else:
+                for data_point in points:
+                    yield stream_id, data_point
+
+    def _write_datapoints_chunk(self, datapoints):
+        """Write a single chunk (of at most 250) datapoints, returning the response"""
+        response = self._conn.post("/ws/DataPoint", datapoints_to_xml(datapoints))
+        logger.info('DataPoint batch of %s datapoints written', len(datapoints))
+        return response
+
+    def _try_write_datapoints_chunk(self, datapoints):
+        try:
+            return BulkWriteResult(datapoints, self._write_datapoints_chunk(datapoints), None)
+        except Exception as exception:
+            logger.warning('DataPoint batch of %s datapoints failed: %s', len(datapoints), exception)
+            return BulkWriteResult(datapoints, None, exception)
+
+    def bulk_write_datapoints(self, datapoints, concurrency=None):
         """Perform a bulk write (or set of writes) of a collection of data points
 
         This method takes a list (or other iterable) of datapoints and writes them
@@ -250,37 +654,75 @@ class StreamsAPI(APIBase):
         Depending on the size of the list of datapoints provided, this method may
         need to make multiple calls to the device cloud (in chunks of 250).
 
+        If ``concurrency`` is specified, the chunks are posted concurrently by that
+        many threads sharing the connection's pooled HTTP session.  In this mode, a
+        failure to write one chunk does not prevent the others from being written;
+        instead, a list of :data:`BulkWriteResult` (one per chunk, in order) is returned
+        so that the caller may determine which points need to be retried::
+
+            results = dc.streams.bulk_write_datapoints(datapoints, concurrency=8)
+            failed = [dp for r in results if r.exception is not None for dp in r.datapoints]
+
+        Note that the underlying ``requests`` session keeps at most 10 connections
+        per host alive, so there is little benefit to a concurrency beyond that.
+
         :param list datapoints: a list of datapoints to be written to the device cloud
+        :param int concurrency: The number of chunks that may be in flight at once.  If
+            None (the default), chunks are written one after another.
         :raises TypeError: if a list of datapoints is not provided
         :raises ValueError: if any of the provided data points do not have all required
             information (such as information about the stream)
         :raises DeviceCloudHttpException: in the case of an unexpected error in communicating
-            with the device cloud.
+            with the device cloud (only if ``concurrency`` is not specified).
+        :return: None or, if ``concurrency`` is specified, a list of :data:`BulkWriteResult`
 
         """
         datapoints = list(datapoints)  # effectively performs validation that we have the right type
+        concurrency = validate_type(concurrency, type(None), *six.integer_types)
         for dp in datapoints:
             if not isinstance(dp, DataPoint):
                 raise TypeError("All items in the datapoints list must be DataPoints")
             if dp.get_stream_id() is None:
                 raise ValueError("stream_id must be set on all datapoints")
 
-        remaining_datapoints = datapoints
-        while remaining_datapoints:
-            # take up to 250 points and post them until complete
-            this_chunk_of_datapoints = remaining_datapoints[:MAXIMUM_DATAPOINTS_PER_POST]
-            remaining_datapoints = remaining_datapoints[MAXIMUM_DATAPOINTS_PER_POST:]
-
-            # Build XML list containing data for all points
-            datapoints_out = StringIO()
-            datapoints_out.write("<list>")
-            for dp in this_chunk_of_datapoints:
-                datapoints_out.write(dp.to_xml())
-            datapoints_out.write("</list>")
+        # take up to 250 points per chunk and post them until complete
+        chunks = [datapoints[i:i + MAXIMUM_DATAPOINTS_PER_POST]
+                  for i in range(0, len(datapoints), MAXIMUM_DATAPOINTS_PER_POST)]
 
-            # And send the HTTP Post
-            self._conn.post("/ws/DataPoint", datapoints_out.getvalue())
-            logger.info('DataPoint batch of %s datapoints written', len(this_chunk_of_datapoints))
+        if concurrency is None:
+            for chunk in chunks:
+                self._write_datapoints_chunk(chunk)
+        else:
+            return list(concurrent_map(self._try_write_datapoints_chunk, chunks, concurrency))
+
+
+def _datapoint_repr(class_name, datapoint):
+    """Build the repr of a :class:`DataPoint` or :class:`CompactDataPoint`"""
+    fmt = ("{class_name}(data={data!r}, "
+           "stream_id={stream_id!r}, "
+           "description={description!r}, "
+           "timestamp={timestamp!r}, "
+           "quality={quality!r}, "
+           "location={location!r}, "
+           "data_type={data_type!r}, "
+           "units={units!r}, "
+           "dp_id={dp_id!r}, "
+           "customer_id={customer_id!r}, "
+           "server_timestamp={server_timestamp!r})")
+    return fmt.format(
+        class_name=class_name,
+        data=datapoint.get_data(),
+        stream_id=datapoint.get_stream_id(),
+        description=datapoint.get_description(),
+        timestamp=datapoint.get_timestamp(),
+        quality=datapoint.get_quality(),
+        location=datapoint.get_location(),
+        data_type=datapoint.get_data_type(),
+        units=datapoint.get_units(),
+        dp_id=datapoint.get_id(),
+        customer_id=datapoint._customer_id,
+        server_timestamp=datapoint.get_server_timestamp()
+    )
 
 
 class DataPoint(object):
@@ -329,19 +771,22 @@ class DataPoint(object):
         :raises ValueError: if the data is malformed
         :return: (:class:`~DataPoint`) newly created :class:`~DataPoint`
         """
-        dp = cls.from_json(stream, json_data)
-
-        # Special handling for timestamp
-        timestamp = isoformat(dc_utc_timestamp_to_dt(int(json_data.get("timestamp"))))
-
-        # Special handling for data, all rollup data is float type
-        type_converter = _get_decoder_method(stream.get_data_type())
-        data = type_converter(float(json_data.get("data")))
+        data_type = stream.get_data_type()
+        return cls(
+            stream_id=stream.get_stream_id(),
+            data_type=data_type,
+            units=stream.get_units(),
 
-        # Update the special fields
-        dp.set_timestamp(timestamp)
-        dp.set_data(data)
-        return dp
+            # all rollup data is float type and the timestamp is taken directly from the
+            # epoch milliseconds, so each is only converted once
+            data=_get_decoder_method(data_type)(float(json_data.get("data"))),
+            timestamp=dc_utc_timestamp_to_dt(int(json_data.get("timestamp"))),
+            description=json_data.get("description"),
+            server_timestamp=json_data.get("serverTimestampISO"),
+            quality=json_data.get("quality"),
+            location=json_data.get("location"),
+            dp_id=json_data.get("id"),
+        )
 
     def __init__(self, data, stream_id=None, description=None, timestamp=None,
                  quality=None, location=None, data_type=None, units=None, dp_id=None,
@@ -374,30 +819,7 @@ class DataPoint(object):
         self._server_timestamp = to_none_or_dt(server_timestamp)
 
     def __repr__(self):
-        fmt = ("DataPoint(data={data!r}, "
-               "stream_id={stream_id!r}, "
-               "description={description!r}, "
-               "timestamp={timestamp!r}, "
-               "quality={quality!r}, "
-               "location={location!r}, "
-               "data_type={data_type!r}, "
-               "units={units!r}, "
-               "dp_id={dp_id!r}, "
-               "customer_id={customer_id!r}, "
-               "server_timestamp={server_timestamp!r})")
-        return fmt.format(
-            data=self.get_data(),
-            stream_id=self.get_stream_id(),
-            description=self.get_description(),
-            timestamp=self.get_timestamp(),
-            quality=self.get_quality(),
-            location=self.get_location(),
-            data_type=self.get_data_type(),
-            units=self.get_units(),
-            dp_id=self.get_id(),
-            customer_id=self._customer_id,
-            server_timestamp=self.get_server_timestamp()
-        )
+        return _datapoint_repr("DataPoint", self)
 
     def get_id(self):
         """Get the ID of this data point if available
@@ -597,12 +1019,188 @@ class DataPoint(object):
         return out.getvalue()
 
 
+class CompactDataPoint(object):
+    """Compact, read-only representation of a data point read from the device cloud
+
+    A :class:`DataPoint` validates each attribute as it is set and keeps its
+    attributes in a per-instance dictionary.  That is appropriate for points
+    being created by the application, but is wasteful for the (possibly very
+    many) points read back from the device cloud.  A :class:`CompactDataPoint`
+    uses ``__slots__`` and is constructed without any validation, which greatly
+    reduces the memory used when a large number of points are held at once.
+
+    Compact points provide the same ``get_*`` accessors as :class:`DataPoint`.
+    If a mutable :class:`DataPoint` is required (e.g. to modify the point and
+    write it back), one may be created with :meth:`to_datapoint`.  Compact points
+    are returned by :meth:`DataStream.read` when ``compact=True`` is specified.
+
+    The constructor trusts that the values provided are already of the correct
+    types (those returned by the accessors of :class:`DataPoint`); use
+    :meth:`from_json` to create a compact point from device cloud JSON data.
+
+    """
+
+    __slots__ = ('_stream_id', '_data', '_description', '_timestamp', '_quality', '_location',
+                 '_data_type', '_units', '_dp_id', '_customer_id', '_server_timestamp')
+
+    @classmethod
+    def from_json(cls, stream, json_data):
+        """Create a new CompactDataPoint from device cloud JSON data
+
+        :param DataStream stream: The :class:`~DataStream` out of which this data is coming
+        :param dict json_data: Deserialized JSON data from the device cloud about this data point
+        :raises ValueError: if the data is malformed
+        :return: (:class:`~CompactDataPoint`) newly created :class:`~CompactDataPoint`
+
+        """
+        data_type = stream.get_data_type()
+        type_converter = _get_decoder_method(data_type)
+        return cls(
+            data=type_converter(json_data.get("data")),
+            stream_id=stream.get_stream_id(),
+            description=json_data.get("description"),
+            timestamp=_trusted_iso8601_to_dt(json_data.get("timestampISO")),
+            quality=_trusted_quality(json_data.get("quality")),
+            location=_trusted_location(json_data.get("location")),
+            data_type=data_type,
+            units=stream.get_units(),
+            dp_id=json_data.get("id"),
+            server_timestamp=_trusted_iso8601_to_dt(json_data.get("serverTimestampISO")),
+        )
+
+    @classmethod
+    def from_rollup_json(cls, stream, json_data):
+        """Create a new CompactDataPoint from device cloud rollup JSON data
+
+        :param DataStream stream: The :class:`~DataStream` out of which this data is coming
+        :param dict json_data: Deserialized JSON data from the device cloud about this data point
+        :raises ValueError: if the data is malformed
+        :return: (:class:`~CompactDataPoint`) newly created :class:`~CompactDataPoint`
+
+        """
+        data_type = stream.get_data_type()
+        return cls(
+            # See DataPoint.from_rollup_json; all rollup data is float type
+            data=_get_decoder_method(data_type)(float(json_data.get("data"))),
+            stream_id=stream.get_stream_id(),
+            description=json_data.get("description"),
+            timestamp=dc_utc_timestamp_to_dt(int(json_data.get("timestamp"))),
+            quality=_trusted_quality(json_data.get("quality")),
+            location=_trusted_location(json_data.get("location")),
+            data_type=data_type,
+            units=stream.get_units(),
+            dp_id=json_data.get("id"),
+            server_timestamp=_trusted_iso8601_to_dt(json_data.get("serverTimestampISO")),
+        )
+
+    def __init__(self, data, stream_id=None, description=None, timestamp=None,
+                 quality=None, location=None, data_type=None, units=None, dp_id=None,
+                 customer_id=None, server_timestamp=None):
+        self._data = data
+        self._stream_id = stream_id
+        self._description = description
+        self._timestamp = timestamp
+        self._quality = quality
+        self._location = location
+        self._data_type = data_type
+        self._units = units
+        self._dp_id = dp_id
+        self._customer_id = customer_id
+        self._server_timestamp = server_timestamp
+
+    def __repr__(self):
+        return _datapoint_repr("CompactDataPoint", self)
+
+    def to_datapoint(self):
+        """Create a mutable :class:`DataPoint` with the same information as this point
+
+        :return: (:class:`~DataPoint`) newly created :class:`~DataPoint`
+
+        """
+        return DataPoint(
+            data=self._data,
+            stream_id=self._stream_id,
+            description=self._description,
+            timestamp=self._timestamp,
+            quality=self._quality,
+            location=self._location,
+            data_type=self._data_type,
+            units=self._units,
+            dp_id=self._dp_id,
+            customer_id=self._customer_id,
+            server_timestamp=self._server_timestamp,
+        )
+
+    def get_id(self):
+        """Get the ID of this data point"""
+        return self._dp_id
+
+    def get_data(self):
+        """Get the actual data value associated with this data point"""
+        return self._data
+
+    def get_stream_id(self):
+        """Get the stream ID for this data point"""
+        return self._stream_id
+
+    def get_description(self):
+        """Get the description associated with this data point if available"""
+        return self._description
+
+    def get_timestamp(self):
+        """Get the timestamp of this datapoint as a :class:`datetime.datetime` object"""
+        return self._timestamp
+
+    def get_server_timestamp(self):
+        """Get the date and time at which the server received this data point"""
+        return self._server_timestamp
+
+    def get_quality(self):
+        """Get the quality as an integer (or None)"""
+        return self._quality
+
+    def get_location(self):
+        """Get the location for this data point as None or a 3-tuple of floats"""
+        return self._location
+
+    def get_data_type(self):
+        """Get the data type for this data point"""
+        return self._data_type
+
+    def get_units(self):
+        """Get the units of this datapoints stream if available"""
+        return self._units
+
+
+def _trusted_iso8601_to_dt(iso8601):
+    return None if iso8601 is None else iso8601_to_dt(iso8601)
+
+
+def _trusted_quality(quality):
+    return None if quality is None else int(quality)
+
+
+def _trusted_location(location):
+    if isinstance(location, six.string_types):  # from device cloud, convert from csv
+        parts = location.split(",")
+        if len(parts) != 3:
+            raise ValueError("Location string %r has unexpected format" % location)
+        return tuple(map(float, parts))
+    return location
+
+
 class DataStream(object):
-    """Encapsulation of a DataStream's methods and attributes"""
+    """Encapsulation of a DataStream's methods and attributes
+
+    Streams should generally be obtained from a :class:`StreamsAPI` (e.g. with
+    :meth:`StreamsAPI.get_stream`) in which case metadata about the stream is
+    shared with other stream objects through the API's metadata cache.
+
+    """
 
     # TODO: Add ability to modify stream metadata (e.g. set_data_ttl, etc.)
 
-    def __init__(self, conn, stream_id, cached_data=None):
+    def __init__(self, conn, stream_id, cached_data=None, streams_api=None):
         if not isinstance(cached_data, (type(None), dict)):
             raise TypeError("cached_data should be dict or None")
 
@@ -611,6 +1209,7 @@ class DataStream(object):
         self._conn = conn
         self._stream_id = stream_id  # Invariant: string with any leading '/' stripped
         self._cached_data = cached_data
+        self._streams_api = streams_api  # Invariant: StreamsAPI whose metadata cache is shared or None
 
     def __repr__(self):
         # Provide a repr.  We want to avoid making an HTTP request here as that
@@ -639,6 +1238,10 @@ class DataStream(object):
 
     def _get_stream_metadata(self, use_cached):
         """Retrieve metadata about this stream from the device cloud"""
+        if use_cached and self._streams_api is not None:
+            # read through the shared cache, which may have been updated or invalidated
+            # (e.g. by a push monitor or a delete) since this object last looked
+            self._cached_data = self._streams_api._metadata_cache.get(self._stream_id)
         if self._cached_data is None or not use_cached:
             try:
                 self._cached_data = self._conn.get_json("/ws/DataStream/%s" % self._stream_id)["items"][0]
@@ -646,6 +1249,8 @@ class DataStream(object):
                 if http_exception.response.status_code == 404:
                     raise NoSuchStreamException("Stream with id %r has not been created" % self._stream_id)
                 raise http_exception
+            if self._streams_api is not None:
+                self._streams_api._metadata_cache.set(self._stream_id, self._cached_data)
         return self._cached_data
 
     def get_stream_id(self):
@@ -780,9 +1385,18 @@ class DataStream(object):
             self._conn.delete("/ws/DataStream/{}".format(self.get_stream_id()))
         except DeviceCloudHttpException as http_excpeption:
             if http_excpeption.response.status_code == 404:
+                self._discard_deleted()
                 raise NoSuchStreamException()  # this branch is present, but the DC appears to just return 200 again
             else:
                 raise http_excpeption
+        else:
+            self._discard_deleted()
+
+    def _discard_deleted(self):
+        """Discard the cached information about this stream once it no longer exists"""
+        self._cached_data = None
+        if self._streams_api is not None:
+            self._streams_api._invalidate_stream(self._stream_id, deleted=True)
 
     def delete_datapoint(self, datapoint):
         """Delete the provided datapoint from this stream
@@ -850,15 +1464,9 @@ class DataStream(object):
             this_chunk_of_datapoints = remaining_datapoints[:MAXIMUM_DATAPOINTS_PER_POST]
             remaining_datapoints = remaining_datapoints[MAXIMUM_DATAPOINTS_PER_POST:]
 
-            # Build XML list containing data for all points
-            datapoints_out = StringIO()
-            datapoints_out.write("<list>")
-            for dp in this_chunk_of_datapoints:
-                datapoints_out.write(dp.to_xml())
-            datapoints_out.write("</list>")
-
             # And send the HTTP Post
-            self._conn.post("/ws/DataPoint/{}".format(self.get_stream_id()), datapoints_out.getvalue())
+            self._conn.post("/ws/DataPoint/{}".format(self.get_stream_id()),
+                            datapoints_to_xml(this_chunk_of_datapoints))
             logger.info('DataPoint batch of %s datapoints written to stream %s',
                         len(this_chunk_of_datapoints), self.get_stream_id())
 
@@ -885,7 +1493,8 @@ class DataStream(object):
         self._conn.post("/ws/DataPoint/{}".format(self.get_stream_id()), datapoint.to_xml())
 
     def read(self, start_time=None, end_time=None, use_client_timeline=True, newest_first=True,
-             rollup_interval=None, rollup_method=None, timezone=None, page_size=1000):
+             rollup_interval=None, rollup_method=None, timezone=None, page_size=1000, compact=False,
+             cache=None, streaming=False):
         """Read one or more DataPoints from a stream
 
         .. warning::
@@ -929,10 +1538,341 @@ class DataStream(object):
         :param int page_size: The number of results that we should attempt to retrieve from the
             device cloud in each page.  Generally, this can be left at its default value unless
             you have a good reason to change the parameter for performance reasons.
+        :param bool compact: If True, yield read-only :class:`CompactDataPoint` objects rather
+            than :class:`DataPoint` objects.  This uses much less memory when many points
+            are kept.
+        :param cache: A :class:`~devicecloud.streams_cache.SQLiteDataPointCache` in which
+            points read are stored.  Only the parts of the time window not already in the
+            cache are requested from the device cloud.  Caching is not supported for rollups.
+        :param bool streaming: If True, each page is parsed incrementally so that points are
+            yielded as they are received rather than once the whole page has been received.
+            This bounds the memory used for pages of large points (e.g. JSON streams).
+        :returns: A generator object which one can iterate over the DataPoints read.
+
+        """
+
+        query_parameters, is_rollup = self._get_read_query_parameters(
+            start_time, end_time, use_client_timeline, newest_first,
+            rollup_interval, rollup_method, timezone, page_size)
+        point_class = CompactDataPoint if validate_type(compact, bool) else DataPoint
+
+        if cache is None:
+            items = self._iter_read_items(query_parameters, validate_type(streaming, bool))
+        elif is_rollup:
+            raise ValueError("Rollups cannot be read using a cache")
+        else:
+            items = cache.read_items(self, start_time, end_time, use_client_timeline, newest_first, page_size)
+
+        for item_info in items:
+            if is_rollup:
+                data_point = point_class.from_rollup_json(self, item_info)
+            else:
+                data_point = point_class.from_json(self, item_info)
+            yield data_point
+
+    def follow(self, poll_interval=1.0, max_poll_interval=30.0, backoff_coefficient=1.5, start_time=None,
+               use_client_timeline=False, page_size=1000, compact=False):
+        """Yield DataPoints as they are written to this stream (like ``tail -f``)
+
+        The stream is polled for points newer than the last point seen, so only
+        new points are transferred on each poll.  Points at the boundary between
+        one poll and the next are only yielded once.  Points are yielded as each
+        page is received and the stream is polled again ``poll_interval`` seconds
+        after a poll which found new points.  While no new points are found, the
+        delay between polls grows by a factor of ``backoff_coefficient`` up to
+        ``max_poll_interval`` and returns to ``poll_interval`` as soon as new
+        points are seen::
+
+            for dp in stream.follow(poll_interval=2.0):
+                print(dp.get_server_timestamp(), dp.get_data())
+
+        The generator never finishes on its own; stop iterating (e.g. with ``break``)
+        to stop following the stream.
+
+        :param float poll_interval: The minimum number of seconds between polls
+        :param float max_poll_interval: The maximum number of seconds between polls while idle
+        :param float backoff_coefficient: The factor by which the interval grows for each idle poll
+        :param start_time: Points from this time onward are yielded.  If None, only points
+            written after the current value of the stream are yielded.
+        :type start_time: :class:`datetime.datetime` or None
+        :param bool use_client_timeline: If True, points are followed by their client
+            timestamp rather than the time they were received by the server.  Points
+            written late with an older client timestamp will be missed in this case.
+        :param int page_size: See :meth:`read`
+        :param bool compact: See :meth:`read`
+        :raises devicecloud.streams.NoSuchStreamException: if this stream has not yet been created
+        :returns: A generator object which one can iterate over the new DataPoints
+
+        """
+        start_time = to_none_or_dt(validate_type(start_time, datetime.datetime, type(None)))
+        use_client_timeline = validate_type(use_client_timeline, bool)
+        if use_client_timeline:
+            get_point_time = lambda dp: dp.get_timestamp()
+        else:
+            get_point_time = lambda dp: dp.get_server_timestamp()
+
+        last_time = start_time
+        boundary_ids = set()  # ids of the points already seen at last_time
+        if last_time is None:
+            current_value = self.get_current_value()
+            if current_value is not None:
+                last_time = get_point_time(current_value)
+                boundary_ids.add(current_value.get_id())
+
+        delay = poll_interval
+        while True:
+            found_points = False
+            for dp in self.read(start_time=last_time, use_client_timeline=use_client_timeline,
+                                newest_first=False, page_size=page_size, compact=compact):
+                if dp.get_id() in boundary_ids:
+                    continue
+                found_points = True
+                point_time = get_point_time(dp)
+                if point_time != last_time:
+                    last_time = point_time
+                    boundary_ids = set()
+                boundary_ids.add(dp.get_id())
+                yield dp
+
+            if found_points:
+                delay = poll_interval
+            time.sleep(delay)
+            delay = min(delay * backoff_coefficient, max_poll_interval)
+
+    def read_partitioned(self, start_time, end_time, partitions=8, workers=None, ordered=True,
+                         use_client_timeline=True, newest_first=True, page_size=1000, compact=False):
+        """Read DataPoints from a time window by reading several sub-windows concurrently
+
+        :meth:`read` pages through a result set one page at a time as each page
+        includes the cursor for the next.  When reading a long period of history,
+        this method instead splits ``[start_time, end_time)`` into ``partitions``
+        sub-windows of equal length which are each paged through (with their own
+        cursor) by a pool of ``workers`` threads::
+
+            points = stream.read_partitioned(start_time=last_year, end_time=now,
+                                             partitions=24, workers=8, newest_first=False)
+            for dp in points:
+                archive(dp)
+
+        If ``ordered`` is True (the default), points are yielded in the same order
+        as :meth:`read` would have yielded them.  Otherwise, the points of each
+        sub-window are yielded (in order) as soon as that sub-window has been read,
+        regardless of the order of the sub-windows.
+
+        Each sub-window is read completely before any of its points are yielded, so
+        enough partitions should be used for a sub-window to fit comfortably in memory.
+        Rollups are not supported as rollup intervals would not, in general, line up
+        with the sub-windows.
+
+        :param start_time: The (inclusive) start of the window of data points to read
+        :type start_time: :class:`datetime.datetime`
+        :param end_time: The (exclusive) end of the window of data points to read
+        :type end_time: :class:`datetime.datetime`
+        :param int partitions: The number of sub-windows into which the window is split
+        :param int workers: The number of sub-windows read at once.  Defaults to ``partitions``.
+        :param bool ordered: Whether points should be yielded in order (see above)
+        :param bool use_client_timeline: See :meth:`read`
+        :param bool newest_first: See :meth:`read`
+        :param int page_size: See :meth:`read`
+        :param bool compact: See :meth:`read`
+        :raises ValueError: if ``end_time`` is not after ``start_time`` or ``partitions`` is
+            not positive
         :returns: A generator object which one can iterate over the DataPoints read.
 
         """
+        start_time = to_none_or_dt(validate_type(start_time, datetime.datetime))
+        end_time = to_none_or_dt(validate_type(end_time, datetime.datetime))
+        partitions = validate_type(partitions, *six.integer_types)
+        workers = validate_type(workers, type(None), *six.integer_types)
+        ordered = validate_type(ordered, bool)
+        if end_time <= start_time:
+            raise ValueError("end_time must be after start_time")
+        if partitions < 1:
+            raise ValueError("partitions must be at least 1")
+        if workers is None:
+            workers = partitions
+
+        # sub-windows are a whole number of milliseconds (the resolution of the device cloud)
+        window_ms = int((end_time - start_time).total_seconds() * 1000)
+        step = datetime.timedelta(milliseconds=max(1, window_ms // partitions))
+        boundaries = [start_time + step * i for i in range(partitions) if step * i < end_time - start_time]
+        boundaries.append(end_time)
+        windows = list(zip(boundaries[:-1], boundaries[1:]))
+        if newest_first:
+            windows.reverse()
+
+        # Make sure the stream metadata needed to decode points is cached before
+        # the workers start so that they do not all request it at once
+        self.get_data_type(use_cached=True)
+
+        def read_window(window):
+            return list(self.read(start_time=window[0], end_time=window[1],
+                                  use_client_timeline=use_client_timeline, newest_first=newest_first,
+                                  page_size=page_size, compact=compact))
+
+        for points in concurrent_map(read_window, windows, workers, ordered=ordered):
+            for data_point in points:
+                yield data_point
+
+    def read_columns(self, start_time=None, end_time=None, use_client_timeline=True, newest_first=True,
+                     rollup_interval=None, rollup_method=None, timezone=None, page_size=1000):
+        """Read DataPoints from a stream into columns rather than individual objects
+
+        This accepts the same parameters as :meth:`read` but, instead of yielding a
+        :class:`DataPoint` for each point, the entire result set is collected into
+        a :data:`DataPointColumns` containing a column each for the timestamps,
+        server timestamps, values, and qualities of the points.  No object is created
+        for each point and timestamps are taken from the epoch millisecond values
+        provided by the device cloud rather than parsed from ISO-8601, which makes this
+        considerably cheaper when reading a large number of points::
+
+            columns = stream.read_columns(start_time=yesterday, newest_first=False)
+            print(columns.values.mean())  # with numpy installed
+            times = columns.timestamps.astype('datetime64[ms]')
+
+        If NumPy is installed, the columns are NumPy arrays.  Otherwise they are
+        compact :class:`array.array` buffers.  Values for non-numeric streams are
+        returned as a list (after the same type conversion performed by :meth:`read`).
+
+        :return: The columns for all points in the requested range
+        :rtype: :data:`DataPointColumns`
+
+        """
+        query_parameters, is_rollup = self._get_read_query_parameters(
+            start_time, end_time, use_client_timeline, newest_first,
+            rollup_interval, rollup_method, timezone, page_size)
+
+        data_type = self.get_data_type(use_cached=True)
+        if is_rollup:
+            value_type = _NUMERIC_COLUMN_TYPES[STREAM_TYPE_DOUBLE]  # all rollup data is float type
+        else:
+            value_type = _NUMERIC_COLUMN_TYPES.get(data_type)
+
+        timestamps = _ColumnBuilder(_TIMESTAMP_COLUMN_TYPE)
+        server_timestamps = _ColumnBuilder(_TIMESTAMP_COLUMN_TYPE)
+        qualities = _ColumnBuilder(_QUALITY_COLUMN_TYPE)
+        if value_type is not None:
+            values = _ColumnBuilder(value_type)
+        else:
+            values = []
+            decoder = _get_decoder_method(data_type)
+
+        for items in self._iter_read_pages(query_parameters):
+            page_timestamps = [item["timestamp"] for item in items]
+            timestamps.extend(page_timestamps)
+            # rollup data does not include a server timestamp
+            server_timestamps.extend([item.get("serverTimestamp", ts)
+                                      for item, ts in zip(items, page_timestamps)])
+            qualities.extend([item.get("quality") or 0 for item in items])
+            if value_type is not None:
+                values.extend([item["data"] for item in items])
+            else:
+                values.extend([decoder(item.get("data")) for item in items])
+
+        return DataPointColumns(
+            timestamps=timestamps.build(),
+            server_timestamps=server_timestamps.build(),
+            values=values.build() if value_type is not None else values,
+            qualities=qualities.build(),
+        )
+
+    def read_rollups(self, rollup_interval, rollup_methods=(ROLLUP_METHOD_MIN, ROLLUP_METHOD_MAX, ROLLUP_METHOD_AVERAGE),
+                     start_time=None, end_time=None, use_client_timeline=True, newest_first=True, timezone=None,
+                     page_size=1000, workers=None):
+        """Read several device cloud rollups of this stream at once, merged by interval
+
+        The device cloud computes a single rollup method per request.  This requests
+        each of ``rollup_methods`` concurrently and combines the results into one
+        record for each interval::
+
+            for record in stream.read_rollups(ROLLUP_INTERVAL_HOUR, start_time=yesterday):
+                print(record.timestamp, record.min, record.max, record.average)
+
+        No :class:`DataPoint` objects are created; timestamps are taken from the
+        epoch milliseconds in each result.  As with :meth:`read`, values are
+        converted to the data type of the stream (counts are always ints).
+
+        :param str rollup_interval: The roll-up interval (see :meth:`read`)
+        :param rollup_methods: The roll-up methods to read (see :meth:`read`)
+        :param int workers: The number of requests made at once (by default, one per method)
+        :return: list of :data:`MergedRollupRecord` ordered by interval.  An interval
+            for which only some of the methods returned a value has None for the others.
+
+        The remaining parameters are the same as for :meth:`read`.
+
+        """
+        rollup_methods = list(rollup_methods)
+        if not rollup_methods:
+            raise ValueError("At least one rollup method must be provided")
+        queries = [self._get_read_query_parameters(
+            start_time, end_time, use_client_timeline, newest_first,
+            rollup_interval, rollup_method, timezone, page_size)[0] for rollup_method in rollup_methods]
+        decoder = _get_decoder_method(self.get_data_type(use_cached=True))
+
+        def read_method(method_query):
+            rollup_method, query_parameters = method_query
+            # all rollup data is float type
+            convert = int if rollup_method == ROLLUP_METHOD_COUNT else decoder
+            return [(int(item["timestamp"]), convert(float(item["data"])))
+                    for item in self._iter_read_items(query_parameters)]
+
+        values_by_timestamp = {}
+        for rollup_method, results in zip(rollup_methods, concurrent_map(
+                read_method, list(zip(rollup_methods, queries)), workers=workers or len(queries))):
+            for timestamp, value in results:
+                values_by_timestamp.setdefault(timestamp, {})[rollup_method] = value
+
+        empty = dict.fromkeys(MergedRollupRecord._fields)
+        records = []
+        for timestamp in sorted(values_by_timestamp, reverse=newest_first):
+            fields = dict(empty, **values_by_timestamp[timestamp])
+            fields["timestamp"] = dc_utc_timestamp_to_dt(timestamp)
+            records.append(MergedRollupRecord(**fields))
+        return records
+
+    def rollup(self, interval, percentiles=(), start_time=None, end_time=None, use_client_timeline=True,
+               newest_first=False, origin=None, page_size=1000):
+        """Read raw DataPoints from this stream and roll them up locally
+
+        Unlike the rollups performed by the device cloud (see :meth:`read`), any
+        interval may be used and every rollup method is computed at once.  See
+        :mod:`devicecloud.rollup` for details::
+
+            for record in stream.rollup(datetime.timedelta(minutes=5), percentiles=(95, )):
+                print(record.timestamp, record.min, record.max, record.percentiles[95])
+
+        :param interval: The length of each interval
+        :type interval: :class:`datetime.timedelta`
+        :param percentiles: The percentiles (from 0 to 100) to estimate for each interval
+        :param start_time: The start time for the window of data points to read (or None)
+        :param end_time: The end time for the window of data points to read (or None)
+        :param bool use_client_timeline: Whether points are placed into intervals by their
+            client timestamps (rather than server timestamps)
+        :param bool newest_first: If True, the records for the newest intervals are first
+        :param origin: The time from which intervals are aligned (None for the epoch)
+        :param int page_size: The number of points to request in each page
+        :return: list of :data:`~devicecloud.rollup.RollupRecord` for each interval with data
+        :raises InvalidRollupDatatype: if the stream is not numeric
 
+        """
+        if self.get_data_type(use_cached=True) not in _NUMERIC_COLUMN_TYPES:
+            raise InvalidRollupDatatype('Local rollups only support numerical DataPoints')
+        aggregator = RollupAggregator(interval, percentiles=percentiles, origin=origin)
+        query_parameters, _ = self._get_read_query_parameters(
+            start_time, end_time, use_client_timeline, False, None, None, None, page_size)
+        timestamp_key = "timestamp" if use_client_timeline else "serverTimestamp"
+        for items in self._iter_read_pages(query_parameters):
+            aggregator.add_columns([item[timestamp_key] for item in items], [item["data"] for item in items])
+        return aggregator.get_records(newest_first=newest_first)
+
+    def _get_read_query_parameters(self, start_time, end_time, use_client_timeline, newest_first,
+                                   rollup_interval, rollup_method, timezone, page_size):
+        """Validate the parameters for reading datapoints and build the query
+
+        :return: tuple of the query parameters for ``/ws/DataPoint`` and whether
+            the query is for rollup data.
+
+        """
         is_rollup = False
         if (rollup_interval is not None) or (rollup_method is not None):
             is_rollup = True
@@ -974,10 +1914,6 @@ class DataStream(object):
         timezone = validate_type(timezone, type(None), *six.string_types)
         page_size = validate_type(page_size, *six.integer_types)
 
-        # Remember that there could be multiple pages of data and we want to provide
-        # in iterator over the result set.  To start the process out, we need to make
-        # an initial request without a page cursor.  We should get one in response to
-        # our first request which we will use to page through the result set
         query_parameters = {
             'timeline': 'client' if use_client_timeline else 'server',
             'order': 'descending' if newest_first else 'ascending',
@@ -993,25 +1929,203 @@ class DataStream(object):
             query_parameters["rollupMethod"] = rollup_method
         if timezone is not None:
             query_parameters["timezone"] = timezone
+        return query_parameters, is_rollup
+
+    def _iter_read_pages(self, query_parameters, streaming=False):
+        """Yield the JSON items in each page of ``/ws/DataPoint`` results
 
+        If ``streaming`` is True, each page is an iterable over the items which are
+        parsed as the page is received and which must be consumed before the next page.
+
+        """
+        # Remember that there could be multiple pages of data and we want to provide
+        # in iterator over the result set.  To start the process out, we need to make
+        # an initial request without a page cursor.  We should get one in response to
+        # our first request which we will use to page through the result set
+        query_parameters = dict(query_parameters)
+        page_size = query_parameters['size']
         result_size = page_size
         while result_size == page_size:
             # request the next page of data or first if pageCursor is not set as query param
+            url = "/ws/DataPoint/{stream_id}?{query_params}".format(
+                stream_id=self.get_stream_id(),
+                query_params=urllib.parse.urlencode(query_parameters)
+            )
             try:
-                result = self._conn.get_json("/ws/DataPoint/{stream_id}?{query_params}".format(
-                    stream_id=self.get_stream_id(),
-                    query_params=urllib.parse.urlencode(query_parameters)
-                ))
+                if streaming:
+                    result = self._conn.get_json(url, stream=True)
+                else:
+                    result = self._conn.get_json(url)
             except DeviceCloudHttpException as http_exception:
                 if http_exception.response.status_code == 404:
                     raise NoSuchStreamException()
                 raise http_exception
 
+            yield result if streaming else result.get("items", [])
             result_size = int(result["resultSize"])  # how many are actually included here?
             query_parameters["pageCursor"] = result.get("pageCursor")  # will not be present if result set is empty
-            for item_info in result.get("items", []):
-                if is_rollup:
-                    data_point = DataPoint.from_rollup_json(self, item_info)
+
+    def _iter_read_items(self, query_parameters, streaming=False):
+        """Yield each JSON item from the pages of ``/ws/DataPoint`` results"""
+        for items in self._iter_read_pages(query_parameters, streaming):
+            for item_info in items:
+                yield item_info
+
+
+class BufferedDataPointWriter(object):
+    """Batch datapoints written from any number of threads into bulk writes
+
+    Rather than making an HTTP request for each datapoint, datapoints passed to
+    :meth:`write` are buffered and written by a background thread using
+    :meth:`StreamsAPI.bulk_write_datapoints`.  A batch is sent as soon as
+    ``batch_size`` points are buffered or once the oldest buffered point has been
+    waiting for ``max_latency`` seconds, whichever comes first::
+
+        with BufferedDataPointWriter(dc.streams, max_latency=5.0) as writer:
+            for reading in sensor_readings():
+                writer.write(DataPoint(stream_id="sensors/temp", data=reading))
+
+    At most ``max_pending`` points will be buffered.  When the buffer is full,
+    :meth:`write` blocks until there is room (or raises :class:`queue.Full`, in
+    the same manner as :meth:`queue.Queue.put`).
+
+    Errors encountered while writing a batch do not stop the writer.  The
+    ``error_callback``, if provided, is called with the list of datapoints that
+    failed to be written and the exception; otherwise the error is logged.
+
+    :param streams_api: The :class:`StreamsAPI` used to write datapoints
+    :param int batch_size: The maximum number of points sent in a single request
+    :param float max_latency: The maximum number of seconds a point will be
+        buffered before a (possibly partial) batch is sent
+    :param int max_pending: The maximum number of points which may be buffered
+    :param error_callback: Function called with ``(datapoints, exception)`` when
+        writing a batch fails
+
+    """
+
+    def __init__(self, streams_api, batch_size=MAXIMUM_DATAPOINTS_PER_POST, max_latency=1.0,
+                 max_pending=10 * MAXIMUM_DATAPOINTS_PER_POST, error_callback=None):
+        self._streams_api = validate_type(streams_api, StreamsAPI)
+        self._batch_size = validate_type(batch_size, *six.integer_types)
+        if not 0 < batch_size <= MAXIMUM_DATAPOINTS_PER_POST:
+            raise ValueError("batch_size must be between 1 and %d" % MAXIMUM_DATAPOINTS_PER_POST)
+        self._max_latency = float(max_latency)
+        self._max_pending = validate_type(max_pending, *six.integer_types)
+        if max_pending < batch_size:
+            raise ValueError("max_pending must be at least batch_size")
+        self._error_callback = error_callback
+
+        self._condition = threading.Condition()
+        self._pending = deque()  # (enqueue time, datapoint) tuples
+        self._enqueued_count = 0  # invariant: total number of points passed to write()
+        self._completed_count = 0  # invariant: number of points which have been sent (or failed)
+        self._flush_target = 0  # points up to this count should be sent without waiting
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="BufferedDataPointWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, datapoint, block=True, timeout=None):
+        """Add a datapoint to the buffer to be written
+
+        :param DataPoint datapoint: The datapoint to write.  It must have a stream_id set.
+        :param bool block: If False, raise :class:`queue.Full` rather than waiting if
+            the buffer is full
+        :param float timeout: If blocking, the maximum number of seconds to wait for
+            room in the buffer before raising :class:`queue.Full`
+        :raises ValueError: if the datapoint has no stream_id or the writer is closed
+
+        """
+        if not isinstance(datapoint, DataPoint):
+            raise TypeError("First argument must be a DataPoint object")
+        if datapoint.get_stream_id() is None:
+            raise ValueError("stream_id must be set on all datapoints")
+
+        with self._condition:
+            if len(self._pending) >= self._max_pending:
+                if not block:
+                    raise Full()
+                deadline = None if timeout is None else monotonic() + timeout
+                while len(self._pending) >= self._max_pending and not self._closed:
+                    remaining = None if deadline is None else deadline - monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise Full()
+                    self._condition.wait(remaining)
+            if self._closed:
+                raise ValueError("write to closed BufferedDataPointWriter")
+            self._pending.append((monotonic(), datapoint))
+            self._enqueued_count += 1
+            if len(self._pending) == 1 or len(self._pending) >= self._batch_size:
+                self._condition.notify_all()
+
+    def flush(self):
+        """Block until every datapoint passed to :meth:`write` before this call has been sent"""
+        with self._condition:
+            target = self._enqueued_count
+            self._flush_target = max(self._flush_target, target)
+            self._condition.notify_all()
+            while self._completed_count < target and self._thread.is_alive():
+                self._condition.wait()
+
+    def close(self):
+        """Send any buffered datapoints and stop the background thread
+
+        Once closed, further calls to :meth:`write` will raise ``ValueError``.
+
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _next_batch(self):
+        # Wait until a batch should be sent and remove it from the buffer.  Returns None
+        # once the writer is closed and the buffer has been drained.
+        with self._condition:
+            while True:
+                pending = self._pending
+                if not pending:
+                    if self._closed:
+                        return None
+                    self._condition.wait()
+                    continue
+
+                if (len(pending) >= self._batch_size or self._closed or
+                        self._completed_count < self._flush_target):
+                    break
+                remaining = pending[0][0] + self._max_latency - monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = [pending.popleft()[1] for _ in range(min(self._batch_size, len(pending)))]
+            self._condition.notify_all()  # there is now room for blocked writers
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            try:
+                self._streams_api.bulk_write_datapoints(batch)
+            except Exception as exception:
+                if self._error_callback is not None:
+                    try:
+                        self._error_callback(batch, exception)
+                    except Exception:
+                        logger.exception("Error in BufferedDataPointWriter error_callback")
                 else:
-                    data_point = DataPoint.from_json(self, item_info)
-                yield data_point
+                    logger.exception("Failed to write batch of %d datapoints", len(batch))
+
+            with self._condition:
+                self._completed_count += len(batch)
+                self._condition.notify_all()
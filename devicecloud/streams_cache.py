@@ -0,0 +1,199 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+r"""Module providing a persistent local cache of data points read from streams
+
+A :class:`SQLiteDataPointCache` stores points read by :meth:`.DataStream.read`
+in an SQLite database along with the time ranges of each stream that have
+been read.  When a range is read again, only the parts of the range which
+are not already stored locally are requested from the device cloud::
+
+    cache = SQLiteDataPointCache("/var/cache/reports/datapoints.db")
+    for dp in stream.read(start_time=month_start, end_time=month_end, cache=cache):
+        report.add(dp)
+
+Note that points written with a timestamp inside of a range which has already
+been cached (or deleted after being cached) are not seen when the range is
+read again.  To allow for points which are uploaded late (e.g. by devices
+which buffer their data), only the parts of a range older than ``settle_time``
+are recorded as cached; more recent points are requested again each time they
+are read.  This makes the cache best suited to reading historical data.  Use
+:meth:`SQLiteDataPointCache.clear` to discard what is cached for a stream.
+
+"""
+import datetime
+import json
+import sqlite3
+import threading
+
+import six
+from devicecloud.util import validate_type, to_none_or_dt, dc_utc_timestamp_to_dt, dt_to_dc_utc_timestamp, UTC
+
+
+#: Points newer than this are not considered final and so are not recorded as cached
+DEFAULT_SETTLE_TIME = datetime.timedelta(minutes=15)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datapoints (
+    stream_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    server_timestamp INTEGER NOT NULL,
+    json TEXT NOT NULL,
+    PRIMARY KEY (stream_id, id)
+);
+CREATE INDEX IF NOT EXISTS datapoints_timestamp ON datapoints (stream_id, timestamp);
+CREATE INDEX IF NOT EXISTS datapoints_server_timestamp ON datapoints (stream_id, server_timestamp);
+CREATE TABLE IF NOT EXISTS ranges (
+    stream_id TEXT NOT NULL,
+    timeline TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ranges_stream ON ranges (stream_id, timeline);
+"""
+
+
+def _subtract_ranges(start, end, ranges):
+    """Return the parts of [start, end) not covered by the sorted list of (start, end) ranges"""
+    gaps = []
+    position = start
+    for range_start, range_end in ranges:
+        if range_end <= position:
+            continue
+        if range_start >= end:
+            break
+        if range_start > position:
+            gaps.append((position, range_start))
+        position = max(position, range_end)
+    if position < end:
+        gaps.append((position, end))
+    return gaps
+
+
+def _merge_ranges(ranges):
+    """Merge a sorted list of (start, end) ranges which overlap or touch"""
+    merged = []
+    for range_start, range_end in ranges:
+        if merged and range_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+        else:
+            merged.append((range_start, range_end))
+    return merged
+
+
+class SQLiteDataPointCache(object):
+    """Persistent cache of data points stored in an SQLite database
+
+    A single cache may be used for any number of streams and may be shared
+    between threads.  The database is created if it does not already exist.
+
+    :param str path: The path of the SQLite database file (or ``":memory:"``)
+    :param settle_time: Only the parts of a range read which are older than this
+        are recorded as cached
+    :type settle_time: :class:`datetime.timedelta`
+
+    """
+
+    def __init__(self, path, settle_time=DEFAULT_SETTLE_TIME):
+        self._settle_time = validate_type(settle_time, datetime.timedelta)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(validate_type(path, *six.string_types), check_same_thread=False)
+        with self._lock:
+            self._db.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._db.close()
+
+    def clear(self, stream_id=None):
+        """Discard everything that is cached for a stream (or for all streams if None)"""
+        stream_id = validate_type(stream_id, type(None), *six.string_types)
+        with self._lock:
+            with self._db:
+                if stream_id is None:
+                    self._db.execute("DELETE FROM datapoints")
+                    self._db.execute("DELETE FROM ranges")
+                else:
+                    stream_id = stream_id.lstrip('/')
+                    self._db.execute("DELETE FROM datapoints WHERE stream_id = ?", (stream_id, ))
+                    self._db.execute("DELETE FROM ranges WHERE stream_id = ?", (stream_id, ))
+
+    def get_cached_ranges(self, stream_id, use_client_timeline=True):
+        """Get the ranges of a stream that are stored in this cache
+
+        :return: A sorted list of ``(start, end)`` tuples of :class:`datetime.datetime`
+            objects.  Each range includes its start and excludes its end.
+
+        """
+        return [(dc_utc_timestamp_to_dt(start), dc_utc_timestamp_to_dt(end))
+                for start, end in self._get_ranges(stream_id.lstrip('/'), use_client_timeline)]
+
+    def _get_ranges(self, stream_id, use_client_timeline):
+        with self._lock:
+            return self._db.execute(
+                "SELECT start, end FROM ranges WHERE stream_id = ? AND timeline = ? ORDER BY start",
+                (stream_id, "client" if use_client_timeline else "server")).fetchall()
+
+    def _store(self, stream_id, use_client_timeline, start, end, items):
+        """Store the points read for the range [start, end) and record the range as cached"""
+        timeline = "client" if use_client_timeline else "server"
+        rows = [(stream_id, item["id"], int(item["timestamp"]), int(item["serverTimestamp"]), json.dumps(item))
+                for item in items]
+        with self._lock:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO datapoints VALUES (?, ?, ?, ?, ?)", rows)
+                if start >= end:
+                    return
+                ranges = self._db.execute(
+                    "SELECT start, end FROM ranges WHERE stream_id = ? AND timeline = ? ORDER BY start",
+                    (stream_id, timeline)).fetchall()
+                ranges = _merge_ranges(sorted(ranges + [(start, end)]))
+                self._db.execute("DELETE FROM ranges WHERE stream_id = ? AND timeline = ?", (stream_id, timeline))
+                self._db.executemany("INSERT INTO ranges VALUES (?, ?, ?, ?)",
+                                     [(stream_id, timeline, s, e) for s, e in ranges])
+
+    def _load(self, stream_id, use_client_timeline, start, end, newest_first):
+        column = "timestamp" if use_client_timeline else "server_timestamp"
+        with self._lock:
+            return self._db.execute(
+                "SELECT json FROM datapoints WHERE stream_id = ? AND {column} >= ? AND {column} < ? "
+                "ORDER BY {column} {order}".format(column=column, order="DESC" if newest_first else "ASC"),
+                (stream_id, start, end)).fetchall()
+
+    def read_items(self, stream, start_time, end_time, use_client_timeline=True, newest_first=True,
+                   page_size=1000):
+        """Return the JSON items for a range of a stream, reading only what is not cached
+
+        This is used by :meth:`.DataStream.read` when a cache is provided.
+
+        :param stream: The :class:`.DataStream` being read
+        :param start_time: The start of the range (None for the start of time)
+        :param end_time: The end of the range (None for the current time)
+        :return: list of the JSON items for the points in the range
+
+        """
+        start_time = to_none_or_dt(validate_type(start_time, datetime.datetime, type(None)))
+        end_time = to_none_or_dt(validate_type(end_time, datetime.datetime, type(None)))
+        now = datetime.datetime.now(UTC)
+        if end_time is None:
+            end_time = now
+        start = 0 if start_time is None else dt_to_dc_utc_timestamp(start_time)
+        end = dt_to_dc_utc_timestamp(end_time)
+        settled = dt_to_dc_utc_timestamp(now - self._settle_time)
+        stream_id = stream.get_stream_id()
+
+        for gap_start, gap_end in _subtract_ranges(start, end, self._get_ranges(stream_id, use_client_timeline)):
+            query_parameters, _ = stream._get_read_query_parameters(
+                dc_utc_timestamp_to_dt(gap_start), dc_utc_timestamp_to_dt(gap_end), use_client_timeline, False,
+                None, None, None, page_size)
+            items = list(stream._iter_read_items(query_parameters))
+            # points may still be written in the part of the range that has not settled
+            self._store(stream_id, use_client_timeline, gap_start, min(gap_end, settled), items)
+
+        return [json.loads(row[0]) for row in self._load(stream_id, use_client_timeline, start, end, newest_first)]
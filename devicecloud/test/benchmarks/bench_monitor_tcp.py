@@ -0,0 +1,110 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+"""Micro-benchmarks for performance sensitive code paths in devicecloud.monitor_tcp
+
+These are not run as part of the unit tests.  To run all of the benchmarks
+(or only those named on the command line), do the following::
+
+    $ python -m devicecloud.test.benchmarks.bench_monitor_tcp [bench_name ...]
+
+"""
+from __future__ import print_function
+import json
+import multiprocessing
+import struct
+import sys
+import zlib
+
+import six
+from devicecloud.monitor_tcp import PushSession, _read_msg_header, _read_msg, _decode_payload, PUBLISH_MESSAGE
+from devicecloud.test.benchmarks.bench_streams import benchmark, best_time, report, BENCHMARKS
+
+
+class _ChunkedSocket(object):
+    """Socket returning the data it was given in chunks no larger than ``chunk_size``"""
+
+    def __init__(self, data, chunk_size):
+        self._data = memoryview(data)
+        self._position = 0
+        self._chunk_size = chunk_size
+
+    def _next_chunk(self, size):
+        size = min(size or self._chunk_size, self._chunk_size)
+        chunk = self._data[self._position:self._position + size]
+        self._position += len(chunk)
+        return chunk
+
+    def recv(self, size):
+        return self._next_chunk(size).tobytes()
+
+    def recv_into(self, buf, size=0):
+        chunk = self._next_chunk(size or len(buf))
+        buf[:len(chunk)] = chunk
+        return len(chunk)
+
+
+@benchmark
+def bench_read_publish_message(count=50000, chunk_size=1400):
+    document = json.dumps({"Document": {"Msg": [
+        {"DataPoint": {"streamId": "bench/stream", "data": i}} for i in range(count)
+    ]}}).encode("utf-8")
+    body = struct.pack("!HHBBI", 1, 0, 0, 0, len(document)) + document
+    frame = struct.pack("!HI", PUBLISH_MESSAGE, len(body)) + body
+
+    def baseline():
+        sock = _ChunkedSocket(frame, chunk_size)
+        data = six.b("")
+        while len(data) < 6:
+            data += sock.recv(6 - len(data))
+        message_length = struct.unpack('!i', data[2:6])[0]
+        data = six.b("")
+        while len(data) < message_length:
+            data += sock.recv(message_length - len(data))
+
+    session = PushSession(None, "1", None)
+
+    def optimized():
+        session.socket = _ChunkedSocket(frame, chunk_size)
+        _read_msg_header(session)
+        while not _read_msg(session):
+            pass
+        session.bytes_read = session.message_length = 0
+
+    report("read_publish_message", count, best_time(baseline), best_time(optimized))
+
+
+@benchmark
+def bench_decode_payloads(count=200, events=5000, decoders=4):
+    payload = zlib.compress(json.dumps({"Document": {"Msg": [
+        {"DataPoint": {"streamId": "bench/stream", "data": i}} for i in range(events)
+    ]}}).encode("utf-8"))
+    pool = multiprocessing.Pool(decoders)
+
+    def baseline():
+        for _ in range(count):
+            _decode_payload(payload, 1)
+
+    def optimized():
+        results = [pool.apply_async(_decode_payload, (payload, 1)) for _ in range(count)]
+        for result in results:
+            result.get()
+
+    try:
+        report("decode_payloads ({} decoders)".format(decoders), count, best_time(baseline), best_time(optimized))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(names):
+    for fn in BENCHMARKS:
+        if fn.__module__ == __name__ and (not names or fn.__name__ in names):
+            fn()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,170 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+"""Micro-benchmarks for performance sensitive code paths in devicecloud.streams
+
+These are not run as part of the unit tests.  To run all of the benchmarks
+(or only those named on the command line), do the following::
+
+    $ python -m devicecloud.test.benchmarks.bench_streams [bench_name ...]
+
+Each benchmark compares the previous implementation of a code path against
+its replacement and reports the best of several runs.
+
+"""
+from __future__ import print_function
+import datetime
+import sys
+import timeit
+
+import arrow
+from dateutil.tz import tzutc
+from devicecloud import util
+from devicecloud.streams import DataPoint, STREAM_TYPE_FLOAT, MAXIMUM_DATAPOINTS_PER_POST, datapoints_to_xml
+from six import StringIO
+
+
+BENCHMARKS = []
+
+
+def benchmark(fn):
+    BENCHMARKS.append(fn)
+    return fn
+
+
+def best_time(fn, repeat=3):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def report(name, count, baseline, optimized):
+    print("{name}: {count} items, baseline {baseline:.3f}s, optimized {optimized:.3f}s, speedup {speedup:.1f}x".format(
+        name=name,
+        count=count,
+        baseline=baseline,
+        optimized=optimized,
+        speedup=baseline / optimized,
+    ))
+
+
+def chunks(items, size=MAXIMUM_DATAPOINTS_PER_POST):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+@benchmark
+def bench_datapoints_to_xml(count=100000):
+    start = datetime.datetime(2015, 1, 1, tzinfo=tzutc())
+    datapoints = [DataPoint(
+        stream_id="bench/stream%d" % (i % 10),
+        data_type=STREAM_TYPE_FLOAT,
+        units="celsius",
+        data=i * 0.5,
+        quality=i % 100,
+        timestamp=start + datetime.timedelta(seconds=i),
+    ) for i in range(count)]
+    batches = chunks(datapoints)
+
+    def baseline():
+        for batch in batches:
+            datapoints_out = StringIO()
+            datapoints_out.write("<list>")
+            for dp in batch:
+                datapoints_out.write(dp.to_xml())
+            datapoints_out.write("</list>")
+            datapoints_out.getvalue()
+
+    def optimized():
+        for batch in batches:
+            datapoints_to_xml(batch)
+
+    report("datapoints_to_xml", count, best_time(baseline), best_time(optimized))
+
+
+class _BenchStream(object):
+
+    def get_stream_id(self):
+        return "bench/stream"
+
+    def get_data_type(self):
+        return STREAM_TYPE_FLOAT
+
+    def get_units(self):
+        return "celsius"
+
+
+@benchmark
+def bench_datapoint_from_json(count=20000):
+    start = datetime.datetime(2015, 1, 1, tzinfo=tzutc())
+
+    def iso(dt):
+        return dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+    items = [{
+        "id": "0c1b2a3d-%08x" % i,
+        "timestampISO": iso(start + datetime.timedelta(milliseconds=i * 250)),
+        "serverTimestampISO": iso(start + datetime.timedelta(milliseconds=i * 250 + 100)),
+        "data": "%s" % (i * 0.5),
+        "description": "",
+        "quality": "0",
+    } for i in range(count)]
+    stream = _BenchStream()
+
+    def parse_all():
+        for item in items:
+            DataPoint.from_json(stream, item)
+
+    def baseline():
+        # every timestamp is handed to arrow's parser, as was previously the case
+        fast_parser = util.iso8601_to_dt
+        util.iso8601_to_dt = util._parse_iso8601_with_arrow
+        try:
+            parse_all()
+        finally:
+            util.iso8601_to_dt = fast_parser
+
+    def optimized():
+        util._ISO8601_CACHE.clear()
+        parse_all()
+
+    report("DataPoint.from_json", count, best_time(baseline), best_time(optimized))
+
+
+@benchmark
+def bench_datapoint_from_rollup_json(count=20000):
+    start_ms = 1420070400000
+
+    items = [{
+        "id": "",
+        "timestamp": str(start_ms + i * 1800000),
+        "timestampISO": util.isoformat(util.dc_utc_timestamp_to_dt(start_ms + i * 1800000)),
+        "data": "%s" % (i * 0.5),
+    } for i in range(count)]
+    stream = _BenchStream()
+
+    def baseline():
+        # the previous implementation: decode as a regular point, then convert the
+        # epoch timestamp to a string and back and convert the data a second time
+        util._ISO8601_CACHE.clear()  # each timestamp in a long range is only seen once
+        for item in items:
+            dp = DataPoint.from_json(stream, item)
+            timestamp = util.isoformat(arrow.Arrow.utcfromtimestamp(int(item["timestamp"]) / 1000).datetime)
+            dp.set_timestamp(timestamp)
+            dp.set_data(float(item["data"]))
+
+    def optimized():
+        for item in items:
+            DataPoint.from_rollup_json(stream, item)
+
+    report("DataPoint.from_rollup_json", count, best_time(baseline), best_time(optimized))
+
+
+def main(names):
+    for fn in BENCHMARKS:
+        if not names or fn.__name__ in names:
+            fn()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,141 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+"""Tests for devicecloud.aio (collected through test_aio on Python 3.6+)"""
+import asyncio
+import json
+import unittest
+
+from devicecloud import DeviceCloud, DeviceCloudHttpException
+from devicecloud.test.unit.test_core import TEST_PAGED_RESPONSE_PAGE1, TEST_PAGED_RESPONSE_PAGE2
+from mock import patch, call
+
+
+class FakeResponse(object):
+
+    def __init__(self, status, body, headers=None):
+        self.status = status
+        self.headers = headers or {"Content-Type": "application/json; charset=utf-8"}
+        self._body = body.encode('utf-8') if isinstance(body, str) else body
+
+    async def read(self):
+        return self._body
+
+    def release(self):
+        pass
+
+
+class FakeSession(object):
+    """Minimal stand-in for an ``aiohttp.ClientSession``"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    def add_response(self, status, body=""):
+        self.responses.append(FakeResponse(status, body))
+
+    async def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        return self.responses.pop(0)
+
+    async def close(self):
+        pass
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+class TestAsyncDeviceCloudConnection(unittest.TestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        self.conn = DeviceCloud('user', 'pass').get_async_connection(session=self.session)
+
+    def test_credentials(self):
+        self.assertEqual(self.conn.hostname, "devicecloud.digi.com")
+        self.assertEqual(self.conn.username, "user")
+        self.assertEqual(self.conn.password, "pass")
+
+    def test_get(self):
+        self.session.add_response(200, "hello")
+        response = run(self.conn.get("test/path"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "hello")
+        self.assertEqual(self.session.requests[0][:2], ("GET", "https://devicecloud.digi.com/test/path"))
+
+    def test_get_json(self):
+        self.session.add_response(200, json.dumps({"items": [1, 2]}))
+        self.assertEqual(run(self.conn.get_json("/test/path")), {"items": [1, 2]})
+        self.assertEqual(self.session.requests[0][2]["headers"], {"Accept": "application/json"})
+
+    def test_post_put_delete(self):
+        for _ in range(3):
+            self.session.add_response(200)
+        run(self.conn.post("/test/path", "data"))
+        run(self.conn.put("/test/path", "data"))
+        run(self.conn.delete("/test/path"))
+        self.assertEqual([r[0] for r in self.session.requests], ["POST", "PUT", "DELETE"])
+        self.assertEqual(self.session.requests[0][2], {"data": "data"})
+
+    def test_http_exception(self):
+        self.session.add_response(400, "bad")
+        try:
+            run(self.conn.post("/test/path", "bad data"))
+        except DeviceCloudHttpException as e:
+            str(e)
+            self.assertEqual(e.response.status_code, 400)
+            self.assertEqual(e.response.content, b"bad")
+        else:
+            self.fail("DeviceCloudHttpException not raised")
+
+    @patch("asyncio.sleep")
+    def test_throttle_retries(self, patched_sleep):
+        async def fake_sleep(delay):
+            pass
+        patched_sleep.side_effect = fake_sleep
+        for _ in range(6):
+            self.session.add_response(429)
+        self.assertRaises(DeviceCloudHttpException, run, self.conn.get("/test/path", retries=5))
+        self.assertEqual(len(self.session.requests), 6)
+        patched_sleep.assert_has_calls([
+            call(1.5 ** 0),
+            call(1.5 ** 1),
+            call(1.5 ** 2),
+            call(1.5 ** 3),
+            call(1.5 ** 4),
+        ])
+
+    @patch("asyncio.sleep")
+    def test_throttle_then_success(self, patched_sleep):
+        async def fake_sleep(delay):
+            pass
+        patched_sleep.side_effect = fake_sleep
+        self.session.add_response(429)
+        self.session.add_response(200, "ok")
+        self.assertEqual(run(self.conn.get("/test/path")).text, "ok")
+        patched_sleep.assert_called_once_with(1.0)
+
+    def test_iter_json_pages(self):
+        self.session.add_response(200, TEST_PAGED_RESPONSE_PAGE1)
+        self.session.add_response(200, TEST_PAGED_RESPONSE_PAGE2)
+
+        async def collect():
+            return [item["id"] async for item in self.conn.iter_json_pages("/test/path", page_size=1, foo="bar")]
+
+        self.assertEqual(run(collect()), [1, 2])
+        self.assertEqual(self.session.requests[0][2]["params"], {"start": 0, "size": 1, "foo": "bar"})
+        self.assertEqual(self.session.requests[1][2]["params"], {"start": 1, "size": 1, "foo": "bar"})
+
+
+if __name__ == '__main__':
+    unittest.main()
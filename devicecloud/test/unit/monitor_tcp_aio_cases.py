@@ -0,0 +1,175 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+"""Tests for devicecloud.monitor_tcp_aio (collected through test_monitor_tcp_aio on Python 3.6+)"""
+import asyncio
+import struct
+import unittest
+
+from devicecloud import DeviceCloud
+from devicecloud.monitor_tcp import CONNECTION_REQUEST, CONNECTION_RESPONSE, PUBLISH_MESSAGE, PUBLISH_MESSAGE_RECEIVED, \
+    PushException
+from devicecloud.monitor_tcp_aio import AsyncTCPClientManager
+from devicecloud.test.unit.test_monitor_tcp import publish_message
+from mock import patch
+
+
+class FakePushServer(object):
+    """Local server accepting push sessions in place of the device cloud"""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.handshakes_to_drop = 0  # connections to close rather than send a ConnectionResponse
+        self.connections = asyncio.Queue()
+        self.writers = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        for writer in self.writers:
+            writer.close()
+        await self.server.wait_closed()
+        await asyncio.sleep(0)  # let the transports finish closing
+
+    async def _handle(self, reader, writer):
+        self.writers.append(writer)
+        request_type, length = struct.unpack("!Hi", await reader.readexactly(6))
+        request = await reader.readexactly(length)
+        if self.handshakes_to_drop:
+            self.handshakes_to_drop -= 1
+            writer.close()
+            return
+        writer.write(struct.pack("!HiHH", CONNECTION_RESPONSE, 4, self.status, 0))
+        await self.connections.put((request_type, request, reader, writer))
+
+
+class TestAsyncTCPClientManager(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.server = FakePushServer()
+        port = self.run_async(self.server.start())
+        self.addCleanup(self.run_async, self.server.stop())
+        self.client_manager = AsyncTCPClientManager(DeviceCloud('user', 'pass').get_connection(),
+                                                    secure=False, reconnect_delay=0.01)
+        self.addCleanup(self.run_async, self.client_manager.stop())
+        for patcher in (patch("devicecloud.monitor_tcp_aio.PUSH_OPEN_PORT", port),
+                        patch.object(AsyncTCPClientManager, "hostname", "127.0.0.1")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.received = []
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(asyncio.wait_for(coro, 5))
+
+    async def _callback(self, data):
+        await asyncio.sleep(0)
+        self.received.append(data)
+        return True
+
+    async def _read_ack(self, reader):
+        return struct.unpack("!HHH", await reader.readexactly(6))
+
+    def test_credentials(self):
+        self.assertEqual(self.client_manager.username, "user")
+        self.assertEqual(self.client_manager.password, "pass")
+
+    def test_connection_request(self):
+        async def test():
+            await self.client_manager.create_session(self._callback, 1234)
+            return await self.server.connections.get()
+        request_type, request, _, _ = self.run_async(test())
+        self.assertEqual(request_type, CONNECTION_REQUEST)
+        self.assertEqual(request, struct.pack("!HH4sH4sI", 0x01, 4, b"user", 4, b"pass", 1234))
+
+    def test_connection_refused_status(self):
+        self.server.status = 403
+
+        async def test():
+            await self.client_manager.create_session(self._callback, 1234)
+        self.assertRaises(PushException, self.run_async, test())
+        self.assertEqual(self.client_manager.sessions, [])
+
+    def test_coroutine_callback_acknowledged(self):
+        async def test():
+            await self.client_manager.create_session(self._callback, 1)
+            _, _, reader, writer = await self.server.connections.get()
+            writer.write(publish_message(7, {"Document": {"Msg": 1}}))
+            writer.write(publish_message(8, {"Document": {"Msg": 2}}, compressed=True))
+            return [await self._read_ack(reader), await self._read_ack(reader)]
+        self.assertEqual(self.run_async(test()), [(PUBLISH_MESSAGE_RECEIVED, 7, 200),
+                                                  (PUBLISH_MESSAGE_RECEIVED, 8, 200)])
+        self.assertEqual(self.received, [{"Document": {"Msg": 1}}, {"Document": {"Msg": 2}}])
+
+    def test_plain_callback_not_acknowledged(self):
+        def callback(data):
+            self.received.append(data)
+            return data["ack"]
+
+        async def test():
+            await self.client_manager.create_session(callback, 1)
+            _, _, reader, writer = await self.server.connections.get()
+            writer.write(publish_message(1, {"ack": False}))
+            writer.write(publish_message(2, {"ack": True}))
+            return await self._read_ack(reader)
+        self.assertEqual(self.run_async(test()), (PUBLISH_MESSAGE_RECEIVED, 2, 200))
+        self.assertEqual(self.received, [{"ack": False}, {"ack": True}])
+
+    def test_undecodable_message_skipped(self):
+        async def test():
+            await self.client_manager.create_session(self._callback, 1)
+            _, _, reader, writer = await self.server.connections.get()
+            body = struct.pack("!HHBBI", 1, 0, 1, 0, 3) + b"bad"  # not zlib data
+            writer.write(struct.pack("!HI", PUBLISH_MESSAGE, len(body)) + body)
+            body = struct.pack("!HHBBI", 2, 0, 0, 0, 3) + b"{{{"  # not JSON
+            writer.write(struct.pack("!HI", PUBLISH_MESSAGE, len(body)) + body)
+            writer.write(publish_message(3, {"Msg": 3}))
+            return await self._read_ack(reader)
+        self.assertEqual(self.run_async(test()), (PUBLISH_MESSAGE_RECEIVED, 3, 200))
+        self.assertEqual(self.received, [{"Msg": 3}])
+
+    def test_reconnect(self):
+        async def test():
+            await self.client_manager.create_session(self._callback, 1)
+            _, _, _, writer = await self.server.connections.get()
+            writer.close()
+            _, _, reader, writer = await self.server.connections.get()
+            writer.write(publish_message(3, {"after": "reconnect"}))
+            return await self._read_ack(reader)
+        self.assertEqual(self.run_async(test()), (PUBLISH_MESSAGE_RECEIVED, 3, 200))
+        self.assertEqual(self.received, [{"after": "reconnect"}])
+
+    def test_reconnect_after_closed_handshake(self):
+        async def test():
+            await self.client_manager.create_session(self._callback, 1)
+            _, _, _, writer = await self.server.connections.get()
+            self.server.handshakes_to_drop = 2
+            writer.close()
+            _, _, reader, writer = await self.server.connections.get()
+            writer.write(publish_message(4, {"after": "handshake"}))
+            return await self._read_ack(reader)
+        self.assertEqual(self.run_async(test()), (PUBLISH_MESSAGE_RECEIVED, 4, 200))
+        self.assertEqual(self.server.handshakes_to_drop, 0)
+
+    def test_stop(self):
+        async def test():
+            session = await self.client_manager.create_session(self._callback, 1)
+            _, _, reader, _ = await self.server.connections.get()
+            await self.client_manager.stop()
+            return session, await reader.read()
+        session, remaining = self.run_async(test())
+        self.assertEqual(remaining, b"")  # closed
+        self.assertEqual(self.client_manager.sessions, [])
+        self.assertIsNone(session._writer)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,17 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+# devicecloud.aio (and its tests) use syntax which is only available on
+# Python 3.6+, so the tests are only imported there.
+import sys
+import unittest
+
+if sys.version_info >= (3, 6):
+    from devicecloud.test.unit.aio_cases import *  # noqa
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@
 import unittest
 
 from devicecloud import DeviceCloudHttpException
+from devicecloud.jsonstream import JSONItemStream
 from devicecloud.test.unit.test_utilities import HttpTestBase
 from mock import patch, call
 import six
@@ -94,6 +95,46 @@ class TestDeviceCloudConnection(HttpTestBase):
             "start": "1"
         })
 
+    def test_iter_json_pages_streaming(self):
+        it = self.dc.get_connection().iter_json_pages("/test/path", page_size=1, streaming=True)
+        self.prepare_response("GET", "/test/path", TEST_PAGED_RESPONSE_PAGE1)
+        self.assertEqual(six.next(it)["id"], 1)
+        self.prepare_response("GET", "/test/path", TEST_PAGED_RESPONSE_PAGE2)
+        self.assertEqual([item["id"] for item in it], [2])
+        self.assertRaises(ValueError, list, self.dc.get_connection().iter_json_pages(
+            "/test/path", prefetch_workers=2, streaming=True))
+
+    def test_get_json_stream(self):
+        self.prepare_response("GET", "/test/path", TEST_BASIC_RESPONSE)
+        page = self.dc.get_connection().get_json("/test/path", stream=True)
+        self.assertIsInstance(page, JSONItemStream)
+        self.assertEqual([item["id"] for item in page], [1, 2])
+        self.assertEqual(page.get("remainingSize"), "0")
+
+    def test_iter_json_pages_prefetch(self):
+        # httpretty is not thread-safe, so stand in for get_json directly
+        requested_params = []
+        def get_json(path, params):
+            self.assertEqual(path, "/test/path")
+            requested_params.append(params)
+            start, size = params["start"], params["size"]
+            return {
+                "remainingSize": str(max(0, 25 - start - size)),
+                "items": [{"id": i} for i in range(start, min(start + size, 25))],
+            }
+
+        conn = self.dc.get_connection()
+        with patch.object(conn, "get_json", side_effect=get_json):
+            it = conn.iter_json_pages("/test/path", page_size=4, prefetch_workers=3, foo="bar")
+            self.assertEqual([item["id"] for item in it], list(range(25)))
+        self.assertEqual(sorted(p["start"] for p in requested_params), [0, 4, 8, 12, 16, 20, 24])
+        self.assertTrue(all(p["foo"] == "bar" and p["size"] == 4 for p in requested_params))
+
+    def test_iter_json_pages_prefetch_single_page(self):
+        self.prepare_response("GET", "/test/path", TEST_BASIC_RESPONSE)
+        it = self.dc.get_connection().iter_json_pages("/test/path", prefetch_workers=4)
+        self.assertEqual([item["id"] for item in it], [1, 2])
+
     def test_http_exception(self):
         self.prepare_response("POST", "/test/path", TEST_ERROR_RESPONSE, status=400)
         try:
@@ -0,0 +1,100 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+import json
+import unittest
+
+from devicecloud.jsonstream import JSONItemStream
+import mock
+import six
+
+
+PAGE = {
+    "resultSize": "3",
+    "pageCursor": "abc",
+    "items": [
+        {"id": "1", "data": "12345.5", "description": six.u("caf\u00e9 \u2603")},
+        {"id": "2", "data": {"nested": [1, 2, {"deep": None}]}, "quality": 100},
+        {"id": "3", "data": '["quoted]"', "value": -1.5e10},
+    ],
+    "remainingSize": 0,
+}
+
+
+def _chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestJSONItemStream(unittest.TestCase):
+
+    def _assert_page(self, chunks):
+        page = JSONItemStream(chunks)
+        self.assertEqual(list(page), PAGE["items"])
+        self.assertEqual(page.get("resultSize"), "3")
+        self.assertEqual(page["pageCursor"], "abc")
+        self.assertEqual(page.get("remainingSize"), 0)
+        self.assertIsNone(page.get("items"))
+
+    def test_whole_body(self):
+        self._assert_page([json.dumps(PAGE).encode("utf-8")])
+
+    def test_byte_at_a_time(self):
+        # multi-byte characters and numbers are split across chunks
+        body = json.dumps(PAGE, ensure_ascii=False, indent=2).encode("utf-8")
+        self._assert_page(_chunked(body, 1))
+
+    def test_text_chunks(self):
+        self._assert_page(_chunked(six.text_type(json.dumps(PAGE)), 7))
+
+    def test_items_incremental(self):
+        # each item is available as soon as it has been received
+        body = json.dumps(PAGE).encode("utf-8")
+        received = []
+
+        def chunks():
+            for chunk in _chunked(body, 16):
+                received.append(chunk)
+                yield chunk
+
+        page = JSONItemStream(chunks())
+        first = six.next(iter(page))
+        self.assertEqual(first["id"], "1")
+        self.assertLess(len(received), len(_chunked(body, 16)))
+
+    def test_large_item_decoded_in_linear_time(self):
+        # the decode is only retried as the buffered part of the item doubles, not for every chunk
+        item = {"id": "big", "data": ["x" * 100] * 10000}
+        body = json.dumps({"items": [item]}).encode("utf-8")
+        page = JSONItemStream(_chunked(body, 1024))
+        decoder = mock.Mock(wraps=page._decoder)
+        page._decoder = decoder
+        self.assertEqual(list(page), [item])
+        self.assertLess(decoder.raw_decode.call_count, 20)
+
+    def test_empty(self):
+        page = JSONItemStream([b'{"resultSize": "0", "items": [ ] }'])
+        self.assertEqual(list(page), [])
+        self.assertEqual(page.get("resultSize"), "0")
+        self.assertEqual(list(JSONItemStream([b" {} "])), [])
+
+    def test_get_discards_items(self):
+        page = JSONItemStream([json.dumps(PAGE).encode("utf-8")])
+        self.assertEqual(page.get("remainingSize"), 0)
+        self.assertEqual(list(page), [])
+
+    def test_on_close(self):
+        on_close = mock.Mock()
+        page = JSONItemStream([json.dumps(PAGE).encode("utf-8")], on_close=on_close)
+        list(page)
+        on_close.assert_called_once_with()
+
+    def test_malformed(self):
+        self.assertRaises(ValueError, list, JSONItemStream([b'[1, 2]']))
+        self.assertRaises(ValueError, list, JSONItemStream([b'{"items": [{"id": 1}, {"id": ']))
+        self.assertRaises(ValueError, list, JSONItemStream([b'{"items": [1 2]}']))
+
+
+if __name__ == '__main__':
+    unittest.main()
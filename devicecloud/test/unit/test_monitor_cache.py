@@ -0,0 +1,130 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+import unittest
+
+from devicecloud.devicecore import DeviceCoreAPI
+from devicecloud.monitor import TCPDeviceCloudMonitor
+from devicecloud.monitor_cache import CacheMonitor
+from devicecloud.test.unit.test_devicecore import EXAMPLE_GET_DEVICES
+from devicecloud.test.unit.test_streams import GET_TEST_DATA_STREAM
+from devicecloud.test.unit.test_utilities import HttpTestBase
+import httpretty
+import mock
+
+
+def _push(*messages):
+    return {"Document": {"Msg": list(messages) if len(messages) != 1 else messages[0]}}
+
+
+class TestCacheMonitor(HttpTestBase):
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        self.monitor_api = mock.Mock()
+        self.monitor = mock.Mock(spec=TCPDeviceCloudMonitor)
+        self.monitor_api.get_monitors.return_value = iter([])
+        self.monitor_api.create_tcp_monitor.return_value = self.monitor
+        self.cache_monitor = CacheMonitor(self.monitor_api, streams_api=self.dc.streams,
+                                          devicecore_api=self.dc.devicecore)
+        self.cache_monitor.start()
+        self.push = self.monitor.add_callback.call_args[0][0]
+
+    def _monitor_condition(self):
+        return self.monitor_api.get_monitors.call_args[0][0].compile()
+
+    def test_start_creates_monitor(self):
+        self.assertEqual(self._monitor_condition(),
+                         "monTopic='DataStream,DeviceCore' and monTransportType='tcp' and monFormatType='json'")
+        self.monitor_api.create_tcp_monitor.assert_called_once_with(["DataStream", "DeviceCore"],
+                                                                    format_type="json")
+        self.assertRaises(RuntimeError, self.cache_monitor.start)
+
+    def test_start_reuses_monitor(self):
+        existing = mock.Mock(spec=TCPDeviceCloudMonitor)
+        self.monitor_api.get_monitors.return_value = iter([existing])
+        CacheMonitor(self.monitor_api, streams_api=self.dc.streams).start()
+        self.assertEqual(self._monitor_condition(),
+                         "monTopic='DataStream' and monTransportType='tcp' and monFormatType='json'")
+        self.assertTrue(existing.add_callback.called)
+        self.assertEqual(self.monitor_api.create_tcp_monitor.call_count, 1)
+
+    def test_requires_api(self):
+        self.assertRaises(ValueError, CacheMonitor, self.monitor_api)
+
+    def test_stop(self):
+        session = self.monitor.add_callback.return_value
+        self.cache_monitor.stop(delete_monitor=True)
+        session.stop.assert_called_once_with()
+        self.monitor.delete.assert_called_once_with()
+        self.cache_monitor.start()  # may be started again
+
+    def test_stream_update(self):
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        stream = self.dc.streams.get_stream("test")
+        self.assertEqual(stream.get_units(), "light years")
+
+        self.assertTrue(self.push(_push({
+            "operation": "UPDATE",
+            "topic": "7603/DataStream/test",
+            "DataStream": {"streamId": "test", "units": "parsecs"},
+        })))
+        self.assertEqual(stream.get_units(), "parsecs")
+        self.assertEqual(stream.get_data_type(), "FLOAT")  # merged with what was already known
+        self.assertEqual(self.dc.streams.get_stream("test").get_units(), "parsecs")
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 1)
+
+    def test_stream_insertion_and_deletion(self):
+        self.push(_push({"operation": "INSERTION", "DataStream": {"streamId": "new", "dataType": "LONG"}}))
+        self.assertEqual(self.dc.streams.get_stream("new").get_data_type(), "LONG")
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 0)
+
+        self.push(_push({"operation": "DELETION", "DataStream": {"streamId": "new"}}))
+        self.prepare_response("GET", "/ws/DataStream/new", "", status=404)
+        self.assertIsNone(self.dc.streams.get_stream_if_exists("new"))
+
+    def test_partial_stream_update_not_cached(self):
+        self.push(_push({"operation": "UPDATE", "DataStream": {"streamId": "test", "units": "parsecs"}}))
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        self.assertEqual(self.dc.streams.get_stream("test").get_data_type(), "FLOAT")
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 1)
+
+    def test_device_updates_bounded(self):
+        devicecore = DeviceCoreAPI(self.dc.get_connection(), self.dc.get_sci_api(), device_updates_size=2)
+        for connectware_id in ("a", "b", "c"):
+            devicecore._update_device_json(connectware_id, {"dpConnectionStatus": 1})
+        self.assertEqual(len(devicecore._device_updates), 2)
+        self.assertIsNone(devicecore._device_updates.get("a"))
+
+    def test_device_update(self):
+        self.prepare_json_response("GET", "/ws/DeviceCore", EXAMPLE_GET_DEVICES)
+        devices = list(self.dc.devicecore.get_devices())
+        self.assertFalse(devices[0].is_connected())
+
+        self.push(_push(
+            {"operation": "UPDATE", "DeviceCore": {
+                "devConnectwareId": devices[0].get_connectware_id(), "dpConnectionStatus": 1}},
+            {"operation": "UPDATE", "DataPoint": {"streamId": "ignored"}},
+        ))
+        self.assertTrue(devices[0].is_connected())
+        self.assertFalse(devices[1].is_connected())
+        self.assertEqual(devices[0].get_mac(), "00:40:9D:58:17:5B")
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 1)
+
+        self.push(_push({"operation": "DELETION", "DeviceCore": {
+            "devConnectwareId": devices[0].get_connectware_id()}}))
+        self.assertTrue(devices[0].is_connected())  # the last known state
+
+    def test_bad_message(self):
+        # a malformed message is logged but does not prevent others from being applied
+        self.assertTrue(self.push(_push(
+            {"operation": "UPDATE", "DataStream": {}},
+            {"operation": "INSERTION", "DataStream": {"streamId": "new", "dataType": "LONG"}},
+        )))
+        self.assertEqual(self.dc.streams.get_stream("new").get_data_type(), "LONG")
+
+
+if __name__ == '__main__':
+    unittest.main()
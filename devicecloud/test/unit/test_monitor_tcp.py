@@ -3,9 +3,39 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 #
 # Copyright (c) 2015 Digi International, Inc.
+import json
+import socket
+import ssl
+import struct
+import threading
+import time
+import unittest
+import zlib
 
-from devicecloud.monitor_tcp import TCPClientManager
+from devicecloud.monitor_tcp import TCPClientManager, PushSession, PUBLISH_MESSAGE, PUBLISH_MESSAGE_RECEIVED, \
+    RECEIVE_BUFFER_SIZE, _SelectSelector, _parse_publish_message, _send_all
 from devicecloud.test.unit.test_utilities import HttpTestBase
+import mock
+import six
+
+
+def publish_message(block_id, payload, compressed=False):
+    """Build a PublishMessage frame as sent by the device cloud"""
+    payload = json.dumps(payload).encode("utf-8")
+    if compressed:
+        payload = zlib.compress(payload)
+    body = struct.pack("!HHBBI", block_id, 0, 1 if compressed else 0, 0, len(payload)) + payload
+    return struct.pack("!HI", PUBLISH_MESSAGE, len(body)) + body
+
+
+def read_exactly(sock, size):
+    data = six.b("")
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
 
 
 class TestTCPClientManager(HttpTestBase):
@@ -27,3 +57,228 @@ class TestTCPClientManager(HttpTestBase):
 
     def test_password(self):
         self.assertEqual(self.client_manager.password, "pass")
+
+    def test_no_sockets_until_session_added(self):
+        self.assertIsNone(self.client_manager._selector)
+        self.assertIsNone(self.client_manager._wakeup_recv)
+        self.client_manager.stop()
+
+
+class TestParsePublishMessage(unittest.TestCase):
+
+    def test_payload_copied_from_buffer(self):
+        for compressed in (False, True):
+            buf = bytearray(publish_message(5, {"a": 1}, compressed=compressed)[6:])
+            block_id, payload = _parse_publish_message(memoryview(buf))
+            buf[:] = six.b("\0") * len(buf)
+            self.assertEqual(block_id, 5)
+            self.assertIsInstance(payload, six.binary_type)
+            self.assertEqual(json.loads(payload.decode("utf-8")), {"a": 1})
+
+    def test_compressed_frame(self):
+        # the Python 2 path passes bytes (rather than a memoryview) to zlib
+        frame = publish_message(6, {"b": [1, 2]}, compressed=True)[6:]
+        for py2 in (False, True):
+            with mock.patch("devicecloud.monitor_tcp.six.PY2", py2):
+                for data in (frame, memoryview(bytearray(frame))):
+                    block_id, payload = _parse_publish_message(data)
+                    self.assertEqual(block_id, 6)
+                    self.assertEqual(json.loads(payload.decode("utf-8")), {"b": [1, 2]})
+
+
+class TestSendAll(unittest.TestCase):
+
+    def test_short_writes(self):
+        client_socket, server_socket = socket.socketpair()
+        self.addCleanup(client_socket.close)
+        self.addCleanup(server_socket.close)
+        sent = []
+
+        def send(data):
+            # alternately unable to write and writing only a couple of bytes
+            if len(sent) % 2 == 0:
+                sent.append(None)
+                raise ssl.SSLError(ssl.SSL_ERROR_WANT_WRITE, "want write")
+            sent.append(data[:2])
+            return client_socket.send(data[:2])
+
+        sock = mock.Mock(send=send, fileno=client_socket.fileno)
+        _send_all(sock, six.b("abcdefg"))
+        self.assertEqual(read_exactly(server_socket, 7), six.b("abcdefg"))
+        self.assertEqual([data for data in sent if data is not None],
+                         [six.b("ab"), six.b("cd"), six.b("ef"), six.b("g")])
+
+
+class TestTCPClientManagerIO(HttpTestBase):
+    """Exercise the I/O loop using a local socket pair in place of the device cloud"""
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        self.client_manager = TCPClientManager(self.dc.get_connection())
+        self.received = []
+
+    def tearDown(self):
+        self.client_manager.stop()
+        HttpTestBase.tearDown(self)
+
+    def _callback(self, data):
+        self.received.append(data)
+        return True
+
+    def _start_session(self, callback=None, max_batch_size=None):
+        client_socket, server_socket = socket.socketpair()
+        client_socket.setblocking(0)
+        server_socket.settimeout(5)
+        self.addCleanup(server_socket.close)
+        session = PushSession(callback or self._callback, "1", self.client_manager, max_batch_size)
+        session.socket = client_socket
+        self.client_manager._add_session(session)
+        self.client_manager._init_threads()
+        return session, server_socket
+
+    def _read_ack(self, server_socket):
+        return struct.unpack("!HHH", read_exactly(server_socket, 6))
+
+    def test_receive_and_acknowledge(self):
+        session, server = self._start_session()
+        server.sendall(publish_message(7, {"Document": {"Msg": 1}}))
+        self.assertEqual(self._read_ack(server), (PUBLISH_MESSAGE_RECEIVED, 7, 200))
+        server.sendall(publish_message(8, {"Document": {"Msg": 2}}, compressed=True))
+        self.assertEqual(self._read_ack(server), (PUBLISH_MESSAGE_RECEIVED, 8, 200))
+        self.assertEqual(self.received, [{"Document": {"Msg": 1}}, {"Document": {"Msg": 2}}])
+
+    def test_message_in_pieces(self):
+        session, server = self._start_session()
+        frame = publish_message(1, {"Document": {"Msg": list(range(100))}})
+        for i in range(0, len(frame), 7):
+            server.sendall(frame[i:i + 7])
+        self.assertEqual(self._read_ack(server), (PUBLISH_MESSAGE_RECEIVED, 1, 200))
+        self.assertEqual(self.received[0]["Document"]["Msg"], list(range(100)))
+
+    def test_large_message_grows_buffer(self):
+        session, server = self._start_session()
+        document = {"Document": {"Msg": [{"DataPoint": {"data": i}} for i in range(20000)]}}
+        frame = publish_message(1, document, compressed=True)
+        server.sendall(publish_message(2, document))
+        server.sendall(frame)
+        self.assertEqual(self._read_ack(server), (PUBLISH_MESSAGE_RECEIVED, 2, 200))
+        self.assertEqual(self._read_ack(server), (PUBLISH_MESSAGE_RECEIVED, 1, 200))
+        self.assertEqual(self.received, [document, document])
+        self.assertGreater(len(session.buffer), RECEIVE_BUFFER_SIZE)
+        self.assertEqual((session.bytes_read, session.message_length), (0, 0))
+
+    def test_write_larger_than_socket_buffer(self):
+        session, server = self._start_session()
+        data = six.b("x") * (8 * 1024 * 1024)  # more than a non-blocking send accepts at once
+        self.client_manager._write_queue.put((session.socket, data))
+        time.sleep(0.1)  # let the writer fill the socket buffer before anything is read
+        self.assertEqual(read_exactly(server, len(data)), data)
+
+    def test_invalid_message_skipped(self):
+        session, server = self._start_session()
+        body = struct.pack("!HHBBI", 1, 0, 0, 0, 3) + six.b("{{{")
+        server.sendall(struct.pack("!HI", PUBLISH_MESSAGE, len(body)) + body)
+        server.sendall(publish_message(2, {"Msg": 2}))
+        self.assertEqual(self._read_ack(server), (PUBLISH_MESSAGE_RECEIVED, 2, 200))
+        self.assertEqual(self.received, [{"Msg": 2}])
+
+    def test_many_sessions(self):
+        servers = [self._start_session()[1] for _ in range(20)]
+        for block_id, server in enumerate(servers):
+            server.sendall(publish_message(block_id, {"block": block_id}))
+        for block_id, server in enumerate(servers):
+            self.assertEqual(self._read_ack(server), (PUBLISH_MESSAGE_RECEIVED, block_id, 200))
+        self.assertEqual(sorted(data["block"] for data in self.received), list(range(20)))
+
+    def _wait_for_pending(self, session, count):
+        deadline = time.time() + 5
+        while len(session.pending) < count:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.001)
+
+    def _start_batch_session(self, max_batch_size):
+        started, release = threading.Event(), threading.Event()
+
+        def batch_callback(batch):
+            self.received.append(batch)
+            started.set()
+            release.wait(5)
+            return True
+        session, server = self._start_session(batch_callback, max_batch_size)
+        return session, server, started, release
+
+    def test_batch_callback(self):
+        session, server, started, release = self._start_batch_session(10)
+        server.sendall(publish_message(1, {"Msg": 1}))
+        self.assertTrue(started.wait(5))
+        # These are delivered together once the first batch is processed
+        server.sendall(six.b("").join(publish_message(i, {"Msg": i}) for i in range(2, 5)))
+        self._wait_for_pending(session, 3)
+        release.set()
+        self.assertEqual([self._read_ack(server) for _ in range(4)],
+                         [(PUBLISH_MESSAGE_RECEIVED, i, 200) for i in range(1, 5)])
+        self.assertEqual(self.received, [[{"Msg": 1}], [{"Msg": 2}, {"Msg": 3}, {"Msg": 4}]])
+
+    def test_batch_callback_max_batch_size(self):
+        session, server, started, release = self._start_batch_session(2)
+        server.sendall(six.b("").join(publish_message(i, {"Msg": i}) for i in range(1, 7)))
+        self.assertTrue(started.wait(5))
+        self._wait_for_pending(session, 2)
+        self.assertEqual(len(session.pending), 2)
+        release.set()
+        self.assertEqual([self._read_ack(server) for _ in range(6)],
+                         [(PUBLISH_MESSAGE_RECEIVED, i, 200) for i in range(1, 7)])
+        self.assertTrue(all(1 <= len(batch) <= 2 for batch in self.received))
+        self.assertEqual([data for batch in self.received for data in batch], [{"Msg": i} for i in range(1, 7)])
+
+    def test_batch_callback_not_acknowledged(self):
+        def batch_callback(batch):
+            self.received.append(batch)
+            return batch[-1]["Msg"] == 3
+
+        session, server = self._start_session(batch_callback, 1)
+        server.sendall(six.b("").join(publish_message(i, {"Msg": i}) for i in range(1, 4)))
+        self.assertEqual(self._read_ack(server), (PUBLISH_MESSAGE_RECEIVED, 3, 200))
+        self.assertEqual(self.received, [[{"Msg": 1}], [{"Msg": 2}], [{"Msg": 3}]])
+
+    def test_invalid_max_batch_size(self):
+        self.assertRaises(ValueError, self.client_manager.create_session, self._callback, "1", max_batch_size=0)
+
+    def test_session_stop(self):
+        session, server = self._start_session()
+        self.assertEqual(list(self.client_manager.sessions.values()), [session])
+        session.stop()
+        self.assertEqual(self.client_manager.sessions, {})
+        self.assertIsNone(session.socket)
+
+    def test_stop(self):
+        session, server = self._start_session()
+        self.client_manager.stop()
+        self.assertFalse(self.client_manager._io_thread.is_alive())
+        self.assertFalse(self.client_manager._writer_thread.is_alive())
+        self.assertIsNone(session.socket)
+        self.assertEqual(server.recv(1), six.b(""))  # closed
+
+
+class TestTCPClientManagerSelectIO(TestTCPClientManagerIO):
+    """The same, using select.select where the selectors module is not available"""
+
+    def setUp(self):
+        patcher = mock.patch("devicecloud.monitor_tcp.selectors", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        TestTCPClientManagerIO.setUp(self)
+
+    def _start_session(self, *args, **kwargs):
+        started = TestTCPClientManagerIO._start_session(self, *args, **kwargs)
+        self.assertIsInstance(self.client_manager._selector, _SelectSelector)
+        return started
+
+
+class TestTCPClientManagerDecoderIO(TestTCPClientManagerIO):
+    """The same, decoding messages in separate processes"""
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        self.client_manager = TCPClientManager(self.dc.get_connection(), decoders=2)
+        self.received = []
@@ -0,0 +1,124 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+import datetime
+import random
+import unittest
+
+from dateutil.tz import tzutc
+from devicecloud import rollup
+from devicecloud.rollup import RollupAggregator, _PSquareEstimator
+import mock
+
+
+START = datetime.datetime(2015, 1, 1, tzinfo=tzutc())
+START_MS = 1420070400000
+
+
+class TestPSquareEstimator(unittest.TestCase):
+
+    def test_few_values_exact(self):
+        estimator = _PSquareEstimator(0.5)
+        for value in (5, 1, 3, 2):
+            estimator.add(value)
+        self.assertEqual(estimator.get(), 2.5)
+
+    def _estimates(self, values, percentiles):
+        estimators = [_PSquareEstimator(p / 100.0) for p in percentiles]
+        for value in values:
+            for estimator in estimators:
+                estimator.add(value)
+        return [estimator.get() for estimator in estimators]
+
+    def test_five_values_exact(self):
+        self.assertEqual(self._estimates([3, 1, 5, 2, 4], (0, 50, 95, 100)), [1, 3, 4.8, 5])
+
+    def test_small_interval_exact(self):
+        self.assertEqual(self._estimates(range(1, 21), (0, 25, 50, 100)), [1, 5.75, 10.5, 20])
+
+    def test_extremes_exact(self):
+        rand = random.Random(1234)
+        values = [rand.uniform(0, 1000) for _ in range(5000)]
+        self.assertEqual(self._estimates(values, (0, 100)), [min(values), max(values)])
+
+    def test_estimate(self):
+        rand = random.Random(1234)
+        values = [rand.uniform(0, 1000) for _ in range(10000)]
+        for p in (0.05, 0.5, 0.95):
+            estimator = _PSquareEstimator(p)
+            for value in values:
+                estimator.add(value)
+            exact = sorted(values)[int(p * (len(values) - 1))]
+            self.assertAlmostEqual(estimator.get(), exact, delta=10)
+
+
+class TestRollupAggregator(unittest.TestCase):
+
+    def setUp(self):
+        # one value per second for an hour
+        self.timestamps = [START_MS + 1000 * i for i in range(3600)]
+        self.values = [float(i % 600) for i in range(3600)]
+
+    def _check_records(self, records):
+        self.assertEqual(len(records), 12)
+        first = records[0]
+        self.assertEqual(first.timestamp, START)
+        self.assertEqual(records[1].timestamp, START + datetime.timedelta(minutes=5))
+        self.assertEqual(first.count, 300)
+        self.assertEqual(first.sum, sum(range(300)))
+        self.assertAlmostEqual(first.average, 149.5)
+        self.assertEqual(first.min, 0)
+        self.assertEqual(first.max, 299)
+        self.assertAlmostEqual(first.standarddev, 86.6025, places=3)
+        self.assertAlmostEqual(first.percentiles[50], 149.5, delta=2)
+        self.assertEqual(records[1].min, 300)
+
+    def test_add_columns(self):
+        aggregator = RollupAggregator(datetime.timedelta(minutes=5), percentiles=(50, 95))
+        # added in pages (and out of order) as they would be read
+        aggregator.add_columns(self.timestamps[1000:], self.values[1000:])
+        aggregator.add_columns(self.timestamps[:1000], self.values[:1000])
+        self._check_records(aggregator.get_records())
+        self.assertEqual(aggregator.get_records(newest_first=True)[0].timestamp,
+                         START + datetime.timedelta(minutes=55))
+
+    def test_add_columns_without_numpy(self):
+        aggregator = RollupAggregator(datetime.timedelta(minutes=5), percentiles=(50, ))
+        with mock.patch.object(rollup, "numpy", None):
+            aggregator.add_columns(self.timestamps, self.values)
+        self._check_records(aggregator.get_records())
+
+    def test_add(self):
+        aggregator = RollupAggregator(datetime.timedelta(minutes=5), percentiles=(50, ))
+        for timestamp, value in zip(self.timestamps, self.values):
+            aggregator.add(timestamp, value)
+        self._check_records(aggregator.get_records())
+        self.assertEqual(len(aggregator), 12)
+
+    def test_add_datapoints(self):
+        datapoints = [mock.Mock(**{
+            "get_timestamp.return_value": START + datetime.timedelta(seconds=i),
+            "get_data.return_value": i,
+        }) for i in range(10)]
+        aggregator = RollupAggregator(datetime.timedelta(seconds=5))
+        aggregator.add_datapoints(datapoints)
+        self.assertEqual([(r.count, r.sum) for r in aggregator.get_records()], [(5, 10), (5, 35)])
+
+    def test_origin(self):
+        aggregator = RollupAggregator(datetime.timedelta(hours=1), origin=START + datetime.timedelta(minutes=30))
+        aggregator.add_columns(self.timestamps, self.values)
+        records = aggregator.get_records()
+        self.assertEqual([r.timestamp for r in records],
+                         [START - datetime.timedelta(minutes=30), START + datetime.timedelta(minutes=30)])
+        self.assertEqual([r.count for r in records], [1800, 1800])
+
+    def test_invalid(self):
+        self.assertRaises(TypeError, RollupAggregator, 300)
+        self.assertRaises(ValueError, RollupAggregator, datetime.timedelta(0))
+        self.assertRaises(ValueError, RollupAggregator, datetime.timedelta(minutes=1), percentiles=(101, ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,13 +6,17 @@
 
 import unittest
 import datetime
+import json
 import xml.etree.ElementTree as ET
 
 from dateutil.tz import tzutc
-from devicecloud.streams import DataStream, STREAM_TYPE_FLOAT, DataPoint, NoSuchStreamException, ROLLUP_INTERVAL_HALF, \
-    ROLLUP_METHOD_COUNT, STREAM_TYPE_INTEGER, DSTREAM_TYPE_MAP, STREAM_TYPE_JSON
+from devicecloud.streams import StreamsAPI, DataStream, STREAM_TYPE_FLOAT, DataPoint, NoSuchStreamException, ROLLUP_INTERVAL_HALF, \
+    ROLLUP_METHOD_COUNT, STREAM_TYPE_INTEGER, DSTREAM_TYPE_MAP, STREAM_TYPE_JSON, BufferedDataPointWriter, \
+    datapoints_to_xml, STREAM_TYPE_STRING, CompactDataPoint, InvalidRollupDatatype, _common_stream_path
 from devicecloud.test.unit.test_utilities import HttpTestBase
 from devicecloud import DeviceCloudHttpException
+from devicecloud.streams_cache import SQLiteDataPointCache, DEFAULT_SETTLE_TIME
+from devicecloud.util import iso8601_to_dt, isoformat
 
 
 # Example HTTP Responses
@@ -20,6 +24,15 @@ import httpretty
 import mock
 import re
 import six
+import threading
+import time
+import array
+from six.moves.queue import Full
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 CREATE_DATA_STREAM = {
     "location": "teststream"
@@ -388,6 +401,60 @@ class TestStreamsAPI(HttpTestBase):
         streams = self.dc.streams.get_streams('junk')
         self.assertEqual(list(streams), [])
 
+    def _stream_page(self, stream_ids, page_cursor="cursor"):
+        return json.dumps({
+            "resultSize": str(len(stream_ids)),
+            "requestedSize": "2",
+            "pageCursor": page_cursor,
+            "items": [{"streamId": stream_id, "dataType": "INTEGER"} for stream_id in stream_ids]
+        })
+
+    def _prepare_paged_streams(self):
+        self.prepare_response("GET", "/ws/DataStream", responses=[
+            httpretty.Response(body=self._stream_page(["a/1", "b/1"], "c1")),
+            httpretty.Response(body=self._stream_page(["b/2", "a/2"], "c2")),
+            httpretty.Response(body=self._stream_page(["b/10"], "c3")),
+        ])
+
+    def test_get_streams_paged(self):
+        self._prepare_paged_streams()
+        streams = self.dc.streams.get_streams(page_size=2)
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 0)  # lazy
+        self.assertEqual([s.get_stream_id() for s in streams], ["a/1", "b/1", "b/2", "a/2", "b/10"])
+        requests = httpretty.httpretty.latest_requests
+        self.assertEqual(len(requests), 3)
+        self.assertEqual(requests[0].querystring, {"size": ["2"]})
+        self.assertEqual(requests[2].querystring, {"size": ["2"], "pageCursor": ["c2"]})
+
+    def test_get_streams_use_cached(self):
+        self._prepare_paged_streams()
+        streams = list(self.dc.streams.get_streams("b/", use_cached=True, page_size=2))
+        self.assertEqual([s.get_stream_id() for s in streams], ["b/1", "b/10", "b/2"])
+        self.assertEqual(streams[0].get_data_type(), "INTEGER")  # from the listing
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 3)
+
+        # resolved locally from now on
+        streams = list(self.dc.streams.get_streams("/a", use_cached=True))
+        self.assertEqual([s.get_stream_id() for s in streams], ["a/1", "a/2"])
+        self.assertEqual(len(list(self.dc.streams.get_streams(use_cached=True))), 5)
+        self.assertEqual(list(self.dc.streams.get_streams("c", use_cached=True)), [])
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 3)
+
+    def test_get_streams_use_cached_after_listing(self):
+        self._prepare_paged_streams()
+        list(self.dc.streams.get_streams(page_size=2))
+        streams = list(self.dc.streams.get_streams("a", use_cached=True))
+        self.assertEqual([s.get_stream_id() for s in streams], ["a/1", "a/2"])
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 3)
+
+    def test_get_streams_use_cached_includes_created(self):
+        self.prepare_response("GET", "/ws/DataStream", self._stream_page(["a/1"]))
+        self.assertEqual(len(list(self.dc.streams.get_streams(use_cached=True))), 1)
+        self.prepare_json_response("POST", "/ws/DataStream", CREATE_DATA_STREAM)
+        self.dc.streams.create_stream("a/0", "INTEGER")
+        streams = list(self.dc.streams.get_streams("a/", use_cached=True))
+        self.assertEqual([s.get_stream_id() for s in streams], ["a/0", "a/1"])
+
     def test_get_stream(self):
         # Get a stream by ID when there is no cache
         stream = self.dc.streams.get_stream("/test/stream")
@@ -417,6 +484,30 @@ class TestStreamsAPI(HttpTestBase):
     def test_bulk_write_datapoints_datapoint_has_no_stream_id(self):
         self.assertRaises(ValueError, self.dc.streams.bulk_write_datapoints, [DataPoint(123)])
 
+    def test_bulk_write_concurrent_reports_failures(self):
+        # httpretty is not thread-safe, so stand in for the connection's post directly
+        error_response = mock.Mock(status_code=500, content="Internal Server Error")
+        def post(path, data):
+            self.assertEqual(path, "/ws/DataPoint")
+            if "<data>300</data>" in data:
+                raise DeviceCloudHttpException(error_response)
+            return mock.Mock(status_code=200)
+
+        datapoints = [DataPoint(stream_id="my/stream", data_type=STREAM_TYPE_INTEGER, data=i)
+                      for i in range(600)]
+        with mock.patch.object(self.dc.get_connection(), "post", side_effect=post) as patched_post:
+            results = self.dc.streams.bulk_write_datapoints(datapoints, concurrency=3)
+        self.assertEqual(patched_post.call_count, 3)
+        self.assertEqual(len(results), 3)
+        self.assertEqual([len(r.datapoints) for r in results], [250, 250, 100])
+        self.assertEqual(results[0].datapoints[0].get_data(), 0)
+        self.assertEqual(results[1].datapoints[0].get_data(), 250)
+        self.assertIsNone(results[0].exception)
+        self.assertEqual(results[0].response.status_code, 200)
+        self.assertIsNone(results[1].response)
+        self.assertIsInstance(results[1].exception, DeviceCloudHttpException)
+        self.assertIsNone(results[2].exception)
+
     def test_bulk_write_multiple_pages(self):
         # Actual response has a ton of locations for the new data points
         requests = []
@@ -451,6 +542,234 @@ class TestStreamsAPI(HttpTestBase):
         self.assertEqual(parse_for_stream_id(requests[1].body), {'my/stream0', 'my/stream1', 'my/stream2'})
 
 
+class TestStreamMetadataCache(HttpTestBase):
+
+    def _metadata_requests(self):
+        return [r for r in httpretty.httpretty.latest_requests if r.path.startswith("/ws/DataStream/")]
+
+    def test_shared_between_stream_objects(self):
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        self.assertEqual(self.dc.streams.get_stream("test").get_data_type(), "FLOAT")
+        self.assertEqual(self.dc.streams.get_stream("/test").get_units(), "light years")
+        self.assertEqual(len(self._metadata_requests()), 1)
+
+        # not using the cache still refreshes it
+        self.dc.streams.get_stream("test").get_data_type(use_cached=False)
+        self.assertEqual(len(self._metadata_requests()), 2)
+
+    def test_populated_by_listing(self):
+        self.prepare_response("GET", "/ws/DataStream", GET_DATA_STREAMS)
+        list(self.dc.streams.get_streams())
+        self.assertEqual(self.dc.streams.get_stream("test").get_data_type(), "FLOAT")
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 1)
+
+    def test_not_shared_between_apis(self):
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        self.dc.streams.get_stream("test").get_data_type()
+        self.dc.get_streams_api().get_stream("test").get_data_type()
+        self.assertEqual(len(self._metadata_requests()), 2)
+
+    def test_expiry(self):
+        streams = StreamsAPI(self.dc.get_connection(), metadata_cache_ttl=60)
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        with mock.patch("devicecloud.util.monotonic", return_value=1000.0):
+            streams.get_stream("test").get_data_type()
+            streams.get_stream("test").get_data_type()
+        self.assertEqual(len(self._metadata_requests()), 1)
+        with mock.patch("devicecloud.util.monotonic", return_value=1060.0):
+            streams.get_stream("test").get_data_type()
+        self.assertEqual(len(self._metadata_requests()), 2)
+
+    def test_invalidated_on_delete(self):
+        self.prepare_response("GET", "/ws/DataStream", GET_DATA_STREAMS)
+        list(self.dc.streams.get_streams())
+        self.prepare_response("DELETE", "/ws/DataStream/test", "")
+        self.dc.streams.get_stream("test").delete()
+        self.assertEqual([s.get_stream_id() for s in self.dc.streams.get_streams(use_cached=True)],
+                         ["another/test"])
+        self.prepare_response("GET", "/ws/DataStream/test", "", status=404)
+        self.assertIsNone(self.dc.streams.get_stream_if_exists("test"))
+
+    def test_not_invalidated_on_failed_delete(self):
+        self.prepare_response("GET", "/ws/DataStream", GET_DATA_STREAMS)
+        list(self.dc.streams.get_streams())
+        self.prepare_response("DELETE", "/ws/DataStream/test", "", status=500)
+        stream = self.dc.streams.get_stream("test")
+        self.assertRaises(DeviceCloudHttpException, stream.delete)
+        self.assertEqual([s.get_stream_id() for s in self.dc.streams.get_streams(use_cached=True)],
+                         ["another/test", "test"])
+        self.assertEqual(stream.get_data_type(), "FLOAT")
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 2)
+
+    def test_invalidated_on_create(self):
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        self.dc.streams.get_stream("test").get_data_type()
+        self.prepare_json_response("POST", "/ws/DataStream", CREATE_DATA_STREAM)
+        stream = self.dc.streams.create_stream("test", "INTEGER")
+        stream.get_data_type()
+        self.assertEqual(len(self._metadata_requests()), 2)
+
+    def test_not_overwritten_by_cached_listing(self):
+        self.prepare_response("GET", "/ws/DataStream", GET_DATA_STREAMS)
+        list(self.dc.streams.get_streams())
+        self.dc.streams._update_stream_metadata("test", {"dataType": "INTEGER"})
+        streams = dict((s.get_stream_id(), s) for s in self.dc.streams.get_streams(use_cached=True))
+        self.assertEqual(streams["test"].get_data_type(), "INTEGER")
+        self.assertEqual(self.dc.streams.get_stream("test").get_data_type(), "INTEGER")
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 1)
+
+    def test_invalidation_reaches_existing_streams(self):
+        self.prepare_response("GET", "/ws/DataStream", GET_DATA_STREAMS)
+        stream = dict((s.get_stream_id(), s) for s in self.dc.streams.get_streams())["test"]
+        self.assertEqual(stream.get_data_type(), "FLOAT")
+        self.dc.streams._invalidate_stream("test")
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        stream.get_data_type()
+        self.assertEqual(len(self._metadata_requests()), 1)
+
+
+class TestStreamsAPIGetCurrentValues(HttpTestBase):
+
+    def _stream_json(self, stream_id, value=None):
+        stream_data = {"streamId": stream_id, "dataType": "INTEGER", "units": "rpm"}
+        if value is not None:
+            stream_data["currentValue"] = {
+                "id": "id-%s" % stream_id,
+                "timestampISO": "2015-01-01T00:00:00.000Z",
+                "serverTimestampISO": "2015-01-01T00:00:00.100Z",
+                "data": str(value),
+                "quality": "0",
+            }
+        return stream_data
+
+    def _prepare_listing(self, path, pages):
+        self.prepare_response("GET", path, responses=[httpretty.Response(body=json.dumps({
+            "resultSize": str(len(page)),
+            "pageCursor": "cursor%d" % i,
+            "items": page,
+        })) for i, page in enumerate(pages)])
+
+    def test_stream_ids(self):
+        self._prepare_listing("/ws/DataStream/plant1", [
+            [self._stream_json("plant1/line1/speed", 10), self._stream_json("plant1/line1/temp", 20)],
+            [self._stream_json("plant1/line2/speed", 30), self._stream_json("plant1/line2/temp")],
+            [],
+        ])
+        values = self.dc.streams.get_current_values(
+            ["plant1/line1/speed", "/plant1/line2/speed", "plant1/line2/temp", "plant1/line3/speed"], page_size=2)
+        self.assertEqual(sorted(values.keys()), ["plant1/line1/speed", "plant1/line2/speed", "plant1/line2/temp"])
+        self.assertEqual(values["plant1/line2/speed"].get_data(), 30)
+        self.assertEqual(values["plant1/line2/speed"].get_units(), "rpm")
+        self.assertEqual(values["plant1/line2/speed"].get_id(), "id-plant1/line2/speed")
+        self.assertIsNone(values["plant1/line2/temp"])
+
+        requests = httpretty.httpretty.latest_requests
+        self.assertEqual(len(requests), 3)
+        self.assertEqual(requests[1].querystring["pageCursor"], ["cursor0"])
+
+        # metadata was cached along the way
+        self.dc.streams.get_stream("plant1/line1/temp").get_data_type()
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 3)
+
+    def test_stream_prefix(self):
+        self._prepare_listing("/ws/DataStream/plant2", [[self._stream_json("plant2/a", 1), self._stream_json("plant2/b", 2)]])
+        values = self.dc.streams.get_current_values(stream_prefix="plant2")
+        self.assertEqual(dict((k, v.get_data()) for k, v in values.items()), {"plant2/a": 1, "plant2/b": 2})
+
+    def test_unrelated_stream_ids_listed_separately(self):
+        self._prepare_listing("/ws/DataStream/a", [[self._stream_json("a", 1)]])
+        self._prepare_listing("/ws/DataStream/b", [[self._stream_json("b/c/d", 2), self._stream_json("b/c/e", 3),
+                                                    self._stream_json("b/f", 4)]])
+        values = self.dc.streams.get_current_values(["a", "b/c/d", "b/f"])
+        self.assertEqual(dict((k, v.get_data()) for k, v in values.items()), {"a": 1, "b/c/d": 2, "b/f": 4})
+        self.assertEqual(sorted(request.path.split("?")[0] for request in httpretty.httpretty.latest_requests),
+                         ["/ws/DataStream/a", "/ws/DataStream/b"])
+
+    def test_many_devices_listed_at_once(self):
+        stream_ids = ["device%03d/temp" % i for i in range(100)]
+        self._prepare_listing("/ws/DataStream", [
+            [self._stream_json(stream_id, i) for i, stream_id in enumerate(stream_ids)] +
+            [self._stream_json("device000/humidity", 1)],
+        ])
+        values = self.dc.streams.get_current_values(stream_ids)
+        self.assertEqual(sorted(values.keys()), stream_ids)
+        self.assertEqual(values["device042/temp"].get_data(), 42)
+        requests = httpretty.httpretty.latest_requests
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0].path.split("?")[0], "/ws/DataStream")
+
+    def test_common_stream_path(self):
+        self.assertEqual(_common_stream_path(["plant1/line1/speed", "plant1/line10/speed"]), "plant1")
+        self.assertEqual(_common_stream_path(["a", "a/b"]), "a")
+        self.assertEqual(_common_stream_path(["a/b"]), "a/b")
+        self.assertIsNone(_common_stream_path(["a", "b/c"]))
+
+    def test_single_missing_stream(self):
+        self.prepare_response("GET", "/ws/DataStream/missing", "", status=404)
+        self.assertEqual(self.dc.streams.get_current_values(["missing"]), {})
+
+    def test_invalid_arguments(self):
+        self.assertEqual(self.dc.streams.get_current_values([]), {})
+        self.assertRaises(ValueError, self.dc.streams.get_current_values, ["a"], stream_prefix="a")
+
+
+class TestStreamsAPIReadMany(HttpTestBase):
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        self.requested_paths = []
+        self.lock = threading.Lock()
+
+    def _fake_get_json(self, path):
+        with self.lock:
+            self.requested_paths.append(path)
+        stream_id = path.split("?")[0].split("/", 3)[3]
+        if stream_id == "missing":
+            response = mock.Mock(status_code=404)
+            raise DeviceCloudHttpException(response, "not found")
+        if path.startswith("/ws/DataStream/"):
+            return {"items": [{"streamId": stream_id, "dataType": "INTEGER", "units": "m"}]}
+        index = int(stream_id[len("stream"):])
+        return {
+            "resultSize": str(index),
+            "items": [{"id": "%s-%d" % (stream_id, i), "data": str(i),
+                       "timestampISO": "2015-01-01T00:00:0%dZ" % i} for i in range(index)]
+        }
+
+    def _read_many(self, streams, **kwargs):
+        with mock.patch.object(self.dc.get_connection(), "get_json", side_effect=self._fake_get_json):
+            return list(self.dc.streams.read_many(streams, **kwargs))
+
+    def test_read_many_points(self):
+        results = self._read_many(["stream%d" % i for i in range(6)], workers=3, newest_first=False)
+        self.assertEqual(len(results), 0 + 1 + 2 + 3 + 4 + 5)
+        by_stream = {}
+        for stream_id, dp in results:
+            self.assertEqual(dp.get_stream_id(), stream_id)
+            by_stream.setdefault(stream_id, []).append(dp.get_data())
+        self.assertEqual(by_stream["stream4"], [0, 1, 2, 3])
+
+        # metadata is requested just once for each stream
+        metadata_requests = [p for p in self.requested_paths if p.startswith("/ws/DataStream/")]
+        self.assertEqual(sorted(metadata_requests), ["/ws/DataStream/stream%d" % i for i in range(6)])
+
+    def test_read_many_batch(self):
+        results = dict(self._read_many(["stream2", "stream3"], batch=True, compact=True))
+        self.assertEqual(sorted(results.keys()), ["stream2", "stream3"])
+        self.assertEqual([dp.get_id() for dp in results["stream3"]], ["stream3-0", "stream3-1", "stream3-2"])
+        self.assertIsInstance(results["stream3"][0], CompactDataPoint)
+
+    def test_read_many_cached_streams(self):
+        conn = self.dc.get_connection()
+        streams = [DataStream(conn, "stream%d" % i, {"dataType": "INTEGER"}) for i in range(3)]
+        results = self._read_many(streams, batch=True)
+        self.assertEqual(len(results), 3)
+        self.assertFalse([p for p in self.requested_paths if p.startswith("/ws/DataStream/")])
+
+    def test_read_many_missing_stream(self):
+        self.assertRaises(NoSuchStreamException, self._read_many, ["stream1", "missing"])
+
+
 class TestDataStream(HttpTestBase):
     def _get_stream(self, response):
         self.prepare_response("GET", "/ws/DataStream/test", response)
@@ -707,6 +1026,69 @@ class TestDataStreamRead(HttpTestBase):
         self.assertEqual(point5.get_id(), "76459cf1-0968-11e4-98e9-fa163ecf1de4")
         self.assertRaises(StopIteration, six.next, generator)
 
+    def test_read_streaming(self):
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        self._prepare_five_paged_points()
+        test_stream = self.dc.streams.get_stream("test")
+        points = list(test_stream.read(page_size=2, streaming=True))
+        self.assertEqual([dp.get_data() for dp in points],
+                         [0.0, 3.14159265359, 6.28318530718, 9.42477796077, 12.5663706144])
+        self.assertEqual(points[4].get_id(), "76459cf1-0968-11e4-98e9-fa163ecf1de4")
+        self.assertEqual(len(httpretty.httpretty.latest_requests), 4)
+
+    def _prepare_five_paged_points(self):
+        self.prepare_response("GET", "/ws/DataPoint/test", responses=[
+            httpretty.Response(body=page) for page in GET_DATA_POINTS_FIVE_PAGED
+        ])
+
+    def _assert_five_paged_columns(self, columns):
+        self.assertEqual(list(columns.timestamps), [1405130498373, 1405130498612, 1405130498843,
+                                                    1405130499094, 1405130499347])
+        self.assertEqual(list(columns.server_timestamps), list(columns.timestamps))
+        self.assertEqual(list(columns.values), [0.0, 3.14159265359, 6.28318530718, 9.42477796077, 12.5663706144])
+        self.assertEqual(list(columns.qualities), [0, 0, 0, 0, 0])
+
+    def test_read_columns_array(self):
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        self._prepare_five_paged_points()
+        with mock.patch("devicecloud.streams.numpy", None):
+            columns = self.dc.streams.get_stream("test").read_columns(page_size=2)
+        self.assertIsInstance(columns.timestamps, array.array)
+        self.assertIsInstance(columns.values, array.array)
+        self.assertEqual(columns.values.typecode, 'd')
+        self._assert_five_paged_columns(columns)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_read_columns_numpy(self):
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        self._prepare_five_paged_points()
+        columns = self.dc.streams.get_stream("test").read_columns(page_size=2)
+        self.assertEqual(columns.timestamps.dtype, numpy.int64)
+        self.assertEqual(columns.values.dtype, numpy.float64)
+        self.assertEqual(columns.qualities.dtype, numpy.int32)
+        self._assert_five_paged_columns(columns)
+
+    def test_read_columns_empty(self):
+        self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
+        self.prepare_response("GET", "/ws/DataPoint/test", GET_DATA_POINTS_EMPTY)
+        columns = self.dc.streams.get_stream("test").read_columns()
+        self.assertEqual(len(columns.timestamps), 0)
+        self.assertEqual(len(columns.values), 0)
+
+    def test_read_columns_non_numeric(self):
+        stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_STRING})
+        self.prepare_response("GET", "/ws/DataPoint/test", GET_DATA_POINTS_ONE)
+        columns = stream.read_columns()
+        self.assertEqual(columns.values, ["0.0"])
+        self.assertEqual(list(columns.timestamps), [1405130498373])
+
+    def test_read_columns_rollup(self):
+        stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_INTEGER})
+        self.prepare_response("GET", "/ws/DataPoint/test", GET_DATA_POINTS_ONE)
+        columns = stream.read_columns(rollup_interval=ROLLUP_INTERVAL_HALF, rollup_method=ROLLUP_METHOD_COUNT)
+        self.assertEqual(list(columns.values), [0.0])
+        self.assertEqual(self._get_last_request_params()["rollupMethod"], "count")
+
     def test_start_time(self):
         self.prepare_response("GET", "/ws/DataStream/test", GET_TEST_DATA_STREAM)
         self.prepare_response("GET", "/ws/DataPoint/test", GET_DATA_POINTS_ONE)
@@ -775,6 +1157,362 @@ class TestDataStreamRead(HttpTestBase):
         self.assertEqual(httpretty.httpretty.latest_requests[-2].querystring["size"][0], "9876")
 
 
+class TestDataStreamReadPartitioned(HttpTestBase):
+
+    START = datetime.datetime(2015, 1, 1, tzinfo=tzutc())
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        self.stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_INTEGER})
+        # one point every minute for a day
+        self.points = [self.START + datetime.timedelta(minutes=i) for i in range(24 * 60)]
+        self.requested_windows = []
+        self.lock = threading.Lock()
+
+    def _fake_get_json(self, url):
+        query = six.moves.urllib.parse.parse_qs(six.moves.urllib.parse.urlparse(url).query)
+        start = iso8601_to_dt(query["startTime"][0])
+        end = iso8601_to_dt(query["endTime"][0])
+        with self.lock:
+            self.requested_windows.append((start, end))
+        matching = [dt for dt in self.points if start <= dt < end]
+        if query["order"][0] == "descending":
+            matching.reverse()
+        # serve everything in a window in pages of (at most) 100 using the offset as the cursor
+        offset = int(query.get("pageCursor", ["0"])[0])
+        page = matching[offset:offset + 100]
+        return {
+            "resultSize": str(len(page)),
+            "pageCursor": str(offset + len(page)),
+            "items": [{
+                "id": str(int((dt - self.START).total_seconds())),
+                "timestampISO": isoformat(dt),
+                "serverTimestampISO": isoformat(dt),
+                "data": "1",
+                "quality": "0",
+            } for dt in page]
+        }
+
+    def _read(self, **kwargs):
+        with mock.patch.object(self.stream._conn, "get_json", side_effect=self._fake_get_json):
+            return list(self.stream.read_partitioned(
+                self.START, self.START + datetime.timedelta(days=1), page_size=100, **kwargs))
+
+    def test_ordered_oldest_first(self):
+        points = self._read(partitions=7, workers=3, newest_first=False)
+        self.assertEqual([dp.get_timestamp() for dp in points], self.points)
+        self.assertEqual(len(set(self.requested_windows)), 7)
+        self.assertEqual(len(self.requested_windows), 7 * 3)  # ~206 points per window, in pages of 100
+
+    def test_ordered_newest_first(self):
+        points = self._read(partitions=4, compact=True)
+        self.assertEqual([dp.get_timestamp() for dp in points], list(reversed(self.points)))
+        self.assertIsInstance(points[0], CompactDataPoint)
+
+    def test_windows_cover_range(self):
+        self._read(partitions=5)
+        windows = sorted(set(self.requested_windows))
+        self.assertEqual(len(windows), 5)
+        self.assertEqual(windows[0][0], self.START)
+        self.assertEqual(windows[-1][1], self.START + datetime.timedelta(days=1))
+        for (_, end), (start, _) in zip(windows, windows[1:]):
+            self.assertEqual(end, start)
+
+    def test_unordered(self):
+        points = self._read(partitions=6, ordered=False, newest_first=False)
+        self.assertEqual(sorted(dp.get_timestamp() for dp in points), self.points)
+
+    def test_invalid(self):
+        end = self.START + datetime.timedelta(days=1)
+        self.assertRaises(ValueError, list, self.stream.read_partitioned(end, self.START))
+        self.assertRaises(ValueError, list, self.stream.read_partitioned(self.START, end, partitions=0))
+        self.assertRaises(TypeError, list, self.stream.read_partitioned(None, end))
+
+    def test_short_window(self):
+        end = self.START + datetime.timedelta(milliseconds=3)
+        with mock.patch.object(self.stream._conn, "get_json", side_effect=self._fake_get_json):
+            points = list(self.stream.read_partitioned(self.START, end, partitions=10))
+        self.assertEqual(len(points), 1)
+        self.assertEqual(len(self.requested_windows), 3)
+
+
+class TestDataStreamRollup(HttpTestBase):
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        self.stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_INTEGER})
+
+    def test_rollup(self):
+        start_ms = 1420070400000
+        pages = [{"resultSize": str(len(page)), "pageCursor": "1", "items": [
+            {"id": str(i), "timestamp": str(start_ms + i * 60000), "serverTimestamp": str(start_ms),
+             "data": str(i)} for i in page]} for page in ([0, 1], [5, 6], [])]
+        with mock.patch.object(self.stream._conn, "get_json", side_effect=pages) as get_json:
+            records = self.stream.rollup(datetime.timedelta(minutes=5), percentiles=(50, ), page_size=2)
+        self.assertEqual(get_json.call_count, 3)
+        self.assertIn("order=ascending", get_json.call_args[0][0])
+        self.assertEqual([(r.count, r.min, r.max, r.percentiles[50]) for r in records],
+                         [(2, 0, 1, 0.5), (2, 5, 6, 5.5)])
+        self.assertEqual(records[1].timestamp, datetime.datetime(2015, 1, 1, 0, 5, tzinfo=tzutc()))
+
+    def test_rollup_server_timeline(self):
+        page = {"resultSize": "2", "items": [
+            {"id": "a", "timestamp": "0", "serverTimestamp": "1420070400000", "data": "1"},
+            {"id": "b", "timestamp": "600000", "serverTimestamp": "1420070400001", "data": "2"}]}
+        with mock.patch.object(self.stream._conn, "get_json", return_value=page):
+            records = self.stream.rollup(datetime.timedelta(minutes=5), use_client_timeline=False)
+        self.assertEqual([(r.count, r.sum) for r in records], [(2, 3.0)])
+
+    def test_rollup_not_numeric(self):
+        stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_STRING})
+        self.assertRaises(InvalidRollupDatatype, stream.rollup, datetime.timedelta(minutes=5))
+
+class TestDataStreamReadRollups(HttpTestBase):
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        self.stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_INTEGER})
+        self.methods_requested = []
+        self.lock = threading.Lock()
+
+    def _fake_get_json(self, url):
+        query = six.moves.urllib.parse.parse_qs(six.moves.urllib.parse.urlparse(url).query)
+        method = query["rollupMethod"][0]
+        with self.lock:
+            self.methods_requested.append(method)
+        self.assertEqual(query["rollupInterval"], [ROLLUP_INTERVAL_HALF])
+        offset = {"min": 0, "max": 10, "average": 5, "count": 3}[method]
+        hours = [0, 1] if method != "count" else [1]
+        return {"resultSize": str(len(hours)), "items": [
+            {"id": "", "timestamp": str(1420070400000 + 3600000 * hour),
+             "timestampISO": isoformat(datetime.datetime(2015, 1, 1, hour, tzinfo=tzutc())),
+             "data": str(offset + hour)} for hour in hours]}
+
+    def test_read_rollups(self):
+        with mock.patch.object(self.stream._conn, "get_json", side_effect=self._fake_get_json):
+            records = self.stream.read_rollups(ROLLUP_INTERVAL_HALF)
+        self.assertEqual(sorted(self.methods_requested), ["average", "max", "min"])
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0].timestamp, datetime.datetime(2015, 1, 1, 1, tzinfo=tzutc()))  # newest first
+        self.assertEqual((records[0].min, records[0].max, records[0].average), (1, 11, 6))
+        self.assertIsInstance(records[0].max, int)
+        self.assertEqual((records[1].min, records[1].max, records[1].average), (0.0, 10.0, 5.0))
+        self.assertIsNone(records[0].sum)
+
+    def test_partial_intervals(self):
+        with mock.patch.object(self.stream._conn, "get_json", side_effect=self._fake_get_json):
+            records = self.stream.read_rollups(ROLLUP_INTERVAL_HALF, rollup_methods=[ROLLUP_METHOD_COUNT, "min"],
+                                               newest_first=False, workers=1)
+        self.assertEqual([(r.count, r.min) for r in records], [(None, 0), (4, 1)])
+        self.assertIsInstance(records[1].count, int)
+        self.assertIsInstance(records[1].min, int)
+
+    def test_values_converted_to_stream_type(self):
+        self.stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_FLOAT})
+        with mock.patch.object(self.stream._conn, "get_json", side_effect=self._fake_get_json):
+            records = self.stream.read_rollups(ROLLUP_INTERVAL_HALF, rollup_methods=[ROLLUP_METHOD_COUNT, "max"])
+        self.assertIsInstance(records[0].count, int)
+        self.assertIsInstance(records[0].max, float)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, self.stream.read_rollups, ROLLUP_INTERVAL_HALF, rollup_methods=[])
+        self.assertRaises(ValueError, self.stream.read_rollups, ROLLUP_INTERVAL_HALF, rollup_methods=["median"])
+        stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_JSON})
+        self.assertRaises(InvalidRollupDatatype, stream.read_rollups, ROLLUP_INTERVAL_HALF)
+
+
+class TestDataStreamFollow(HttpTestBase):
+
+    START = datetime.datetime(2015, 1, 1, tzinfo=tzutc())
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        self.stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_INTEGER})
+        self.points = []  # (server timestamp, id) in the order written
+        self.sleeps = []
+        self.writes_on_sleep = []  # lists of points to write at each sleep
+        self.prepare_response("GET", "/ws/DataStream/test", body=self._stream_response)
+        self.prepare_response("GET", "/ws/DataPoint/test", body=self._points_response)
+
+    def _write(self, seconds, dp_id):
+        self.points.append((self.START + datetime.timedelta(seconds=seconds), dp_id))
+
+    def _item(self, point):
+        return {"id": point[1], "data": "1", "timestampISO": isoformat(point[0]),
+                "serverTimestampISO": isoformat(point[0])}
+
+    def _stream_response(self, request, uri, headers):
+        stream_data = {"streamId": "test", "dataType": "INTEGER"}
+        if self.points:
+            stream_data["currentValue"] = self._item(max(self.points))
+        return [200, headers, json.dumps({"items": [stream_data]})]
+
+    def _points_response(self, request, uri, headers):
+        matching = sorted(self.points)
+        if "startTime" in request.querystring:
+            start = iso8601_to_dt(request.querystring["startTime"][0])
+            matching = [p for p in matching if p[0] >= start]
+        offset = int(request.querystring.get("pageCursor", ["0"])[0])
+        page = matching[offset:offset + int(request.querystring["size"][0])]
+        return [200, headers, json.dumps({"resultSize": str(len(page)), "pageCursor": str(offset + len(page)),
+                                          "items": [self._item(p) for p in page]})]
+
+    def _point_requests(self):
+        return [r.querystring for r in httpretty.httpretty.latest_requests if r.path.startswith("/ws/DataPoint/")]
+
+    def _fake_sleep(self, delay):
+        self.sleeps.append(delay)
+        if self.writes_on_sleep:
+            for seconds, dp_id in self.writes_on_sleep.pop(0):
+                self._write(seconds, dp_id)
+
+    def _follow(self, count, **kwargs):
+        with mock.patch("devicecloud.streams.time.sleep", side_effect=self._fake_sleep):
+            followed = []
+            for dp in self.stream.follow(**kwargs):
+                followed.append(dp.get_id())
+                if len(followed) == count:
+                    break
+        for query in self._point_requests():
+            self.assertEqual(query["order"], ["ascending"])
+            self.assertEqual(query["timeline"], ["server"])
+        return followed
+
+    def test_follow_new_points(self):
+        self._write(0, "old1")
+        self._write(1, "old2")
+        self.writes_on_sleep = [[], [(2, "a"), (2, "b")], [], [], [(2, "c"), (3, "d")]]
+        self.assertEqual(self._follow(4, poll_interval=1.0, max_poll_interval=3.0),
+                         ["a", "b", "c", "d"])
+        # backoff while idle, reset once points are seen
+        self.assertEqual(self.sleeps, [1.0, 1.5, 1.0, 1.5, 2.25])
+        # only points from the last point seen are requested
+        point_requests = self._point_requests()
+        self.assertEqual(point_requests[0]["startTime"], [isoformat(self.START + datetime.timedelta(seconds=1))])
+        self.assertEqual(point_requests[-1]["startTime"], [isoformat(self.START + datetime.timedelta(seconds=2))])
+
+    def test_follow_max_interval(self):
+        self.writes_on_sleep = [[]] * 6 + [[(5, "a")]]
+        self.assertEqual(self._follow(1, poll_interval=1.0, max_poll_interval=2.0, backoff_coefficient=2.0), ["a"])
+        self.assertEqual(self.sleeps, [1.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0])
+        self.assertNotIn("startTime", self._point_requests()[0])  # nothing written yet
+
+    def test_follow_sleeps_after_new_points(self):
+        self.writes_on_sleep = [[(1, "a")], [(2, "b")], [(3, "c")]]
+        self.assertEqual(self._follow(3, poll_interval=0.5), ["a", "b", "c"])
+        self.assertEqual(self.sleeps, [0.5, 0.5, 0.5])
+
+    def test_follow_yields_points_as_read(self):
+        for i in range(3):
+            self._write(i, "new%d" % i)
+        followed = self.stream.follow(start_time=self.START, page_size=1)
+        self.assertEqual(next(followed).get_id(), "new0")
+        self.assertEqual(len(self._point_requests()), 1)  # the later pages are not requested yet
+
+    def test_follow_from_start_time(self):
+        self._write(0, "old1")
+        self._write(10, "new1")
+        self._write(11, "new2")
+        self.assertEqual(self._follow(2, start_time=self.START + datetime.timedelta(seconds=5), page_size=1),
+                         ["new1", "new2"])
+        self.assertEqual(self.sleeps, [])
+        self.assertEqual([query.get("pageCursor") for query in self._point_requests()], [None, ["1"]])
+
+
+class TestDataStreamReadCached(HttpTestBase):
+
+    START = datetime.datetime(2015, 1, 1, tzinfo=tzutc())
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        self.stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_INTEGER})
+        self.points = [self.START + datetime.timedelta(minutes=i) for i in range(24 * 60)]
+        self.cache = SQLiteDataPointCache(":memory:")
+        self.addCleanup(self.cache.close)
+        self.prepare_response("GET", "/ws/DataPoint/test", body=self._points_response)
+
+    def _points_response(self, request, uri, headers):
+        start = iso8601_to_dt(request.querystring["startTime"][0])
+        end = iso8601_to_dt(request.querystring["endTime"][0])
+        matching = [dt for dt in self.points if start <= dt < end]
+        return [200, headers, json.dumps({
+            "resultSize": str(len(matching)),
+            "items": [{
+                "id": str(int((dt - self.START).total_seconds())),
+                "timestamp": str(int((dt - self.START).total_seconds() * 1000) + 1420070400000),
+                "timestampISO": isoformat(dt),
+                "serverTimestamp": str(int((dt - self.START).total_seconds() * 1000) + 1420070400000),
+                "serverTimestampISO": isoformat(dt),
+                "data": "1",
+                "quality": "0",
+            } for dt in matching]
+        })]
+
+    def _requested_windows(self):
+        """The (startTime, endTime) of each request made for points"""
+        return [(iso8601_to_dt(r.querystring["startTime"][0]), iso8601_to_dt(r.querystring["endTime"][0]))
+                for r in httpretty.httpretty.latest_requests]
+
+    def _read(self, start_hour, end_hour, **kwargs):
+        return list(self.stream.read(
+            self.START + datetime.timedelta(hours=start_hour),
+            self.START + datetime.timedelta(hours=end_hour),
+            page_size=10000, cache=self.cache, **kwargs))
+
+    def test_read_twice(self):
+        first = self._read(0, 2)
+        self.assertEqual([dp.get_timestamp() for dp in first], list(reversed(self.points[:120])))
+        self.assertEqual(len(self._requested_windows()), 1)
+
+        second = self._read(0, 2)
+        self.assertEqual(len(self._requested_windows()), 1)  # served entirely from the cache
+        self.assertEqual([dp.get_id() for dp in second], [dp.get_id() for dp in first])
+        self.assertEqual(second[0].get_data(), 1)
+
+    def test_only_gaps_requested(self):
+        self._read(2, 4)
+        self._read(6, 8)
+        httpretty.httpretty.latest_requests[:] = []
+        points = self._read(1, 10, newest_first=False, compact=True)
+        self.assertEqual([dp.get_timestamp() for dp in points], self.points[60:600])
+        hours = lambda h: self.START + datetime.timedelta(hours=h)
+        self.assertEqual(self._requested_windows(), [(hours(1), hours(2)), (hours(4), hours(6)), (hours(8), hours(10))])
+        self.assertEqual(self.cache.get_cached_ranges("test"), [(hours(1), hours(10))])
+        self.assertEqual(self.cache.get_cached_ranges("test", use_client_timeline=False), [])
+
+    def test_timelines_cached_separately(self):
+        self._read(0, 1)
+        self._read(0, 1, use_client_timeline=False)
+        self.assertEqual(len(self._requested_windows()), 2)
+
+    def test_clear(self):
+        self._read(0, 1)
+        self.cache.clear("test")
+        self.assertEqual(len(self._read(0, 1)), 60)
+        self.assertEqual(len(self._requested_windows()), 2)
+
+    def test_recent_points_not_cached(self):
+        hours = lambda h: self.START + datetime.timedelta(hours=h)
+        # points written in the last settle_time may still change, so here only the first hour has settled
+        self.cache = SQLiteDataPointCache(":memory:", settle_time=datetime.datetime.now(tzutc()) - hours(1))
+        self.addCleanup(self.cache.close)
+        self.assertEqual(len(self._read(0, 2)), 120)
+        (cached_start, cached_end), = self.cache.get_cached_ranges("test")
+        self.assertEqual(cached_start, hours(0))
+        self.assertTrue(hours(1) <= cached_end < hours(1) + datetime.timedelta(minutes=1))
+        self.assertEqual(len(self._read(0, 2)), 120)
+        self.assertEqual(self._requested_windows()[1], (cached_end, hours(2)))
+
+    def test_open_ended_read_not_cached_to_now(self):
+        self.assertEqual(len(list(self.stream.read(self.START, page_size=10000, cache=self.cache))), 24 * 60)
+        (_, cached_end), = self.cache.get_cached_ranges("test")
+        self.assertLessEqual(cached_end, datetime.datetime.now(tzutc()) - DEFAULT_SETTLE_TIME)
+
+    def test_rollup_not_supported(self):
+        self.assertRaises(ValueError, self._read, 0, 1, rollup_interval=ROLLUP_INTERVAL_HALF,
+                          rollup_method=ROLLUP_METHOD_COUNT)
+
+
 class TestDataPoint(HttpTestBase):
     def _get_stream(self, stream_id="test", with_cached_data=False):
         if with_cached_data:
@@ -791,8 +1529,8 @@ class TestDataPoint(HttpTestBase):
 
         dp = stream.get_current_value()
         self.assertEqual(dp.get_id(), "07d77854-0557-11e4-ab44-fa163e7ebc6b")
-        self.assertEqual(dp.get_timestamp(), datetime.datetime(2014, 7, 6, 21, 46, 47, 981, tzinfo=tzutc()))
-        self.assertEqual(dp.get_server_timestamp(), datetime.datetime(2014, 7, 6, 21, 46, 47, 981, tzinfo=tzutc()))
+        self.assertEqual(dp.get_timestamp(), datetime.datetime(2014, 7, 6, 21, 46, 47, 981000, tzinfo=tzutc()))
+        self.assertEqual(dp.get_server_timestamp(), datetime.datetime(2014, 7, 6, 21, 46, 47, 981000, tzinfo=tzutc()))
         self.assertEqual(dp.get_data(), 123.1)
         self.assertEqual(dp.get_description(), "Test")
         self.assertEqual(dp.get_quality(), 20)
@@ -922,6 +1660,194 @@ class TestDataPoint(HttpTestBase):
         self.assertEqual(six.b(dt_wo_ms.isoformat()),
                          six.b('2014-07-06T21:46:47+00:00'))
 
+    def test_rollup_datapoint_single_decode(self):
+        # rollup data is always float, even for integer streams, and is only converted once
+        stream = DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_INTEGER, "units": "ticks"})
+        dp = DataPoint.from_rollup_json(stream, {"id": "", "timestamp": "1404683207981", "data": "3.0"})
+        self.assertEqual(dp.get_data(), 3)
+        self.assertEqual(dp.get_timestamp(), datetime.datetime(2014, 7, 6, 21, 46, 47, 981000, tzinfo=tzutc()))
+        self.assertEqual(dp.get_units(), "ticks")
+        self.assertIsNone(dp.get_server_timestamp())
+
+
+class TestCompactDataPoint(HttpTestBase):
+    EXAMPLE_JSON = {
+        "id": "07d77854-0557-11e4-ab44-fa163e7ebc6b",
+        "timestamp": "1404683207981",
+        "timestampISO": "2014-07-06T21:46:47.981Z",
+        "serverTimestamp": "1404683208120",
+        "serverTimestampISO": "2014-07-06T21:46:48.120Z",
+        "data": "3.5",
+        "description": "Test",
+        "quality": "20",
+        "location": "1.0,2.0,3.0"
+    }
+
+    def _get_stream(self):
+        return DataStream(self.dc.get_connection(), "test", {"dataType": STREAM_TYPE_FLOAT, "units": "F"})
+
+    def test_from_json_matches_datapoint(self):
+        stream = self._get_stream()
+        compact = CompactDataPoint.from_json(stream, self.EXAMPLE_JSON)
+        full = DataPoint.from_json(stream, self.EXAMPLE_JSON)
+        for getter in ("get_id", "get_data", "get_stream_id", "get_description", "get_timestamp",
+                       "get_server_timestamp", "get_quality", "get_location", "get_data_type", "get_units"):
+            self.assertEqual(getattr(compact, getter)(), getattr(full, getter)(), getter)
+        self.assertEqual(repr(compact), "Compact" + repr(full))
+
+    def test_from_rollup_json_matches_datapoint(self):
+        stream = self._get_stream()
+        compact = CompactDataPoint.from_rollup_json(stream, self.EXAMPLE_JSON)
+        full = DataPoint.from_rollup_json(stream, self.EXAMPLE_JSON)
+        self.assertEqual(compact.get_timestamp(), full.get_timestamp())
+        self.assertEqual(compact.get_data(), full.get_data())
+
+    def test_no_dict(self):
+        compact = CompactDataPoint.from_json(self._get_stream(), self.EXAMPLE_JSON)
+        self.assertFalse(hasattr(compact, "__dict__"))
+        self.assertRaises(AttributeError, setattr, compact, "extra", 1)
+
+    def test_to_datapoint(self):
+        compact = CompactDataPoint.from_json(self._get_stream(), self.EXAMPLE_JSON)
+        dp = compact.to_datapoint()
+        self.assertIsInstance(dp, DataPoint)
+        self.assertEqual(dp.get_id(), compact.get_id())
+        self.assertEqual(dp.get_location(), (1.0, 2.0, 3.0))
+        self.assertEqual(dp.get_server_timestamp(), compact.get_server_timestamp())
+        dp.set_data(4.5)  # mutable copy, the compact point is unchanged
+        self.assertEqual(compact.get_data(), 3.5)
+
+    def test_read_compact(self):
+        stream = self._get_stream()
+        self.prepare_response("GET", "/ws/DataPoint/test", GET_DATA_POINTS_ONE)
+        points = list(stream.read(compact=True))
+        self.assertEqual(len(points), 1)
+        self.assertIsInstance(points[0], CompactDataPoint)
+        self.assertEqual(points[0].get_id(), "75b0e84b-0968-11e4-9041-fa163e8f4b62")
+        self.assertEqual(points[0].get_quality(), 0)
+
+
+class TestDatapointsToXml(unittest.TestCase):
+
+    def test_matches_to_xml(self):
+        test_dt = datetime.datetime(2014, 7, 7, 14, 10, 34, 123000, tzinfo=tzutc())
+        datapoints = [
+            DataPoint(1),
+            DataPoint(stream_id="a", data_type=STREAM_TYPE_INTEGER, data=5, units="m"),
+            DataPoint(stream_id="a", data_type=STREAM_TYPE_INTEGER, data=6, units="m", quality=2),
+            DataPoint(stream_id="b", data_type=STREAM_TYPE_FLOAT, data=1.5, description="desc",
+                      timestamp=test_dt, location=(1.0, 2.0, 3.0)),
+            DataPoint(stream_id="c", data_type=STREAM_TYPE_JSON, data={"key": [1, 2]}),
+            DataPoint(stream_id="c", data={"key": [1, 2]}, units="u"),
+        ]
+        expected = "<list>%s</list>" % "".join(dp.to_xml() for dp in datapoints)
+        self.assertEqual(datapoints_to_xml(datapoints), expected)
+
+    def test_empty(self):
+        self.assertEqual(datapoints_to_xml([]), "<list></list>")
+
+
+class TestBufferedDataPointWriter(HttpTestBase):
+
+    def setUp(self):
+        HttpTestBase.setUp(self)
+        # httpretty is not thread-safe, so stand in for the connection's post directly
+        self.posted = []
+        self.post_patcher = mock.patch.object(self.dc.get_connection(), "post", side_effect=self._post)
+        self.post_patcher.start()
+
+    def tearDown(self):
+        self.post_patcher.stop()
+        HttpTestBase.tearDown(self)
+
+    def _post(self, path, data):
+        root = ET.fromstring(data)
+        self.posted.append([int(x.text) for x in root.iter('data')])
+        return mock.Mock(status_code=200)
+
+    def _dp(self, i):
+        return DataPoint(stream_id="my/stream", data_type=STREAM_TYPE_INTEGER, data=i)
+
+    def test_batches_full_and_remainder_on_close(self):
+        writer = BufferedDataPointWriter(self.dc.streams, max_latency=60)
+        for i in range(600):
+            writer.write(self._dp(i))
+        writer.close()
+        self.assertEqual([len(batch) for batch in self.posted], [250, 250, 100])
+        self.assertEqual(sum(self.posted, []), list(range(600)))
+        self.assertRaises(ValueError, writer.write, self._dp(1))
+
+    def test_max_latency(self):
+        with BufferedDataPointWriter(self.dc.streams, max_latency=0.01) as writer:
+            writer.write(self._dp(1))
+            deadline = time.time() + 5
+            while not self.posted and time.time() < deadline:
+                time.sleep(0.005)
+            self.assertEqual(self.posted, [[1]])
+
+    def test_flush(self):
+        with BufferedDataPointWriter(self.dc.streams, max_latency=60) as writer:
+            writer.write(self._dp(1))
+            writer.write(self._dp(2))
+            writer.flush()
+            self.assertEqual(self.posted, [[1, 2]])
+            writer.flush()  # nothing new to write
+            self.assertEqual(self.posted, [[1, 2]])
+
+    def test_many_writer_threads(self):
+        writer = BufferedDataPointWriter(self.dc.streams, batch_size=50, max_latency=60, max_pending=100)
+        threads = [threading.Thread(target=lambda base=base: [writer.write(self._dp(base + i)) for i in range(200)])
+                   for base in range(0, 1000, 200)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        writer.close()
+        self.assertTrue(all(len(batch) <= 50 for batch in self.posted))
+        self.assertEqual(sorted(sum(self.posted, [])), list(range(1000)))
+
+    def test_backpressure_nonblocking(self):
+        block = threading.Event()
+        self.post_patcher.stop()
+        with mock.patch.object(self.dc.get_connection(), "post", side_effect=lambda *args: block.wait()):
+            writer = BufferedDataPointWriter(self.dc.streams, batch_size=1, max_latency=60, max_pending=1)
+            writer.write(self._dp(0))  # taken by the writer thread, which then blocks
+            deadline = time.time() + 5
+            while True:
+                try:
+                    writer.write(self._dp(1), block=False)
+                    break
+                except Full:
+                    self.assertLess(time.time(), deadline)
+                    time.sleep(0.005)
+            self.assertRaises(Full, writer.write, self._dp(2), block=False)
+            self.assertRaises(Full, writer.write, self._dp(2), timeout=0.01)
+            block.set()
+            writer.close()
+        self.post_patcher.start()
+
+    def test_error_callback(self):
+        errors = []
+        self.post_patcher.stop()
+        with mock.patch.object(self.dc.get_connection(), "post", side_effect=DeviceCloudHttpException(None)):
+            with BufferedDataPointWriter(self.dc.streams, error_callback=lambda dps, e: errors.append((dps, e))) \
+                    as writer:
+                writer.write(self._dp(5))
+                writer.flush()
+        self.post_patcher.start()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0][0].get_data(), 5)
+        self.assertIsInstance(errors[0][1], DeviceCloudHttpException)
+
+    def test_requires_stream_id(self):
+        with BufferedDataPointWriter(self.dc.streams) as writer:
+            self.assertRaises(ValueError, writer.write, DataPoint(1))
+            self.assertRaises(TypeError, writer.write, 1)
+
+    def test_invalid_batch_size(self):
+        self.assertRaises(ValueError, BufferedDataPointWriter, self.dc.streams, batch_size=251)
+        self.assertRaises(ValueError, BufferedDataPointWriter, self.dc.streams, batch_size=10, max_pending=5)
+
 
 if __name__ == "__main__":
     unittest.main()
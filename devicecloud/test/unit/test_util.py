@@ -0,0 +1,159 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2015 Digi International, Inc.
+
+import datetime
+import threading
+import time
+import unittest
+
+from dateutil.tz import tzutc, tzoffset
+from devicecloud import util
+from devicecloud.util import concurrent_map, iso8601_to_dt, to_none_or_dt, TTLCache
+import mock
+
+
+class TestConcurrentMap(unittest.TestCase):
+
+    def test_ordered(self):
+        def slow_square(x):
+            time.sleep(0.001 * (10 - x))
+            return x * x
+        self.assertEqual(list(concurrent_map(slow_square, range(10), 4)), [x * x for x in range(10)])
+
+    def test_unordered(self):
+        results = list(concurrent_map(lambda x: x * 2, range(20), 3, ordered=False))
+        self.assertEqual(sorted(results), [x * 2 for x in range(20)])
+
+    def test_bounded_pending(self):
+        lock = threading.Lock()
+        state = {"active": 0, "max_active": 0}
+
+        def work(x):
+            with lock:
+                state["active"] += 1
+                state["max_active"] = max(state["max_active"], state["active"])
+            time.sleep(0.005)
+            with lock:
+                state["active"] -= 1
+            return x
+
+        self.assertEqual(list(concurrent_map(work, range(12), 2)), list(range(12)))
+        self.assertLessEqual(state["max_active"], 2)
+
+    def test_exception_reraised(self):
+        def fail_on_three(x):
+            if x == 3:
+                raise KeyError(x)
+            return x
+
+        it = concurrent_map(fail_on_three, range(6), 2)
+        self.assertEqual([next(it) for _ in range(3)], [0, 1, 2])
+        self.assertRaises(KeyError, next, it)
+
+    def test_invalid_workers(self):
+        self.assertRaises(ValueError, list, concurrent_map(lambda x: x, [1], 0))
+
+
+class TestIso8601ToDt(unittest.TestCase):
+
+    def setUp(self):
+        util._ISO8601_CACHE.clear()
+
+    def test_device_cloud_form(self):
+        self.assertEqual(iso8601_to_dt("2014-07-06T21:46:47.981Z"),
+                         datetime.datetime(2014, 7, 6, 21, 46, 47, 981000, tzinfo=tzutc()))
+        self.assertEqual(iso8601_to_dt("2014-07-06T21:46:47Z"),
+                         datetime.datetime(2014, 7, 6, 21, 46, 47, tzinfo=tzutc()))
+        self.assertEqual(iso8601_to_dt("2014-07-06T21:46:47.123456Z").microsecond, 123456)
+
+    def test_fallback(self):
+        # not the form the device cloud uses, so this is handled by arrow
+        self.assertEqual(iso8601_to_dt("2014-07-06T23:46:47+02:00"),
+                         datetime.datetime(2014, 7, 6, 21, 46, 47, tzinfo=tzutc()))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, iso8601_to_dt, "2014-13-06T21:46:47.981Z")
+        self.assertRaises(ValueError, iso8601_to_dt, "not a timestamp")
+
+    def test_cache(self):
+        first = iso8601_to_dt("2014-07-06T21:46:47.981Z")
+        self.assertIs(iso8601_to_dt("2014-07-06T21:46:47.981Z"), first)
+
+    def test_cache_bounded(self):
+        for i in range(util.ISO8601_CACHE_SIZE + 10):
+            iso8601_to_dt("2014-07-06T21:46:47.%03dZ" % (i % 1000) if i < 1000 else
+                          "2014-07-07T%02d:%02d:00Z" % ((i // 60) % 24, i % 60))
+        self.assertLessEqual(len(util._ISO8601_CACHE), util.ISO8601_CACHE_SIZE)
+
+
+class TestToNoneOrDt(unittest.TestCase):
+
+    def test_none(self):
+        self.assertIsNone(to_none_or_dt(None))
+
+    def test_naive_assumed_utc(self):
+        self.assertEqual(to_none_or_dt(datetime.datetime(2015, 1, 1, 12)),
+                         datetime.datetime(2015, 1, 1, 12, tzinfo=tzutc()))
+
+    def test_utc_unchanged(self):
+        dt = datetime.datetime(2015, 1, 1, 12, tzinfo=util.UTC)
+        self.assertIs(to_none_or_dt(dt), dt)
+
+    def test_converted_to_utc(self):
+        dt = to_none_or_dt(datetime.datetime(2015, 1, 1, 12, tzinfo=tzoffset(None, 3600)))
+        self.assertEqual(dt, datetime.datetime(2015, 1, 1, 11, tzinfo=tzutc()))
+        self.assertEqual(dt.utcoffset(), datetime.timedelta(0))
+
+    def test_bad_type(self):
+        self.assertRaises(TypeError, to_none_or_dt, 5)
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = TTLCache()
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("a", 5), 5)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("a", 2)
+        self.assertEqual(cache.get("a"), 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_expiry(self):
+        cache = TTLCache(ttl=10)
+        with mock.patch("devicecloud.util.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with mock.patch("devicecloud.util.monotonic", return_value=109.9):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("devicecloud.util.monotonic", return_value=110.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # b is now the least recently used
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_invalidate_and_clear(self):
+        cache = TTLCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.invalidate("a")
+        cache.invalidate("missing")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
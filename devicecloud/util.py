@@ -3,11 +3,37 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 #
 # Copyright (c) 2015 Digi International, Inc.
+import calendar
+import collections
 import datetime
+import re
+import sys
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 
 import arrow
 from arrow.parser import DateTimeParser, ParserError
+from dateutil.tz import tzutc
 import six
+from six.moves.queue import Queue
+
+
+UTC = tzutc()
+_ZERO_OFFSET = datetime.timedelta(0)
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=UTC)
+
+# Clock used for measuring elapsed time (time.monotonic is not available on Python 2)
+monotonic = getattr(time, "monotonic", time.time)
+
+# The form of the timestamps returned by the device cloud (e.g. 2014-07-06T21:46:47.981Z)
+_DC_ISO8601_RE = re.compile(r"^(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,6}))?Z$")
+
+# Bounded memo of previously parsed timestamps.  The same timestamps tend to be
+# seen repeatedly (e.g. timestamp and serverTimestamp on a point, or re-reading
+# overlapping windows); when full, the cache is simply cleared.
+_ISO8601_CACHE = {}
+ISO8601_CACHE_SIZE = 4096
 
 
 def conditional_write(strm, fmt, value, *args, **kwargs):
@@ -18,6 +44,28 @@ def conditional_write(strm, fmt, value, *args, **kwargs):
 
 def iso8601_to_dt(iso8601):
     """Given an ISO8601 string as returned by the device cloud, convert to a datetime object"""
+    dt = _ISO8601_CACHE.get(iso8601)
+    if dt is None:
+        match = _DC_ISO8601_RE.match(iso8601)
+        if match is not None:
+            # Fast path for the exact form used by the device cloud
+            year, month, day, hour, minute, second, fraction = match.groups()
+            microsecond = int(fraction.ljust(6, "0")) if fraction else 0
+            try:
+                dt = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute),
+                                       int(second), microsecond, tzinfo=UTC)
+            except ValueError as ve:
+                raise ValueError("Provided was not a valid ISO8601 string: %r" % ve)
+        else:
+            dt = _parse_iso8601_with_arrow(iso8601)
+
+        if len(_ISO8601_CACHE) >= ISO8601_CACHE_SIZE:
+            _ISO8601_CACHE.clear()
+        _ISO8601_CACHE[iso8601] = dt
+    return dt
+
+
+def _parse_iso8601_with_arrow(iso8601):
     # We could just use arrow.get() but that is more permissive than we actually want.
     # Internal (but still public) to arrow is the actual parser where we can be
     # a bit more specific
@@ -48,7 +96,13 @@ def to_none_or_dt(input):
     if input is None:
         return input
     elif isinstance(input, datetime.datetime):
-        arrow_dt = arrow.Arrow.fromdatetime(input, input.tzinfo or 'utc')
+        if input.tzinfo is None:
+            return input.replace(tzinfo=UTC)
+        elif input.tzinfo is UTC:
+            return input
+        elif input.utcoffset() == _ZERO_OFFSET:
+            return input.replace(tzinfo=UTC)
+        arrow_dt = arrow.Arrow.fromdatetime(input, input.tzinfo)
         return arrow_dt.to('utc').datetime
     if isinstance(input, six.string_types):
         # try to convert from ISO8601
@@ -82,4 +136,135 @@ def isoformat(dt):
 
 def dc_utc_timestamp_to_dt(dc_timestamp_in_milleseconds):
     """Return a UTC datetime object"""
-    return arrow.Arrow.utcfromtimestamp(dc_timestamp_in_milleseconds / 1000).datetime
+    # exact (and much cheaper than going through a float number of seconds)
+    return _EPOCH + datetime.timedelta(milliseconds=dc_timestamp_in_milleseconds)
+
+
+def dt_to_dc_utc_timestamp(dt):
+    """Return the number of milliseconds since the epoch (as used by the device cloud) for a datetime"""
+    dt = to_none_or_dt(dt)
+    return calendar.timegm(dt.utctimetuple()) * 1000 + dt.microsecond // 1000
+
+
+def _call_capturing_exception(function, item):
+    # Exceptions are handed back to the consuming thread rather than being
+    # raised in the pool so that they can be re-raised where they are expected
+    try:
+        return True, function(item)
+    except Exception:
+        return False, sys.exc_info()
+
+
+def concurrent_map(function, iterable, workers, ordered=True, max_pending=None):
+    """Yield ``function(item)`` for each item in ``iterable`` using a pool of threads
+
+    At most ``max_pending`` (by default, twice the number of workers) calls
+    will be outstanding at any time, which bounds the number of results which
+    may be buffered while waiting for the consumer.  If ``ordered`` is True,
+    results are yielded in the order of the input; otherwise they are yielded
+    as they complete.  An exception raised by ``function`` is re-raised in the
+    consumer when the corresponding result would have been yielded.
+
+    :param function: The function to be called with each item
+    :param iterable: The items with which ``function`` will be called
+    :param int workers: The number of threads which should be used
+    :param bool ordered: Whether results should be yielded in input order
+    :param int max_pending: Upper bound on the number of calls in flight
+    :return: generator over the results of calling ``function``
+
+    """
+    workers = validate_type(workers, *six.integer_types)
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    if max_pending is None:
+        max_pending = workers * 2
+
+    pool = ThreadPool(workers)
+    try:
+        if ordered:
+            pending = collections.deque()
+            completed = None
+        else:
+            pending = None
+            completed = Queue()
+
+        def get_next():
+            if ordered:
+                success, result = pending.popleft().get()
+            else:
+                success, result = completed.get()
+            if not success:
+                six.reraise(*result)
+            return result
+
+        in_flight = 0
+        for item in iterable:
+            if ordered:
+                pending.append(pool.apply_async(_call_capturing_exception, (function, item)))
+            else:
+                pool.apply_async(_call_capturing_exception, (function, item), callback=completed.put)
+            in_flight += 1
+            if in_flight >= max_pending:
+                in_flight -= 1
+                yield get_next()
+
+        while in_flight > 0:
+            in_flight -= 1
+            yield get_next()
+    finally:
+        pool.terminate()
+
+
+class TTLCache(object):
+    """Thread-safe mapping whose entries expire after a fixed time to live
+
+    At most ``max_size`` entries are kept; when full, the least recently used
+    entry is evicted to make room for a new one.
+
+    :param float ttl: The number of seconds for which an entry remains valid
+        (None means that entries do not expire)
+    :param int max_size: The maximum number of entries kept (None means no limit)
+
+    """
+
+    def __init__(self, ttl=None, max_size=None):
+        self._ttl = ttl
+        self._max_size = validate_type(max_size, type(None), *six.integer_types)
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> (expiry time, value), least recently used first
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the value for ``key`` if present and not expired, otherwise ``default``"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            expiry, value = entry
+            if expiry is not None and expiry <= monotonic():
+                return default
+            self._entries[key] = entry  # now the most recently used
+            return value
+
+    def set(self, key, value):
+        """Store ``value`` for ``key``, evicting the least recently used entry if full"""
+        expiry = None if self._ttl is None else monotonic() + self._ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expiry, value)
+            if self._max_size is not None:
+                while len(self._entries) > self._max_size:
+                    self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove the entry for ``key`` (if any)"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()